@@ -7,6 +7,8 @@ import secrets
 import datetime
 import os
 import time
+from utils.http_client import get_session
+from utils.token_manager import get_token_manager, TokenRefreshError
 from utils.apple_health_processor import process_apple_heart_rate_data, process_apple_activity_data, process_apple_workout_data
 
 bp = Blueprint('apple_fitness', __name__, url_prefix='/api/apple-fitness')
@@ -76,7 +78,7 @@ def callback():
             'Content-Type': 'application/x-www-form-urlencoded'
         }
         
-        token_response = requests.post(
+        token_response = get_session('apple_fitness').post(
             current_app.config['APPLE_FITNESS_TOKEN_URL'],
             data=token_data,
             headers=headers
@@ -150,58 +152,79 @@ def _generate_client_secret():
         current_app.logger.error(f"Error generating Apple client secret: {str(e)}")
         return None
 
+def _session_token():
+    """The Apple Fitness token stored in the session, as a token dict"""
+    return {
+        'access_token': session.get('apple_fitness_access_token'),
+        'refresh_token': session.get('apple_fitness_refresh_token'),
+        'expires_at': session.get('apple_fitness_token_expires_at', 0)
+    }
+
+def refresh_apple_fitness_token(token):
+    """
+    Token manager refresh function: exchange the refresh token for a new access token
+    
+    Raises:
+        TokenRefreshError: If there is no refresh token or Apple rejects it
+    """
+    refresh_token = token.get('refresh_token')
+    if not refresh_token:
+        raise TokenRefreshError("No Apple Fitness refresh token")
+    
+    client_secret = _generate_client_secret()
+    
+    refresh_data = {
+        'client_id': current_app.config['APPLE_FITNESS_CLIENT_ID'],
+        'client_secret': client_secret,
+        'grant_type': 'refresh_token',
+        'refresh_token': refresh_token
+    }
+    
+    headers = {
+        'Content-Type': 'application/x-www-form-urlencoded'
+    }
+    
+    refresh_response = get_session('apple_fitness').post(
+        current_app.config['APPLE_FITNESS_TOKEN_URL'],
+        data=refresh_data,
+        headers=headers
+    )
+    
+    if refresh_response.status_code != 200:
+        raise TokenRefreshError(refresh_response.text)
+    token_json = refresh_response.json()
+    
+    return {
+        'access_token': token_json['access_token'],
+        'refresh_token': token_json.get('refresh_token', refresh_token),
+        'expires_at': time.time() + token_json['expires_in']
+    }
+
+get_token_manager().register('apple_fitness', refresh_apple_fitness_token)
+
 @bp.route('/token', methods=['GET'])
 def check_token():
     """Check if the user has a valid Apple Fitness token."""
     if 'apple_fitness_access_token' in session:
-        # Check if token is expired
-        if session.get('apple_fitness_token_expires_at', 0) > time.time():
+        # The token manager refreshes tokens in the background before they expire;
+        # an expired token is refreshed here
+        try:
+            token = get_token_manager().current('apple_fitness', _session_token())
+            
+            session['apple_fitness_access_token'] = token['access_token']
+            session['apple_fitness_refresh_token'] = token['refresh_token']
+            session['apple_fitness_token_expires_at'] = token['expires_at']
+            
             return jsonify({
                 'authenticated': True,
                 'expires_at': session.get('apple_fitness_token_expires_at')
             })
-        else:
-            # Try to refresh token
-            try:
-                refresh_token = session.get('apple_fitness_refresh_token')
-                if refresh_token:
-                    client_secret = _generate_client_secret()
-                    
-                    refresh_data = {
-                        'client_id': current_app.config['APPLE_FITNESS_CLIENT_ID'],
-                        'client_secret': client_secret,
-                        'grant_type': 'refresh_token',
-                        'refresh_token': refresh_token
-                    }
-                    
-                    headers = {
-                        'Content-Type': 'application/x-www-form-urlencoded'
-                    }
-                    
-                    refresh_response = requests.post(
-                        current_app.config['APPLE_FITNESS_TOKEN_URL'],
-                        data=refresh_data,
-                        headers=headers
-                    )
-                    
-                    refresh_response.raise_for_status()
-                    token_json = refresh_response.json()
-                    
-                    session['apple_fitness_access_token'] = token_json['access_token']
-                    if 'refresh_token' in token_json:
-                        session['apple_fitness_refresh_token'] = token_json['refresh_token']
-                    session['apple_fitness_token_expires_at'] = time.time() + token_json['expires_in']
-                    
-                    return jsonify({
-                        'authenticated': True,
-                        'expires_at': session.get('apple_fitness_token_expires_at')
-                    })
-            except Exception as e:
-                current_app.logger.error(f"Failed to refresh Apple Fitness token: {str(e)}")
-                # Clear invalid tokens
-                session.pop('apple_fitness_access_token', None)
-                session.pop('apple_fitness_refresh_token', None)
-                session.pop('apple_fitness_token_expires_at', None)
+        except Exception as e:
+            current_app.logger.error(f"Failed to refresh Apple Fitness token: {str(e)}")
+            # Clear invalid tokens
+            session.pop('apple_fitness_access_token', None)
+            session.pop('apple_fitness_refresh_token', None)
+            session.pop('apple_fitness_token_expires_at', None)
     
     return jsonify({
         'authenticated': False
@@ -266,6 +289,10 @@ def profile():
 @bp.route('/logout', methods=['POST'])
 def logout():
     """Logout from Apple Fitness."""
+    # Stop refreshing this user's token in the background
+    if 'apple_fitness_access_token' in session:
+        get_token_manager().forget('apple_fitness', _session_token())
+    
     # Remove Apple Fitness tokens from session
     session.pop('apple_fitness_access_token', None)
     session.pop('apple_fitness_refresh_token', None)
@@ -8,6 +8,12 @@ import traceback
 import secrets
 import os
 from urllib.parse import urlencode
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.http_client import get_session
+from utils.sync_scheduler import get_scheduler
+from utils.timeseries_store import get_store
+from utils.token_manager import get_token_manager, TokenRefreshError
 
 bp = Blueprint('auth', __name__)
 
@@ -199,7 +205,7 @@ def callback():
         
         # Add timeout to prevent hanging requests
         try:
-            response = requests.post(token_url, headers=headers, data=data, timeout=10)
+            response = get_session('fitbit').post(token_url, headers=headers, data=data, timeout=10)
             current_app.logger.info(f"Response status code: {response.status_code}")
             current_app.logger.info(f"Response headers: {response.headers}")
             if response.status_code != 200:
@@ -234,6 +240,10 @@ def callback():
         session['oauth_token'] = token_data
         session['token_acquired_at'] = time.time()  # Store when we received the token
         
+        # Backfill this user's history in the background so the first dashboard load reads local data
+        if token_data.get('user_id'):
+            get_scheduler().enroll('fitbit', token_data['user_id'], token_data)
+        
         # Clear any disconnect flags since we have a fresh authentication
         if 'fitbit_explicitly_disconnected' in session:
             current_app.logger.info("Clearing fitbit_explicitly_disconnected flag after successful authentication")
@@ -271,62 +281,26 @@ def get_token():
         if not token:
             return jsonify({'authenticated': False}), 401
         
-        # Check if token is expired
-        if token.get('expires_at') and token.get('expires_at') < time.time():
-            # Token is expired, attempt to refresh
-            refresh_token = token.get('refresh_token')
-            
-            if not refresh_token:
-                # No refresh token, user needs to log in again
-                session.pop('oauth_token', None)
-                current_app.logger.error("Token expired and no refresh token available")
-                return jsonify({'authenticated': False, 'error': 'Token expired'}), 401
-            
-            try:
-                # Refresh the token
-                token_url = current_app.config['FITBIT_TOKEN_URL']
-                client_id = current_app.config['FITBIT_CLIENT_ID']
-                client_secret = current_app.config['FITBIT_CLIENT_SECRET']
-                
-                auth_header = base64.b64encode(
-                    f"{client_id}:{client_secret}".encode()
-                ).decode()
-                
-                headers = {
-                    'Authorization': f'Basic {auth_header}',
-                    'Content-Type': 'application/x-www-form-urlencoded'
-                }
-                
-                data = {
-                    'grant_type': 'refresh_token',
-                    'refresh_token': refresh_token
-                }
-                
-                current_app.logger.info("Refreshing expired token...")
-                response = requests.post(token_url, headers=headers, data=data, timeout=10)
-                
-                if response.status_code != 200:
-                    # Refresh failed, user needs to log in again
-                    session.pop('oauth_token', None)
-                    current_app.logger.error(f"Token refresh failed: {response.text}")
-                    return jsonify({'authenticated': False, 'error': 'Refresh token failed'}), 401
-                
-                # Update token in session
-                token = response.json()
-                
-                # Calculate absolute expiration time if not provided
-                if 'expires_at' not in token and 'expires_in' in token:
-                    token['expires_at'] = time.time() + int(token['expires_in'])
-                
-                session['oauth_token'] = token
-                session['token_refreshed_at'] = time.time()  # Track when token was refreshed
-                session.modified = True
-                
-                current_app.logger.info("Token successfully refreshed")
-            except Exception as e:
-                current_app.logger.error(f"Error refreshing token: {str(e)}")
-                session.pop('oauth_token', None)
-                return jsonify({'authenticated': False, 'error': str(e)}), 500
+        # Use the token manager's current token, refreshed here (shared with concurrent
+        # requests) once it has expired; the new token is written back to the session
+        try:
+            current_token = get_token_manager().current('fitbit', token)
+        except TokenRefreshError as e:
+            # Refresh failed, user needs to log in again
+            session.pop('oauth_token', None)
+            current_app.logger.error(f"Token refresh failed: {str(e)}")
+            error = 'Refresh token failed' if token.get('refresh_token') else 'Token expired'
+            return jsonify({'authenticated': False, 'error': error}), 401
+        except Exception as e:
+            current_app.logger.error(f"Error refreshing token: {str(e)}")
+            session.pop('oauth_token', None)
+            return jsonify({'authenticated': False, 'error': str(e)}), 500
+        
+        if current_token.get('access_token') != token.get('access_token'):
+            token = current_token
+            session['oauth_token'] = token
+            session['token_refreshed_at'] = time.time()  # Track when token was refreshed
+            session.modified = True
         
         # Return the token info (but not the actual token for security)
         return jsonify({
@@ -342,6 +316,66 @@ def get_token():
         current_app.logger.error(traceback.format_exc())
         return jsonify({'authenticated': False, 'error': str(e)}), 500
 
+def refresh_fitbit_token(token):
+    """
+    Token manager refresh function: exchange a Fitbit refresh token for a new token
+    
+    Fitbit refresh tokens are single use; the response carries the next one.
+    
+    Args:
+        token (dict): Current token, including its refresh token
+    
+    Returns:
+        dict: New token with an absolute expires_at
+    
+    Raises:
+        TokenRefreshError: If there is no refresh token or Fitbit rejects it
+    """
+    refresh_token = token.get('refresh_token')
+    if not refresh_token:
+        # No refresh token, user needs to log in again
+        raise TokenRefreshError("Token expired and no refresh token available")
+    
+    token_url = current_app.config['FITBIT_TOKEN_URL']
+    client_id = current_app.config['FITBIT_CLIENT_ID']
+    client_secret = current_app.config['FITBIT_CLIENT_SECRET']
+    
+    auth_header = base64.b64encode(
+        f"{client_id}:{client_secret}".encode()
+    ).decode()
+    
+    headers = {
+        'Authorization': f'Basic {auth_header}',
+        'Content-Type': 'application/x-www-form-urlencoded'
+    }
+    
+    data = {
+        'grant_type': 'refresh_token',
+        'refresh_token': refresh_token
+    }
+    
+    current_app.logger.info("Refreshing expired token...")
+    response = get_session('fitbit').post(token_url, headers=headers, data=data, timeout=10)
+    if response.status_code != 200:
+        raise TokenRefreshError(response.text)
+    
+    new_token = response.json()
+    
+    # Calculate absolute expiration time if not provided
+    if 'expires_at' not in new_token and 'expires_in' in new_token:
+        new_token['expires_at'] = time.time() + int(new_token['expires_in'])
+    
+    # Background sync jobs use the new token from now on
+    if new_token.get('user_id'):
+        get_scheduler().enroll('fitbit', new_token['user_id'], new_token)
+    
+    current_app.logger.info("Token successfully refreshed")
+    return new_token
+
+# Fitbit refresh tokens are single use, so they are only refreshed on the request
+# path, where the new token is written back to the session
+get_token_manager().register('fitbit', refresh_fitbit_token, background=False)
+
 @bp.route('/logout', methods=['POST'])
 def logout():
     """Clear the user's session"""
@@ -350,6 +384,13 @@ def logout():
         service = request.args.get('service', None)
         
         if service == 'fitbit' or service is None:
+            token = session.get('oauth_token') or {}
+            if token.get('user_id'):
+                get_scheduler().unenroll('fitbit', token['user_id'])
+                get_store().delete_user(token['user_id'])
+            if token:
+                get_token_manager().forget('fitbit', token)
+            
             # Remove Fitbit-specific tokens and set disconnect flag
             session.pop('oauth_token', None)
             session.pop('oauth_state', None)
@@ -1,48 +1,105 @@
 import sys
 import os
-from flask import Blueprint, jsonify, request, session, current_app
-import requests
+from flask import Blueprint, jsonify, request, session, current_app, g, Response, stream_with_context, copy_current_request_context, has_request_context, has_app_context
 from datetime import datetime, timedelta
 import time
 import hashlib
+import re
 import json
+import base64
 from functools import wraps
 import threading
 import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.data_processor import process_heart_rate_data, detect_abnormal_rhythms, process_sleep_data, process_activity_data
+from utils.data_processor import process_heart_rate_data, attach_rr_intervals, detect_abnormal_rhythms, process_hrv_data, process_sleep_data, process_activity_data
+from utils.downsampling import parse_max_points
+from utils.rhythm_detector import LiveRhythmMonitor
+from utils.ring_buffer import HeartRateRingBuffer
+from utils.heart_rate_series import HeartRateSeries
+from utils.ble_heart_rate import parse_heart_rate_measurement
+from utils.http_client import get_session
+from utils.cache import get_cache
+from utils.rate_limiter import RateLimiter, RateLimitExceeded
+from utils.single_flight import SingleFlight
+from utils.timeseries_store import get_store, date_range, DayRecord, pack_samples, unpack_samples
+from utils.json_stream import parse_intraday_response
+from utils.sync_scheduler import get_scheduler
+from utils.token_manager import get_token_manager
+from utils.rollups import (ACTIVITY_FIELDS, heart_rate_rollup, heart_rate_row, sleep_rollup, sleep_row,
+                           activity_rollup, activity_row, group_rollups)
 
 bp = Blueprint('fitbit', __name__)
 
-# Simple in-memory cache
-cache = {}
-# Default cache expiration in seconds (30 minutes)
+# Default cache expiration in seconds (30 minutes), used for responses without a date
 CACHE_EXPIRATION = 1800
+CACHE_TTL_TODAY = 60  # Today's data keeps changing as the device syncs
+CACHE_TTL_RECENT = 900  # Yesterday can still receive late syncs
+CACHE_TTL_HISTORICAL = 6 * 3600  # Older days no longer change
+CACHE_STALE_WINDOW = 24 * 3600  # Expired entries are kept this long as a fallback when rate limited
+
+# Response cache keyed per user; the backend (memory, SQLite or Redis) comes from Config
+cache = get_cache('fitbit')
+
+# Identical requests already in flight (same user, URL and params) share one upstream call
+flights = SingleFlight()
 
 # Rate limiting variables
 REQUEST_LIMIT = 150  # Fitbit allows 150 requests per hour
 RATE_LIMIT_WINDOW = 3600  # 1 hour in seconds
-request_timestamps = []
+RATE_LIMIT_LOW_WATER = 10  # With this few requests left, serve stale cache instead of calling Fitbit
+RATE_LIMIT_MAX_WAIT = 2  # Seconds a request may wait for budget before giving up
+rate_limiter = RateLimiter(REQUEST_LIMIT, RATE_LIMIT_WINDOW, low_water=RATE_LIMIT_LOW_WATER)
+
+# Dates embedded in Fitbit URLs, used to pick cache lifetimes
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# Concurrent fan-out for independent Fitbit API calls
+FANOUT_MAX_WORKERS = 8  # Upper bound on simultaneous requests per incoming API call
+FANOUT_REQUEST_TIMEOUT = 20  # Seconds allowed for each fanned-out request
+HEART_RATE_DAY_WORKERS = 4  # Simultaneous per-day intraday requests; each 1sec day is a large body
+
+# Daily activity time series fetched for multi-day views
+ACTIVITY_METRICS = tuple(metric for _, metric, _ in ACTIVITY_FIELDS)
+
+# Buckets multi-day views can be grouped into with ?group=
+ROLLUP_GROUPS = ('day', 'week', 'month')
 
 # BLE connection and data management
 bluetooth_connected = False
-bluetooth_hr_data = {}
+bluetooth_buffer = HeartRateRingBuffer(capacity=3600)  # 1 hour at 1 sample per second
+bluetooth_monitor = LiveRhythmMonitor()  # Updated per notification, guarded by bluetooth_lock
 bluetooth_lock = threading.Lock()
+bluetooth_updated = threading.Condition(bluetooth_lock)  # Notified after every new sample
+bluetooth_sensor_state = {'sensor_contact': None, 'energy_expended': None}  # Latest non-sample fields
 bluetooth_device = None
 bluetooth_thread = None
 FITBIT_HR_SERVICE_UUID = "180d"  # Heart Rate service UUID
 FITBIT_HR_CHARACTERISTIC_UUID = "2a37"  # Heart Rate Measurement characteristic UUID
 FITBIT_DEVICE_NAME_PREFIX = "Charge 6"  # Device name prefix for Fitbit Charge 6
 
+# Live stream (Server-Sent Events) settings
+STREAM_HEARTBEAT_SECONDS = 15  # Comment line sent when idle so proxies keep the connection open
+STREAM_MAX_SECONDS = 90  # Each open stream holds a gunicorn thread (gthread, see render.yaml); clients resume via Last-Event-ID
+STREAM_RETRY_MS = 1000  # Reconnect delay suggested to the browser
+
 
 def rate_limit():
-    """Decorator for rate limiting requests to Fitbit API"""
+    """Decorator that turns an exhausted Fitbit budget into a 429 response with Retry-After"""
     def decorator(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
-            # For now, disable the rate limit to help troubleshooting
-            # Just execute the function directly
-            return f(*args, **kwargs)
+            try:
+                return f(*args, **kwargs)
+            except RateLimitExceeded as e:
+                current_app.logger.warning(f"Fitbit rate limit reached, retry in {e.retry_after}s")
+                response = jsonify({
+                    'error': 'Fitbit rate limit reached',
+                    'retry_after': e.retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
         return wrapped
     return decorator
 
@@ -54,57 +111,207 @@ def get_fitbit_headers():
     if not token:
         return None
     
+    # Use the token the token manager keeps current (refreshed here once expired, then saved to the session)
+    try:
+        current_token = get_token_manager().current('fitbit', token)
+    except Exception as e:
+        current_app.logger.warning(f"Could not refresh Fitbit token: {str(e)}")
+        current_token = token
+    if current_token.get('access_token') != token.get('access_token'):
+        token = current_token
+        session['oauth_token'] = token
+        session.modified = True
+    
     return {
         'Authorization': f"Bearer {token.get('access_token')}",
         'Accept': 'application/json'
     }
 
 
-def get_cache_key(url, params=None):
-    """Generate a cache key from the URL and parameters"""
+def get_cache_key(url, params=None, user_id=None):
+    """Generate a cache key from the URL, parameters and (optionally) the user"""
     key_parts = [url]
     if params:
         for k, v in sorted(params.items()):
             key_parts.append(f"{k}={v}")
     
     key_string = '|'.join(key_parts)
-    return hashlib.md5(key_string.encode()).hexdigest()
+    key = hashlib.md5(key_string.encode()).hexdigest()
+    return f"{user_id}:{key}" if user_id else key
+
+
+def get_cache_user(headers):
+    """Identify the user a request is made for, so cached responses are never shared between users"""
+    token = session.get('oauth_token') if has_request_context() else None
+    if token and token.get('user_id'):
+        return token['user_id']
+    
+    # Background sync jobs have no session and name their user explicitly
+    if has_app_context() and g.get('fitbit_user_id'):
+        return g.fitbit_user_id
+    
+    # Fall back to the access token itself
+    authorization = (headers or {}).get('Authorization', '')
+    return hashlib.md5(authorization.encode()).hexdigest()
+
+
+def get_cache_ttl(url):
+    """Pick a cache lifetime for a Fitbit URL based on the most recent date it covers"""
+    dates = DATE_PATTERN.findall(url)
+    if not dates:
+        return CACHE_TTL_TODAY if '/today' in url else CACHE_EXPIRATION
+    
+    today = datetime.now().date()
+    latest = max(datetime.strptime(value, '%Y-%m-%d').date() for value in dates)
+    if latest >= today:
+        return CACHE_TTL_TODAY
+    if latest == today - timedelta(days=1):
+        return CACHE_TTL_RECENT
+    return CACHE_TTL_HISTORICAL
+
 
+def get_cached_entry(url, params=None, user_id=None):
+    """Get the cached entry ({'data', 'fresh_until'}) for a request, even if it is stale"""
+    return cache.get(get_cache_key(url, params, user_id))
 
-def get_cached_response(url, params=None):
+
+def get_cached_response(url, params=None, user_id=None):
     """Get response from cache if available and not expired"""
-    # Temporarily disable caching for troubleshooting
+    entry = get_cached_entry(url, params, user_id)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return entry['data']
     return None
 
 
-def cache_response(url, response_data, params=None):
-    """Cache the response data with current timestamp"""
-    cache_key = get_cache_key(url, params)
-    cache[cache_key] = {
-        'data': response_data,
-        'timestamp': time.time()
-    }
+def cache_response(url, response_data, params=None, user_id=None, size=None):
+    """Cache the response data with a lifetime that depends on the dates it covers"""
+    # Entries outlive their freshness so they can still be served while rate limited
+    ttl = get_cache_ttl(url)
+    entry = {'data': response_data, 'fresh_until': time.time() + ttl}
+    cache.set(get_cache_key(url, params, user_id), entry, ttl + CACHE_STALE_WINDOW, size)
+
+
+def pack_intraday_data(data):
+    """
+    Cacheable form of a streamed intraday heart rate response
+    
+    The HeartRateSeries dataset is stored as packed, compressed sample columns
+    (base64 text, so every cache backend can hold it) instead of one dict per sample.
+    """
+    series = data['activities-heart-intraday']['dataset']
+    intraday = dict(data['activities-heart-intraday'])
+    intraday['dataset'] = {'packed': base64.b64encode(pack_samples(series.seconds, series.bpm)).decode('ascii')}
+    packed = dict(data)
+    packed['activities-heart-intraday'] = intraday
+    return packed
+
+
+def unpack_intraday_data(data):
+    """Inverse of pack_intraday_data; also accepts a plain Fitbit response"""
+    intraday = dict(data.get('activities-heart-intraday') or {})
+    dataset = intraday.get('dataset') or []
+    date = (data.get('activities-heart') or [{}])[0].get('dateTime', '')
+    if isinstance(dataset, dict):
+        seconds, bpm = unpack_samples(base64.b64decode(dataset['packed']))
+        intraday['dataset'] = HeartRateSeries(seconds, bpm, dates=[date])
+    else:
+        intraday['dataset'] = HeartRateSeries.from_dataset(dataset, date)
+    unpacked = dict(data)
+    unpacked['activities-heart-intraday'] = intraday
+    return unpacked
+
+
+def update_rate_limit(user_id, response):
+    """Track the user's remaining Fitbit budget from the rate limit response headers"""
+    remaining = response.headers.get('Fitbit-Rate-Limit-Remaining')
+    reset_in = response.headers.get('Fitbit-Rate-Limit-Reset')
+    if response.status_code == 429:
+        # Out of budget until the window resets
+        remaining = 0
+        reset_in = reset_in or response.headers.get('Retry-After')
+    
+    try:
+        if remaining is not None and reset_in is not None:
+            rate_limiter.update_from_headers(user_id, int(remaining), float(reset_in))
+    except ValueError:
+        current_app.logger.warning(f"Unexpected Fitbit rate limit headers: {remaining}, {reset_in}")
+
+
+def fitbit_request(url, headers, params=None, timeout=None, use_cache=True, stream=False):
+    """
+    Make a request to Fitbit API with caching, request coalescing and per-user rate limiting
+    
+    With ``stream=True`` (intraday heart rate only) the body is parsed as it
+    is read and the intraday dataset is returned as a HeartRateSeries, so
+    the per-sample dicts of a 1sec day are never built.
+    """
+    user_id = get_cache_user(headers)
+    entry = get_cached_entry(url, params, user_id) if use_cache else None
+    if entry is not None and entry['fresh_until'] > time.time():
+        current_app.logger.info(f"Cache hit for: {url}")
+        data, status_code = entry['data'], 200
+    else:
+        # Concurrent callers for the same request wait on the first one's upstream call
+        key = get_cache_key(url, params, user_id)
+        data, status_code = flights.do(key, fetch_from_fitbit, url, headers, params, timeout, use_cache, user_id, entry, stream)
+    
+    if stream and status_code == 200:
+        return unpack_intraday_data(data), status_code
+    return data, status_code
 
 
-def fitbit_request(url, headers, params=None):
-    """Make a request to Fitbit API with caching"""
+def fetch_from_fitbit(url, headers, params, timeout, use_cache, user_id, entry, stream=False):
+    """Call the Fitbit API for a request that missed the fresh cache, falling back to the stale entry"""
+    # Keep the last few requests of the hourly budget for data we don't have at all
+    if entry is not None and rate_limiter.is_low(user_id):
+        current_app.logger.warning(f"Fitbit budget low, serving stale data for: {url}")
+        return entry['data'], 200
+    
+    try:
+        rate_limiter.acquire(user_id, max_wait=RATE_LIMIT_MAX_WAIT)
+    except RateLimitExceeded:
+        if entry is not None:
+            current_app.logger.warning(f"Fitbit budget exhausted, serving stale data for: {url}")
+            return entry['data'], 200
+        raise
+    
     # Temporary debugging
     current_app.logger.info(f"Making request to: {url}")
     current_app.logger.info(f"With headers: {headers}")
     
     # Make actual request
-    response = requests.get(url, headers=headers, params=params)
+    response = get_session('fitbit').get(url, headers=headers, params=params, timeout=timeout, stream=stream)
+    update_rate_limit(user_id, response)
     
     # Log response for debugging
     current_app.logger.info(f"Response status: {response.status_code}")
     
+    if stream and response.status_code == 200:
+        # Decode samples straight into arrays as the body arrives
+        try:
+            response_json, size = parse_intraday_response(response)
+        finally:
+            response.close()
+        packed = pack_intraday_data(response_json)
+        if use_cache:
+            cache_response(url, packed, params, user_id)
+        current_app.logger.info(f"Streamed {len(response_json['activities-heart-intraday']['dataset'])} intraday points ({size} bytes)")
+        return packed, response.status_code
+    
+    if response.status_code == 429:
+        if entry is not None:
+            current_app.logger.warning(f"Fitbit returned 429, serving stale data for: {url}")
+            return entry['data'], 200
+        retry_after = response.headers.get('Retry-After') or response.headers.get('Fitbit-Rate-Limit-Reset')
+        raise RateLimitExceeded(float(retry_after or RATE_LIMIT_WINDOW))
+    
     if response.status_code != 200:
         current_app.logger.error(f"Error response: {response.text}")
         # Add more detailed logging for troubleshooting
         if response.status_code == 401:
             current_app.logger.error("Authentication error - token may be invalid or missing required scopes")
             # Check token scopes
-            token = session.get('oauth_token')
+            token = session.get('oauth_token') if has_request_context() else None
             if token and 'scope' in token:
                 scopes = token['scope'].split(' ')
                 current_app.logger.error(f"Token scopes: {scopes}")
@@ -116,7 +323,8 @@ def fitbit_request(url, headers, params=None):
         # Log a sample of the response for debugging
         try:
             response_json = response.json()
-            cache_response(url, response_json, params)
+            if use_cache:
+                cache_response(url, response_json, params, user_id, size=len(response.content))
             
             # Debug log the structure of the response if it's a heart rate request
             if 'heart' in url:
@@ -196,13 +404,15 @@ def debug_heart():
         date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         url = f'https://api.fitbit.com/1/user/-/activities/heart/date/{date}/1d.json'
         
-        data, status_code = fitbit_request(url, headers)
+        data, status_code = fitbit_request(url, headers, use_cache=False)
         
         return jsonify({
             'status_code': status_code,
             'data': data if status_code == 200 else None,
             'scopes': token.get('scope', '').split(' ')
         })
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         current_app.logger.error(f"Debug heart error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -234,6 +444,315 @@ def validate_date_param(date_str):
         current_app.logger.warning(f"Invalid date format: {date_str}, using today's date instead")
         return today.strftime('%Y-%m-%d')
 
+def with_app_context(f):
+    """Wrap a function to run in a fresh app context carrying the current sync user (for pool threads outside a request)"""
+    app = current_app._get_current_object()
+    user_id = g.get('fitbit_user_id')
+    
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        with app.app_context():
+            g.fitbit_user_id = user_id
+            return f(*args, **kwargs)
+    return wrapped
+
+def iter_fitbit_requests(urls, headers, timeout=FANOUT_REQUEST_TIMEOUT, max_workers=FANOUT_MAX_WORKERS, stream=False):
+    """
+    Make several independent Fitbit API requests concurrently, yielding each result as it completes
+    
+    Requests run on a bounded thread pool, each with its own timeout. A failed
+    request does not affect the others; it is reported as a (message, status)
+    pair like any other error response. Consuming results as they arrive lets
+    callers reduce each response before the next one lands.
+    
+    Args:
+        urls (dict): Request URLs keyed by an arbitrary name
+        headers (dict): Request headers
+        timeout (float): Timeout in seconds for each request
+        max_workers (int): Upper bound on simultaneous requests
+        stream (bool): Stream-parse intraday heart rate bodies (see fitbit_request)
+    
+    Yields:
+        tuple: (key, (data, status_code)) in completion order
+    """
+    if not urls:
+        return
+    
+    def wrap():
+        # Each request gets its own copy of the request context (for current_app/session);
+        # one copy can't be pushed by several workers at once
+        if has_request_context():
+            return copy_current_request_context(fitbit_request)
+        return with_app_context(fitbit_request)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        futures = {
+            executor.submit(wrap(), url, headers, None, timeout, True, stream): key
+            for key, url in urls.items()
+        }
+        for future in as_completed(futures):
+            key = futures.pop(future)
+            try:
+                yield key, future.result()
+            except RateLimitExceeded as e:
+                current_app.logger.warning(f"Skipping {key} data: rate limited for {e.retry_after}s")
+                yield key, (str(e), 429)
+            except Exception as e:
+                current_app.logger.error(f"Error fetching {key} data: {str(e)}")
+                yield key, (str(e), 500)
+
+def fitbit_request_many(urls, headers, timeout=FANOUT_REQUEST_TIMEOUT):
+    """
+    Make several independent Fitbit API requests concurrently
+    
+    Args:
+        urls (dict): Request URLs keyed by an arbitrary name
+        headers (dict): Request headers
+        timeout (float): Timeout in seconds for each request
+    
+    Returns:
+        dict: (data, status_code) tuples keyed like ``urls``
+    """
+    return dict(iter_fitbit_requests(urls, headers, timeout))
+
+def load_days(headers, kind, days, fetch_missing):
+    """
+    Load days from the local time-series store, fetching only missing or still-mutable days
+    
+    Args:
+        headers (dict): Request headers (identify the user)
+        kind (str): Store kind, e.g. 'sleep' or 'heart-rate:1sec'
+        days (list): Days to load (YYYY-MM-DD)
+        fetch_missing (callable): Called with the days to fetch; returns
+            ({day: (summary, seconds, bpm)}, days fetched only partially,
+            (data, status_code) of the last failed request or None)
+    
+    Returns:
+        tuple: (DayRecord per available day, (data, status_code) of the last failed fetch or None)
+    """
+    user_id = get_cache_user(headers)
+    store = get_store()
+    records = store.get_days(user_id, kind, days)
+    missing = store.missing_days(user_id, kind, days, records)
+    if not missing:
+        current_app.logger.info(f"Serving {len(days)} days of {kind} from the local store")
+        return records, None
+    
+    current_app.logger.info(f"Fetching {len(missing)} of {len(days)} days of {kind} from Fitbit")
+    fetched, partial, failure = fetch_missing(missing)
+    # Partial days are stored as never synced, so they are served now but fetched again next time
+    store.put_days(user_id, kind, {day: fetched[day] for day in fetched if day not in partial})
+    store.put_days(user_id, kind, {day: fetched[day] for day in partial}, synced_at=0)
+    synced_at = time.time()
+    for day, (summary, seconds, bpm) in fetched.items():
+        records[day] = DayRecord(summary, seconds, bpm, 0 if day in partial else synced_at)
+    return records, failure
+
+def load_rollups(headers, kind, days, fetch_missing, rollup_fn):
+    """
+    Load per-day rollups, computing them from stored or fetched days where needed
+    
+    Rollups live in the time-series store as kind 'rollup:<kind>' and carry
+    the sync time of the raw day they came from, so a rollup of a day that
+    can still change is recomputed exactly when its raw day is refetched.
+    
+    Args:
+        rollup_fn (callable): Called with a DayRecord; returns the day's rollup dict
+    
+    Returns:
+        tuple: (rollup dict per available day, (data, status_code) of the last failed fetch or None)
+    """
+    user_id = get_cache_user(headers)
+    store = get_store()
+    rollup_kind = f'rollup:{kind}'
+    stored = store.get_days(user_id, rollup_kind, days)
+    rollups = {day: record.summary for day, record in stored.items()}
+    missing = store.missing_days(user_id, rollup_kind, days, stored)
+    if not missing:
+        current_app.logger.info(f"Serving {len(days)} daily rollups of {kind} from the local store")
+        return rollups, None
+    
+    records, failure = load_days(headers, kind, missing, fetch_missing)
+    by_synced_at = {}
+    for day, record in records.items():
+        rollups[day] = rollup_fn(record)
+        by_synced_at.setdefault(record.synced_at, {})[day] = (rollups[day], None, None)
+    for synced_at, computed in by_synced_at.items():
+        store.put_days(user_id, rollup_kind, computed, synced_at=synced_at)
+    return rollups, failure
+
+def fetch_heart_rate_days(headers, days, detail_level):
+    """
+    Fetch intraday heart rate for the given days
+    
+    A 1sec range request returns the whole span as one huge body (or is
+    truncated), so 1sec days are fetched one request per day with at most
+    HEART_RATE_DAY_WORKERS in flight. Each day is packed into arrays as soon
+    as it arrives, so only a few days of parsed JSON are held at once. Coarser
+    detail levels stay small enough to fetch the span in one range request,
+    which keeps a 3-month view to a single call of the hourly budget.
+    """
+    if detail_level != '1sec' and len(days) > 1:
+        return fetch_heart_rate_range(headers, days, detail_level)
+    
+    base_url = current_app.config['FITBIT_API_BASE_URL']
+    responses = iter_fitbit_requests({
+        day: f"{base_url}/1/user/-/activities/heart/date/{day}/1d/{detail_level}.json" for day in days
+    }, headers, max_workers=HEART_RATE_DAY_WORKERS, stream=True)
+    
+    fetched = {}
+    failure = None
+    for day, (data, status_code) in responses:
+        if status_code != 200:
+            current_app.logger.error(f"Failed to fetch heart rate for {day}: {data}")
+            failure = (data, status_code)
+            continue
+        summary = (data.get('activities-heart') or [{'dateTime': day, 'value': {}}])[0]
+        series = data['activities-heart-intraday']['dataset']
+        fetched[day] = (summary, series.seconds, series.bpm)
+    return fetched, set(), failure
+
+def fetch_heart_rate_range(headers, days, detail_level):
+    """Fetch heart rate for the span of days in one request and split it by dateTime"""
+    base_url = current_app.config['FITBIT_API_BASE_URL']
+    start, end = min(days), max(days)
+    url = f"{base_url}/1/user/-/activities/heart/date/{start}/{end}/{detail_level}.json"
+    
+    data, status_code = fitbit_request(url, headers)
+    if status_code != 200:
+        current_app.logger.error(f"Failed to fetch heart rate for {start} to {end}: {data}")
+        return {}, set(), (data, status_code)
+    
+    # Multi-day responses nest each day's samples in its summary; the top-level dataset belongs to the first day
+    summaries = {entry.get('dateTime'): entry for entry in data.get('activities-heart', [])}
+    base_date = data['activities-heart'][0].get('dateTime', start) if data.get('activities-heart') else start
+    top_level = data.get('activities-heart-intraday', {}).get('dataset', [])
+    
+    fetched = {}
+    for day in days:
+        summary = dict(summaries.get(day) or {'dateTime': day, 'value': {}})
+        dataset = summary.pop('intraday', {}).get('dataset', [])
+        if not dataset and day == base_date:
+            dataset = top_level
+        series = HeartRateSeries.from_dataset(dataset, day)
+        fetched[day] = (summary, series.seconds, series.bpm)
+    return fetched, set(), None
+
+def build_heart_rate_data(days, records):
+    """Rebuild a Fitbit style heart rate response from stored days, with all intraday samples in one HeartRateSeries"""
+    stored = [day for day in days if day in records]
+    return {
+        'activities-heart': [records[day].summary for day in stored],
+        'activities-heart-intraday': {
+            'dataset': HeartRateSeries.from_days([(day, records[day].seconds, records[day].bpm) for day in stored])
+        }
+    }
+
+def heart_rate_day_rollup(record):
+    """Daily heart rate rollup of a stored day"""
+    return heart_rate_rollup(record.summary, record.seconds, record.bpm)
+
+def sleep_day_rollup(record):
+    """Daily sleep rollup of a stored day"""
+    return sleep_rollup(record.summary)
+
+def activity_day_rollup(record):
+    """Daily activity rollup of a stored day"""
+    return activity_rollup(record.summary)
+
+def parse_rollup_group(args):
+    """Read the optional 'group' query param (day, week or month) for multi-day views"""
+    group = args.get('group', 'day')
+    return group if group in ROLLUP_GROUPS else None
+
+def fetch_sleep_days(headers, days):
+    """Fetch sleep logs for the span of days in one request and split them by dateOfSleep"""
+    base_url = current_app.config['FITBIT_API_BASE_URL']
+    start, end = min(days), max(days)
+    if start == end:
+        url = f"{base_url}/1/user/-/sleep/date/{start}.json"
+    else:
+        url = f"{base_url}/1/user/-/sleep/date/{start}/{end}.json"
+    
+    data, status_code = fitbit_request(url, headers)
+    if status_code != 200:
+        return {}, set(), (data, status_code)
+    
+    # Every day in the span is stored, including nights without a sleep log
+    logs_by_day = {day: [] for day in date_range(start, end)}
+    for sleep_record in data.get('sleep', []):
+        logs_by_day.setdefault(sleep_record.get('dateOfSleep', start), []).append(sleep_record)
+    return {day: (logs, None, None) for day, logs in logs_by_day.items()}, set(), None
+
+def fetch_activity_days(headers, days):
+    """Fetch every daily activity metric for the span of days, one concurrent request per metric"""
+    base_url = current_app.config['FITBIT_API_BASE_URL']
+    start, end = min(days), max(days)
+    
+    # Don't pass the date params to avoid _date/date conflict
+    responses = fitbit_request_many({
+        metric: f"{base_url}/1/user/-/activities/{metric}/date/{start}/{end}.json" for metric in ACTIVITY_METRICS
+    }, headers)
+    
+    totals = {day: {} for day in date_range(start, end)}
+    failure = None
+    for metric in ACTIVITY_METRICS:
+        metric_data, status_code = responses[metric]
+        current_app.logger.info(f"Metric activities-{metric} status: {status_code}")
+        if status_code != 200:
+            failure = (metric_data, status_code)
+            continue
+        for entry in metric_data.get(f"activities-{metric}", []):
+            if entry.get('dateTime') in totals:
+                totals[entry['dateTime']][metric] = entry.get('value', 0)
+    
+    # Days missing a metric (e.g. one request failed) are served but fetched again next time
+    partial = {day for day, values in totals.items() if len(values) < len(ACTIVITY_METRICS)}
+    return {day: (values, None, None) for day, values in totals.items()}, partial, failure
+
+def sync_fitbit_user(user_id, token, cursor):
+    """
+    Background sync job: pull a user's days and their rollups into the time-series store
+    
+    The first run backfills SYNC_BACKFILL_DAYS of sleep and activity and
+    SYNC_HEART_RATE_DAYS of intraday heart rate. Later runs start at the
+    cursor, and load_days only fetches days that are missing or not final
+    yet, so a delta sync costs a handful of requests.
+    
+    Returns:
+        str: First day that can still change, to resume from next time
+    """
+    if token.get('expires_at') and token['expires_at'] < time.time():
+        raise RuntimeError("Fitbit token expired; waiting for the user to refresh it")
+    
+    g.fitbit_user_id = user_id
+    if rate_limiter.is_low(user_id):
+        current_app.logger.info(f"Skipping Fitbit sync for {user_id}: keeping the remaining budget for requests")
+        return cursor
+    
+    headers = {
+        'Authorization': f"Bearer {token.get('access_token')}",
+        'Accept': 'application/json'
+    }
+    today = datetime.now()
+    end_str = today.strftime('%Y-%m-%d')
+    backfill_start = (today - timedelta(days=current_app.config['SYNC_BACKFILL_DAYS'])).strftime('%Y-%m-%d')
+    heart_rate_start = (today - timedelta(days=current_app.config['SYNC_HEART_RATE_DAYS'])).strftime('%Y-%m-%d')
+    
+    # Loading rollups stores the raw days too, so both are ready for requests
+    summary_days = date_range(cursor or backfill_start, end_str)
+    load_rollups(headers, 'sleep', summary_days, lambda missing: fetch_sleep_days(headers, missing), sleep_day_rollup)
+    load_rollups(headers, 'activity', summary_days, lambda missing: fetch_activity_days(headers, missing), activity_day_rollup)
+    
+    heart_rate_days = date_range(max(cursor or heart_rate_start, heart_rate_start), end_str)
+    load_rollups(headers, 'heart-rate:1sec', heart_rate_days,
+                 lambda missing: fetch_heart_rate_days(headers, missing, '1sec'), heart_rate_day_rollup)
+    
+    return (today - timedelta(days=1)).strftime('%Y-%m-%d')
+
+get_scheduler().register('fitbit', sync_fitbit_user)
+
+
 @bp.route('/heart-rate', methods=['GET'])
 @rate_limit()
 def get_heart_rate():
@@ -267,6 +786,11 @@ def get_heart_rate():
     # Get query parameters
     period = request.args.get('period', 'day')  # day, week, month, 3month
     date_param = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    max_points = parse_max_points(request.args)  # Optional chart point budget
+    detail = request.args.get('detail', 'intraday')  # intraday or daily (multi-day periods); 'resolution' is the max_points alias
+    group = parse_rollup_group(request.args)
+    if group is None:
+        return jsonify({'error': 'Invalid group'}), 400
     
     # Validate and normalize date parameter
     validated_date = validate_date_param(date_param)
@@ -303,45 +827,75 @@ def get_heart_rate():
     end_str = end_date.strftime('%Y-%m-%d')
     
     # Check if we have cached BlueTooth data for this request
-    if period == 'day' and bluetooth_connected and bluetooth_hr_data:
+    if period == 'day' and bluetooth_connected and len(bluetooth_buffer):
         # Try to use BLE data if available for this date
         bluetooth_date = datetime.now().strftime('%Y-%m-%d')
         if bluetooth_date == validated_date:
+            midnight_ms = int(datetime.strptime(validated_date, '%Y-%m-%d').timestamp() * 1000)
             with bluetooth_lock:
-                if bluetooth_hr_data:
+                if len(bluetooth_buffer):
                     current_app.logger.info(f"Using local Bluetooth heart rate data for {validated_date}")
-                    filtered_data = []
-                    for timestamp, data in bluetooth_hr_data.items():
-                        if data.get('date') == validated_date:
-                            filtered_data.append(data)
+                    # Copy today's samples and RR intervals out of the ring buffer while holding the lock
+                    filtered_data = HeartRateSeries.from_epoch_ms(*bluetooth_buffer.window(midnight_ms))
+                    rr_data = HeartRateSeries.from_epoch_ms(*bluetooth_buffer.rr_window(midnight_ms))
                     
                     # Process the data
                     ble_data = {"activities-heart-intraday": {"dataset": filtered_data}}
-                    processed_data = process_heart_rate_data(ble_data, period)
+                    processed_data = process_heart_rate_data(ble_data, period, max_points)
                     
                     # If we have data, return it
                     if processed_data and len(processed_data) > 0:
+                        # Minutes with sensor RR intervals use them for HRV instead of BPM deltas
+                        rhythm_data = attach_rr_intervals(filtered_data.minute_rows(), rr_data)
                         return jsonify({
                             'data': processed_data,
+                            'abnormal_events': detect_abnormal_rhythms(rhythm_data),
                             'source': 'bluetooth',
                             'period': period,
                             'start_date': start_str,
                             'end_date': end_str
                         })
     
-    # Make request to Fitbit API
-    url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/heart/date/{start_str}/{end_str}/{detail_level}.json"
-    params = {}
-    heart_rate_data, status_code = fitbit_request(url, headers, params)
+    # Serve stored days locally and fetch only missing or still-changing days from Fitbit
+    days = date_range(start_str, end_str)
+    
+    # Daily rows come straight from the per-day rollups, without touching intraday samples
+    if detail == 'daily' and period != 'day':
+        rollups, failure = load_rollups(
+            headers, f'heart-rate:{detail_level}', days,
+            lambda missing: fetch_heart_rate_days(headers, missing, detail_level), heart_rate_day_rollup
+        )
+        if failure and not rollups:
+            details, status_code = failure
+            return jsonify({
+                'error': 'Failed to fetch heart rate data',
+                'details': details
+            }), status_code
+        return jsonify({
+            'data': [heart_rate_row(start, rollup) for start, rollup in group_rollups(rollups, group)],
+            'period': period,
+            'detail': detail,
+            'group': group,
+            'start_date': start_str,
+            'end_date': end_str
+        })
+    
+    records, failure = load_days(
+        headers, f'heart-rate:{detail_level}', days,
+        lambda missing: fetch_heart_rate_days(headers, missing, detail_level)
+    )
     
-    if status_code != 200:
+    if failure and not records:
+        details, status_code = failure
         return jsonify({
             'error': 'Failed to fetch heart rate data',
-            'details': heart_rate_data
+            'details': details
         }), status_code
     
+    heart_rate_data = build_heart_rate_data(days, records)
+    
     # Process the data
-    processed_data = process_heart_rate_data(heart_rate_data, period)
+    processed_data = process_heart_rate_data(heart_rate_data, period, max_points)
     
     # Check if we got any data
     if not processed_data or len(processed_data) == 0:
@@ -356,7 +910,9 @@ def get_heart_rate():
     
     # Detect abnormal rhythms
     if period in ['day', 'week']:
-        abnormal_events = detect_abnormal_rhythms(processed_data)
+        # Downsampled rows don't carry per-minute values, so analyze the full data
+        rhythm_data = process_heart_rate_data(heart_rate_data, period) if max_points else processed_data
+        abnormal_events = detect_abnormal_rhythms(rhythm_data)
         return jsonify({
             'data': processed_data,
             'abnormal_events': abnormal_events,
@@ -373,6 +929,33 @@ def get_heart_rate():
     })
 
 
+@bp.route('/hrv', methods=['GET'])
+@rate_limit()
+def get_hrv():
+    """Get per-minute heart rate variability metrics for a single day"""
+    headers = get_fitbit_headers()
+    
+    if not headers:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    date_param = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    validated_date = validate_date_param(date_param)
+    
+    url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/heart/date/{validated_date}/1d/1sec.json"
+    heart_rate_data, status_code = fitbit_request(url, headers, stream=True)
+    
+    if status_code != 200:
+        return jsonify({
+            'error': 'Failed to fetch heart rate data',
+            'details': heart_rate_data
+        }), status_code
+    
+    return jsonify({
+        'data': process_hrv_data(heart_rate_data),
+        'date': validated_date
+    })
+
+
 @bp.route('/sleep', methods=['GET'])
 @rate_limit()
 def get_sleep():
@@ -390,6 +973,9 @@ def get_sleep():
     # Get query parameters
     period = request.args.get('period', 'day')  # day, week, month
     date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    group = parse_rollup_group(request.args)  # Multi-day rows per day, week or month
+    if group is None:
+        return jsonify({'error': 'Invalid group'}), 400
     
     # Add timestamp for cache busting
     _ts = request.args.get('_ts', str(int(time.time())))
@@ -422,20 +1008,21 @@ def get_sleep():
     start_str = start_date.strftime('%Y-%m-%d')
     end_str = end_date.strftime('%Y-%m-%d')
     
-    # Make request to Fitbit API
-    params = {'period': period, 'date': date}
+    # Serve stored nights locally and fetch only missing or still-changing days from Fitbit
     try:
+        days = date_range(start_str, end_str)
         if period == 'day':
-            url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/sleep/date/{date}.json"
+            records, failure = load_days(headers, 'sleep', days, lambda missing: fetch_sleep_days(headers, missing))
+            sleep_data = {'sleep': [log for day in days if day in records for log in records[day].summary]}
         else:
-            url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/sleep/date/{start_str}/{end_str}.json"
-        
-        sleep_data, status_code = fitbit_request(url, headers, params)
+            # Multi-day rows are built from per-night rollups instead of the raw sleep logs
+            records, failure = load_rollups(
+                headers, 'sleep', days, lambda missing: fetch_sleep_days(headers, missing), sleep_day_rollup
+            )
         
-        current_app.logger.info(f"Sleep API status code: {status_code}")
-        
-        if status_code != 200:
-            current_app.logger.error(f"Failed to fetch sleep data: {sleep_data}")
+        if failure and not records:
+            sleep_data, status_code = failure
+            current_app.logger.error(f"Failed to fetch sleep data ({status_code}): {sleep_data}")
             return jsonify({
                 'data': [],  # Return empty array instead of error for frontend
                 'period': period,
@@ -446,11 +1033,17 @@ def get_sleep():
             })
         
         # Process the data
-        processed_data = process_sleep_data(sleep_data, period)
+        if period == 'day':
+            processed_data = process_sleep_data(sleep_data, period)
+        else:
+            nights = {day: rollup for day, rollup in records.items() if rollup['records']}
+            processed_data = [sleep_row(start, rollup) for start, rollup in group_rollups(nights, group)]
         
         # Log some info about the processed data
         current_app.logger.info(f"Processed {len(processed_data)} sleep data points")
         
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         current_app.logger.error(f"Exception in sleep data processing: {str(e)}")
         processed_data = []
@@ -482,6 +1075,7 @@ def get_sleep():
         'start_date': start_str,
         'end_date': end_str,
         'requested_date': date,
+        'group': group,
         'timestamp': _ts
     })
 
@@ -503,6 +1097,9 @@ def get_activity():
     # Get query parameters 
     period = request.args.get('period', 'day')  # day, week, month
     date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    group = parse_rollup_group(request.args)  # Multi-day rows per day, week or month
+    if group is None:
+        return jsonify({'error': 'Invalid group'}), 400
     
     # Add timestamp for cache busting
     _ts = request.args.get('_ts', str(int(time.time())))
@@ -544,26 +1141,20 @@ def get_activity():
             # For a single day, get summary and intraday data
             url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/date/{date}.json"
             
-            # Add intraday steps data if available - wrap in try/except to prevent crashes
-            try:
-                steps_url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/steps/date/{date}/1d/15min.json"
-                # Don't pass params to avoid _date/date conflict
-                steps_data, steps_status = fitbit_request(steps_url, headers)
-                current_app.logger.info(f"Steps data status: {steps_status}")
-            except Exception as e:
-                current_app.logger.error(f"Error fetching steps data: {str(e)}")
-                steps_data, steps_status = {}, 500
-            
-            try:
-                # Don't pass params to avoid _date/date conflict
-                main_data, main_status = fitbit_request(url, headers)
-                current_app.logger.info(f"Main activity data status: {main_status}")
-            except Exception as e:
-                current_app.logger.error(f"Error fetching main activity data: {str(e)}")
-                main_data, main_status = {}, 500
+            # Fetch the summary and intraday steps concurrently; a failure of either is isolated
+            # Don't pass params to avoid _date/date conflict
+            responses = fitbit_request_many({
+                'main': url,
+                'steps': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/steps/date/{date}/1d/15min.json"
+            }, headers)
+            steps_data, steps_status = responses['steps']
+            main_data, main_status = responses['main']
+            current_app.logger.info(f"Steps data status: {steps_status}")
+            current_app.logger.info(f"Main activity data status: {main_status}")
             
             if main_status == 200:
-                activity_data = main_data
+                # Copy so the cached response isn't modified below
+                activity_data = dict(main_data)
                 if steps_status == 200:
                     activity_data['activities-steps-intraday'] = steps_data.get('activities-steps-intraday', {})
         elif period != 'day':
@@ -583,31 +1174,18 @@ def get_activity():
             }
         }
         
+    rollups = {}
     if period != 'day':
         try:
-            urls = {
-                'activities-steps': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/steps/date/{start_str}/{end_str}.json",
-                'activities-calories': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/calories/date/{start_str}/{end_str}.json",
-                'activities-distance': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/distance/date/{start_str}/{end_str}.json",
-                'activities-floors': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/floors/date/{start_str}/{end_str}.json",
-                'activities-minutesSedentary': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/minutesSedentary/date/{start_str}/{end_str}.json",
-                'activities-minutesLightlyActive': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/minutesLightlyActive/date/{start_str}/{end_str}.json",
-                'activities-minutesFairlyActive': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/minutesFairlyActive/date/{start_str}/{end_str}.json",
-                'activities-minutesVeryActive': f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/minutesVeryActive/date/{start_str}/{end_str}.json"
-            }
-            
-            # Make API calls for each activity metric - with error handling for each individual call
-            for metric, url in urls.items():
-                try:
-                    # Don't pass the date params to avoid _date/date conflict
-                    metric_data, status_code = fitbit_request(url, headers)
-                    current_app.logger.info(f"Metric {metric} status: {status_code}")
-                    if status_code == 200:
-                        activity_data[metric] = metric_data.get(metric, [])
-                except Exception as e:
-                    current_app.logger.error(f"Error fetching {metric} data: {str(e)}")
-                    # Continue with next metric instead of crashing
-                    activity_data[metric] = []
+            # Daily totals come from rollups in the local store; only missing or still-changing days hit Fitbit
+            days = date_range(start_str, end_str)
+            rollups, failure = load_rollups(
+                headers, 'activity', days, lambda missing: fetch_activity_days(headers, missing), activity_day_rollup
+            )
+            if failure:
+                current_app.logger.error(f"Some activity metrics failed: {failure[0]}")
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             current_app.logger.error(f"Error fetching multi-day activity data: {str(e)}")
     
@@ -619,11 +1197,15 @@ def get_activity():
         else:
             current_app.logger.error("No summary data in activity response!")
     else:
-        current_app.logger.info(f"Steps data: {len(activity_data.get('activities-steps', []))} points")
-        current_app.logger.info(f"Calories data: {len(activity_data.get('activities-calories', []))} points")
+        current_app.logger.info(f"Daily rollups: {len(rollups)} days")
     
     # Process the data
-    processed_data = process_activity_data(activity_data, period)
+    if period == 'day':
+        processed_data = process_activity_data(activity_data, period)
+    else:
+        # Only days Fitbit reported steps for get a row, as with the raw time series
+        step_days = {day: rollup for day, rollup in rollups.items() if 'steps' in rollup}
+        processed_data = [activity_row(start, rollup) for start, rollup in group_rollups(step_days, group)]
     
     # Log the processed data
     current_app.logger.info(f"Processed data has {len(processed_data)} points")
@@ -648,7 +1230,7 @@ def get_activity():
             # Make a direct debug request to verify API access - use try/except to prevent 500 errors
             try:
                 debug_url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/activities/date/{date}.json"
-                debug_data, debug_status = fitbit_request(debug_url, headers)
+                debug_data, debug_status = fitbit_request(debug_url, headers, use_cache=False)
                 current_app.logger.info(f"Debug API status: {debug_status}")
                 if debug_status == 200:
                     current_app.logger.info(f"Debug API summary: {debug_data.get('summary', {})}")
@@ -664,6 +1246,7 @@ def get_activity():
         'start_date': start_str,
         'end_date': end_str,
         'requested_date': date,  # Add the explicitly requested date
+        'group': group,
         'timestamp': _ts,  # Add the timestamp
         '_debug': True  # Debug flag
     }
@@ -733,7 +1316,7 @@ def get_status():
     current_app.logger.info("Verifying token with Fitbit API")
     url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/profile.json"
     try:
-        data, status_code = fitbit_request(url, headers)
+        data, status_code = fitbit_request(url, headers, use_cache=False)
         
         if status_code == 200:
             current_app.logger.info("Token verification successful - connected")
@@ -744,6 +1327,10 @@ def get_status():
             if status_code == 401:
                 session.pop('oauth_token', None)
             return jsonify({'connected': False})
+    except RateLimitExceeded:
+        # The token was fine when we last used it; we just can't check it right now
+        current_app.logger.warning("Token verification skipped - Fitbit rate limit reached")
+        return jsonify({'connected': True, 'rate_limited': True})
     except Exception as e:
         current_app.logger.error(f"Exception during token verification: {str(e)}")
         # Don't clear token on network/transient errors
@@ -756,6 +1343,14 @@ def disconnect():
     """Disconnect from Fitbit by removing the token from session"""
     current_app.logger.info("Fitbit disconnect endpoint called")
     
+    # Stop background syncing for this user and delete their synced days
+    token = session.get('oauth_token') or {}
+    if token.get('user_id'):
+        get_scheduler().unenroll('fitbit', token['user_id'])
+        get_store().delete_user(token['user_id'])
+    if token:
+        get_token_manager().forget('fitbit', token)
+    
     # Remove all Fitbit-related tokens from session
     session.pop('oauth_token', None)
     session.pop('oauth_state', None)
@@ -774,55 +1369,52 @@ def disconnect():
 @bp.route('/cache/clear', methods=['POST'])
 def clear_cache():
     """Clear the cache (admin endpoint)"""
-    global cache
-    cache = {}
+    cache.clear()
     return jsonify({'message': 'Cache cleared successfully'})
 
 
 @bp.route('/cache/stats', methods=['GET'])
 def cache_stats():
-    """Get cache statistics (admin endpoint)"""
-    return jsonify({
+    """
+    Get cache statistics (admin endpoint)
+
+    Only aggregate counters are returned; cache keys and rate limit buckets are
+    per user, so they are never exposed here.
+    """
+    return jsonify(dict(cache.stats(), **{
         'cache_size': len(cache),
-        'cache_keys': list(cache.keys())
-    })
+        'rate_limited_users': len(rate_limiter.stats()),
+        'coalesced_requests': flights.shared
+    }))
 
 
 # Bluetooth Low Energy (BLE) implementation for direct connection to Fitbit Charge 6
 async def handle_heart_rate_notification(sender, data):
     """Process heart rate notifications from the Fitbit device"""
-    # Heart rate data format according to BLE GATT standard
-    # First byte: Flags
-    # - Bit 0: Heart Rate Value Format (0: UINT8, 1: UINT16)
-    # - Bit 1: Sensor Contact Status (0: Not supported or not detected, 1: Supported and detected)
-    # - Bit 2: Sensor Contact Support (0: Not supported, 1: Supported)
-    # - Bit 3: Energy Expended Status (0: Not present, 1: Present)
-    # - Bit 4: RR-Interval (0: Not present, 1: Present)
-    # Second byte: Heart Rate Value (UINT8 or UINT16 depending on bit 0 of flags)
-    
-    flags = data[0]
-    value_format = flags & 0x01  # Get bit 0 (Heart Rate Value Format)
-    
-    if value_format == 0:
-        # UINT8 format
-        heart_rate = data[1]
-    else:
-        # UINT16 format (little endian)
-        heart_rate = int.from_bytes(data[1:3], byteorder='little')
+    # Decode the full GATT Heart Rate Measurement packet (bpm, contact, energy, RR intervals)
+    try:
+        measurement = parse_heart_rate_measurement(data)
+    except ValueError as e:
+        current_app.logger.warning(f"Ignoring BLE heart rate packet: {str(e)}")
+        return
     
-    timestamp = datetime.now().isoformat()
+    heart_rate = measurement['heart_rate']
+    rr_intervals = measurement['rr_intervals']
+    now = time.time()
     
     with bluetooth_lock:
-        # Store only 3600 data points (1 hour at 1 per second)
-        while len(bluetooth_hr_data) >= 3600:
-            oldest_timestamp = min(bluetooth_hr_data.keys())
-            bluetooth_hr_data.pop(oldest_timestamp)
+        # The ring buffer keeps the last hour and overwrites the oldest sample in O(1)
+        bluetooth_buffer.append(int(now * 1000), heart_rate, rr_intervals)
         
-        bluetooth_hr_data[timestamp] = {
-            'value': heart_rate,
-            'time': datetime.now().strftime('%H:%M:%S'),
-            'date': datetime.now().strftime('%Y-%m-%d')
-        }
+        # Update the live rhythm analysis incrementally (O(1) per sample)
+        bluetooth_monitor.add(heart_rate, now, rr_intervals)
+        
+        bluetooth_sensor_state['sensor_contact'] = measurement['sensor_contact']
+        if measurement['energy_expended'] is not None:
+            bluetooth_sensor_state['energy_expended'] = measurement['energy_expended']
+        
+        # Wake up any live streams waiting for new data
+        bluetooth_updated.notify_all()
     
     current_app.logger.info(f"BLE Heart Rate: {heart_rate} BPM")
 
@@ -965,46 +1557,129 @@ def disconnect_bluetooth():
 @bp.route('/bluetooth/status', methods=['GET'])
 def bluetooth_status():
     """Get current Bluetooth connection status"""
+    with bluetooth_lock:
+        data_points = len(bluetooth_buffer)
+        latest = bluetooth_buffer.latest()
+        sensor_state = dict(bluetooth_sensor_state)
+        rr_available = bluetooth_monitor.rr_supported
+    
+    latest_reading = None
+    if latest:
+        timestamp_ms, heart_rate = latest
+        reading_time = datetime.fromtimestamp(timestamp_ms / 1000)
+        latest_reading = {
+            'value': heart_rate,
+            'time': reading_time.strftime('%H:%M:%S'),
+            'date': reading_time.strftime('%Y-%m-%d')
+        }
+    
     return jsonify({
         "connected": bluetooth_connected,
-        "data_points": len(bluetooth_hr_data) if bluetooth_hr_data else 0,
-        "latest_reading": list(bluetooth_hr_data.values())[-1] if bluetooth_hr_data else None
+        "data_points": data_points,
+        "latest_reading": latest_reading,
+        "sensor_contact": sensor_state['sensor_contact'],
+        "energy_expended": sensor_state['energy_expended'],  # Cumulative kJ reported by the sensor
+        "rr_intervals_available": rr_available
     })
 
 
+def parse_stream_cursor(value):
+    """Parse a 'samples:events' stream cursor, returning None when missing or malformed"""
+    try:
+        sample_cursor, event_cursor = value.split(':')
+        return max(int(sample_cursor), 0), max(int(event_cursor), 0)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_stream_message(event, cursor, payload):
+    """Format a single Server-Sent Events message"""
+    return f"id: {cursor[0]}:{cursor[1]}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@bp.route('/bluetooth/stream', methods=['GET'])
+def stream_bluetooth_heart_rate():
+    """Push live Bluetooth heart rate samples and abnormal rhythm events as Server-Sent Events"""
+    # Resume from the Last-Event-ID header (sent by EventSource on reconnect) or ?cursor=
+    cursor = parse_stream_cursor(request.headers.get('Last-Event-ID')) or parse_stream_cursor(request.args.get('cursor'))
+    
+    if cursor is None:
+        # New subscribers only receive data that arrives from now on
+        with bluetooth_lock:
+            cursor = (bluetooth_buffer.total, bluetooth_monitor.finalized_total)
+    
+    def generate():
+        sample_cursor, event_cursor = cursor
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        
+        while time.monotonic() < deadline:
+            with bluetooth_updated:
+                if bluetooth_buffer.total <= sample_cursor and bluetooth_monitor.finalized_total <= event_cursor:
+                    bluetooth_updated.wait(timeout=min(STREAM_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0)))
+                
+                # Copy new data out of the ring buffer before releasing the lock
+                first, timestamps, values = bluetooth_buffer.since_cursor(sample_cursor)
+                samples = list(zip(timestamps.tolist(), values.tolist()))
+                sample_cursor = max(sample_cursor, first + len(samples))
+                previous_event_cursor = event_cursor
+                event_cursor, events = bluetooth_monitor.finalized_since(event_cursor)
+            
+            if not samples and not events:
+                yield ": heartbeat\n\n"
+                continue
+            
+            for timestamp_ms, heart_rate in samples:
+                reading_time = datetime.fromtimestamp(timestamp_ms / 1000)
+                # Each message id is the cursor to resume from once it has been received
+                yield format_stream_message('heart-rate', (first + 1, previous_event_cursor), {
+                    'value': heart_rate,
+                    'timestamp': timestamp_ms,
+                    'time': reading_time.strftime('%H:%M:%S'),
+                    'date': reading_time.strftime('%Y-%m-%d')
+                })
+                first += 1
+            
+            for idx, abnormal_event in enumerate(events):
+                yield format_stream_message('abnormal-rhythm', (sample_cursor, event_cursor - len(events) + idx + 1), abnormal_event)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable proxy buffering so events arrive immediately
+    return response
+
+
 @bp.route('/bluetooth/heart-rate', methods=['GET'])
 def get_bluetooth_heart_rate():
     """Get heart rate data collected via Bluetooth"""
     # Get query parameters
     period = request.args.get('period', 'day')  # day, hour, minute
+    max_points = parse_max_points(request.args)  # Optional chart point budget
+    
+    # Filter data based on period
+    window_seconds = {'minute': 60, 'hour': 3600, 'day': 86400}.get(period)
     
     with bluetooth_lock:
-        if not bluetooth_hr_data:
+        if not len(bluetooth_buffer):
             return jsonify({
                 'error': 'No Bluetooth heart rate data available',
                 'connected': bluetooth_connected
             }), 404
-            
-        # Filter data based on period
-        now = datetime.now()
-        filtered_data = []
-        
-        for timestamp, data in bluetooth_hr_data.items():
-            data_time = datetime.fromisoformat(timestamp)
-            
-            if period == 'minute' and (now - data_time).total_seconds() <= 60:
-                filtered_data.append(data)
-            elif period == 'hour' and (now - data_time).total_seconds() <= 3600:
-                filtered_data.append(data)
-            elif period == 'day' and (now - data_time).total_seconds() <= 86400:
-                filtered_data.append(data)
         
+        if window_seconds is None:
+            filtered_data = []
+        else:
+            # Slice the window out of the ring buffer and copy it before releasing the lock
+            since_ms = int((time.time() - window_seconds) * 1000)
+            filtered_data = HeartRateSeries.from_epoch_ms(*bluetooth_buffer.window(since_ms))
+    
     # Process the data similar to API data
-    processed_data = process_heart_rate_data({"activities-heart-intraday": {"dataset": filtered_data}}, period)
+    processed_data = process_heart_rate_data({"activities-heart-intraday": {"dataset": filtered_data}}, period, max_points)
     
-    # Check if data should be processed for abnormal rhythms
+    # Abnormal rhythms are tracked incrementally as notifications arrive
     if period in ['minute', 'hour']:
-        abnormal_events = detect_abnormal_rhythms(processed_data)
+        with bluetooth_lock:
+            abnormal_events = bluetooth_monitor.events(since=time.time() - window_seconds)
         return jsonify({
             'data': processed_data,
             'abnormal_events': abnormal_events,
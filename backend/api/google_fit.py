@@ -1,13 +1,25 @@
 import os
 import time
-import requests
 from flask import Blueprint, jsonify, request, redirect, session, current_app
 from functools import wraps
 from werkzeug.exceptions import HTTPException
 from urllib.parse import urlencode
 import json
+import hashlib
 import logging
 from datetime import datetime, timedelta
+import sys
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.downsampling import parse_max_points
+from utils.http_client import get_session
+from utils.cache import get_cache
+from utils.single_flight import SingleFlight
+from utils.json_stream import parse_list_response
+from utils.google_fit_heart_rate import GoogleFitHeartRate
+from utils.bucket_planner import plan_buckets, is_local_midnight
+from utils.sync_scheduler import get_scheduler
+from utils.token_manager import get_token_manager, TokenRefreshError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +27,20 @@ logger = logging.getLogger(__name__)
 
 google_fit_bp = Blueprint('google_fit', __name__)
 
+# Shared cache for dataset:aggregate responses
+data_cache = get_cache('google_fit')
+AGGREGATE_TTL_TODAY = 60  # Today's buckets keep filling in as the phone syncs
+AGGREGATE_TTL_HISTORICAL = 6 * 3600  # Past days rarely change
+AGGREGATE_TTL_SETTLED = 7 * 86400  # Slices that ended before late syncs could still land
+AGGREGATE_SETTLE_SECONDS = 2 * 86400
+
+# Identical aggregate requests already in flight share one upstream call
+aggregate_flights = SingleFlight()
+AGGREGATE_SLICE_WORKERS = 4  # Simultaneous slice requests for one long range
+
+# Days covered by multi-day activity views, ending on the requested date
+ACTIVITY_PERIOD_DAYS = {'week': 7, 'month': 30}
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -45,7 +71,7 @@ def check_required_scopes(token_info):
     return True
 
 def refresh_token_if_needed():
-    """Refresh the Google Fit token if it's expired"""
+    """Make sure the session holds a current Google Fit token, refreshing it if it has expired"""
     if 'google_fit_token' not in session:
         logger.error("No Google Fit token in session")
         return False
@@ -68,53 +94,71 @@ def refresh_token_if_needed():
             logger.error(f"Missing scopes: {[s for s in required if s not in scopes]}")
         return False
     
-    # Check if token is expired
-    if token_info.get('expires_at', 0) < time.time():
-        logger.info("Google Fit token expired, refreshing...")
-        try:
-            refresh_token = token_info.get('refresh_token')
-            if not refresh_token:
-                logger.error("No refresh token available")
-                return False
-                
-            client_id = current_app.config['GOOGLE_FIT_CLIENT_ID']
-            client_secret = current_app.config['GOOGLE_FIT_CLIENT_SECRET']
-            token_url = current_app.config['GOOGLE_FIT_TOKEN_URL']
-            
-            payload = {
-                'client_id': client_id,
-                'client_secret': client_secret,
-                'refresh_token': refresh_token,
-                'grant_type': 'refresh_token'
-            }
-            
-            logger.info(f"Refreshing token with client ID: {client_id}")
-            response = requests.post(token_url, data=payload)
-            
-            if response.status_code == 200:
-                new_token_info = response.json()
-                # Update token information but preserve refresh token
-                new_token_info['refresh_token'] = refresh_token
-                new_token_info['expires_at'] = time.time() + new_token_info.get('expires_in', 3600)
-                session['google_fit_token'] = new_token_info
-                
-                # Force session save
-                session.modified = True
-                
-                logger.info("Successfully refreshed Google Fit token")
-                
-                # Verify the new token has required scopes
-                return check_required_scopes(new_token_info)
-            else:
-                logger.error(f"Failed to refresh token: {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error refreshing token: {str(e)}")
-            return False
+    # The token manager refreshes tokens in the background before they expire; only a
+    # token that has already expired is refreshed here (shared with concurrent requests)
+    try:
+        current_token = get_token_manager().current('google_fit', token_info)
+    except Exception as e:
+        logger.error(f"Error refreshing token: {str(e)}")
+        return False
+    
+    if current_token.get('access_token') != token_info.get('access_token'):
+        session['google_fit_token'] = current_token
+        
+        # Force session save
+        session.modified = True
+        
+        # Verify the new token has required scopes
+        return check_required_scopes(current_token)
     
     return True
 
+def refresh_google_fit_token(token_info):
+    """
+    Token manager refresh function: exchange the refresh token for a new access token
+    
+    Args:
+        token_info (dict): Current token, including its refresh token
+    
+    Returns:
+        dict: New token info with the refresh token preserved and an absolute expires_at
+    
+    Raises:
+        TokenRefreshError: If there is no refresh token or Google rejects it
+    """
+    refresh_token = token_info.get('refresh_token')
+    if not refresh_token:
+        raise TokenRefreshError("No refresh token available")
+    
+    client_id = current_app.config['GOOGLE_FIT_CLIENT_ID']
+    client_secret = current_app.config['GOOGLE_FIT_CLIENT_SECRET']
+    token_url = current_app.config['GOOGLE_FIT_TOKEN_URL']
+    
+    payload = {
+        'client_id': client_id,
+        'client_secret': client_secret,
+        'refresh_token': refresh_token,
+        'grant_type': 'refresh_token'
+    }
+    
+    logger.info(f"Refreshing token with client ID: {client_id}")
+    response = get_session('google_fit').post(token_url, data=payload)
+    if response.status_code != 200:
+        raise TokenRefreshError(f"Failed to refresh token: {response.text}")
+    
+    new_token_info = response.json()
+    # Update token information but preserve refresh token
+    new_token_info['refresh_token'] = refresh_token
+    new_token_info['expires_at'] = time.time() + new_token_info.get('expires_in', 3600)
+    
+    # Background sync jobs use the new token from now on
+    get_scheduler().enroll('google_fit', get_cache_user(new_token_info), new_token_info)
+    
+    logger.info("Successfully refreshed Google Fit token")
+    return new_token_info
+
+get_token_manager().register('google_fit', refresh_google_fit_token)
+
 @google_fit_bp.route('/auth')
 def auth():
     """Initiate Google Fit OAuth flow"""
@@ -180,7 +224,7 @@ def callback():
             'redirect_uri': redirect_uri
         }
         
-        response = requests.post(token_url, data=payload)
+        response = get_session('google_fit').post(token_url, data=payload)
         
         if response.status_code != 200:
             logger.error(f"Token exchange failed: {response.text}")
@@ -195,6 +239,10 @@ def callback():
         session['google_fit_token'] = token_info
         session['google_fit_oauth_state'] = 'authenticated'
         
+        # Warm this user's recent days in the background so the first dashboard load is served from cache
+        get_scheduler().enroll('google_fit', get_cache_user(token_info), token_info)
+        get_token_manager().track('google_fit', token_info)
+        
         logger.info("Successfully authenticated with Google Fit")
         
         # Redirect to the frontend
@@ -221,7 +269,7 @@ def get_profile():
     
     try:
         # Get user profile from Google's userinfo endpoint
-        response = requests.get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
+        response = get_session('google_fit').get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
         
         if response.status_code != 200:
             logger.error(f"Failed to get user profile: {response.text}")
@@ -246,6 +294,270 @@ def get_profile():
         return jsonify({"error": f"Failed to get user profile: {str(e)}"}), 500
 
 # Function to parse date parameter from frontend
+def get_cache_user(token_info=None):
+    """Stable identity for the signed-in Google Fit user, so cached data is never shared between users"""
+    if token_info is None:
+        token_info = session.get('google_fit_token') or {}
+    identity = token_info.get('refresh_token') or token_info.get('access_token') or ''
+    return hashlib.md5(identity.encode()).hexdigest()
+
+def aggregate_ttl(end_time, now=None):
+    """
+    Cache lifetime for aggregate data ending at end_time (unix seconds)
+    
+    Data reaching into today keeps changing; recent days can still receive
+    late phone syncs; anything older is settled.
+    """
+    now = now or time.time()
+    today_start = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    if end_time > today_start:
+        return AGGREGATE_TTL_TODAY
+    if end_time > now - AGGREGATE_SETTLE_SECONDS:
+        return AGGREGATE_TTL_HISTORICAL
+    return AGGREGATE_TTL_SETTLED
+
+def fetch_aggregate(api_url, headers, body, cache_key, ttl, user=None):
+    """
+    POST a dataset:aggregate request, serving repeats from the shared cache
+    
+    Concurrent requests for the same user and cache key wait on a single
+    upstream call and share its decoded result. Background sync jobs pass
+    ``user`` explicitly since they have no session.
+    
+    Returns:
+        tuple: (decoded response, or error text, status code)
+    """
+    key = f"{user or get_cache_user()}:{cache_key}"
+    cached = data_cache.get(key)
+    if cached is not None:
+        logger.info(f"Serving {cache_key} from cache")
+        return cached, 200
+    
+    return aggregate_flights.do(key, post_aggregate, api_url, headers, body, key, ttl)
+
+def post_aggregate(api_url, headers, body, key, ttl):
+    """POST the aggregate request upstream and cache a successful response (unless ttl is None)"""
+    response = get_session('google_fit').post(api_url, headers=headers, json=body, stream=True)
+    try:
+        if response.status_code != 200:
+            return response.text, response.status_code
+        
+        # Decode bucket by bucket as the body arrives instead of buffering the whole body first
+        data, size = parse_list_response(response, 'bucket')
+    finally:
+        response.close()
+    
+    if ttl is not None:
+        data_cache.set(key, data, ttl, size=size)
+    return data, response.status_code
+
+def fetch_aggregate_slices(api_url, headers, name, make_body, slices, user=None):
+    """
+    Fetch a time range as separate slices, concurrently, and merge their buckets
+    
+    Each slice is its own dataset:aggregate call on the pooled session and is
+    cached under its own time range, so a calendar day or week fetched for
+    one view serves every other view that contains it. Slices that reach
+    into today are keyed by their start alone and expire quickly, since
+    their end moves with the clock. A leading slice that doesn't start at
+    local midnight belongs to this range alone and isn't cached. A long
+    range takes about as long as its slowest slice instead of one request
+    for the whole range.
+    
+    Args:
+        api_url (str): dataset:aggregate URL
+        headers (dict): Request headers
+        name (str): Cache key prefix identifying the query (data type and bucket size)
+        make_body (callable): Builds the request body for (start_time, end_time)
+        slices (list): (start_time, end_time) unix-second pairs in time order
+        user (str, optional): Cache user, for callers without a session
+    
+    Returns:
+        tuple: (response with every slice's buckets in time order, or the first error text, status code)
+    """
+    user = user or get_cache_user()
+    
+    def fetch_slice(time_slice):
+        start, end = time_slice
+        ttl = aggregate_ttl(end) if is_local_midnight(start) else None
+        cache_key = f"{name}_{start}_open" if ttl == AGGREGATE_TTL_TODAY else f"{name}_{start}_{end}"
+        return fetch_aggregate(api_url, headers, make_body(start, end), cache_key, ttl, user=user)
+    
+    if len(slices) == 1:
+        return fetch_slice(slices[0])
+    
+    with ThreadPoolExecutor(max_workers=min(AGGREGATE_SLICE_WORKERS, len(slices))) as executor:
+        results = list(executor.map(fetch_slice, slices))
+    
+    buckets = []
+    for data, status_code in results:
+        if status_code != 200:
+            return data, status_code
+        buckets.extend(data.get('bucket', []))
+    logger.info(f"Merged {len(buckets)} {name} buckets from {len(slices)} slices")
+    return {'bucket': buckets}, 200
+
+def heart_rate_aggregate_body(start_time, end_time, duration_ms=15000):
+    """dataset:aggregate request body for heart rate between two unix timestamps (15-second buckets by default)"""
+    return {
+        "aggregateBy": [{
+            "dataTypeName": "com.google.heart_rate.bpm",
+            "dataSourceId": "derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm"
+        }],
+        "bucketByTime": {"durationMillis": duration_ms},
+        "startTimeMillis": int(start_time) * 1000,
+        "endTimeMillis": int(end_time) * 1000
+    }
+
+def fetch_heart_rate_aggregate(api_url, headers, start_time, end_time, period, max_points, user=None):
+    """
+    Fetch heart rate buckets sized for the period and point budget
+    
+    The bucket size comes from plan_buckets, and the range is fetched in
+    day or week slices small enough for one request each.
+    
+    Returns:
+        tuple: (decoded response, or error text, status code)
+    """
+    plan = plan_buckets(period, max_points)
+    slices = plan.slices(int(start_time), int(end_time))
+    logger.info(f"Heart rate plan for {period} (max_points={max_points}): "
+                f"{plan.duration_ms // 1000}s buckets in {len(slices)} slice(s)")
+    
+    return fetch_aggregate_slices(
+        api_url, headers, f"heart_rate_{plan.duration_ms // 1000}s",
+        lambda start, end: heart_rate_aggregate_body(start, end, plan.duration_ms),
+        slices, user=user)
+
+def fetch_activity_aggregate(api_url, headers, start_time, end_time, date_str, user=None):
+    """
+    Fetch the daily activity buckets of a day view in one call
+    
+    The range runs from 22:00 the evening before to past midnight after the
+    requested date, so it is never sliced: a cut at midnight would add a
+    bucket and move the first one off the requested day.
+    
+    Returns:
+        tuple: (decoded response, or error text, status code)
+    """
+    return fetch_aggregate(api_url, headers, activity_aggregate_body(start_time, end_time),
+                           f"activity_{date_str}_day", aggregate_ttl(end_time), user=user)
+
+def day_bounds(date_str):
+    """Local midnight-to-midnight unix timestamps of a YYYY-MM-DD date"""
+    day = datetime.strptime(date_str, '%Y-%m-%d')
+    return int(day.timestamp()), int((day + timedelta(days=1)).timestamp())
+
+def bucket_date(bucket):
+    """Local date of a daily bucket, read at its midpoint so a DST shift can't move it to a neighbouring day"""
+    start = int(bucket['startTimeMillis'])
+    end = int(bucket.get('endTimeMillis', start + 86400000))
+    return time.strftime('%Y-%m-%d', time.localtime((start + end) / 2000))
+
+def fetch_activity_days(api_url, headers, dates, user=None):
+    """
+    Get one daily activity bucket per date
+    
+    Each day's bucket is cached on its own. The days that aren't cached are
+    fetched together in a single aggregate call with daily buckets starting
+    at local midnight, however many there are.
+    
+    Args:
+        dates (list): YYYY-MM-DD dates in ascending order
+        user (str, optional): Cache user, for callers without a session
+    
+    Returns:
+        tuple: ({date: bucket} for the dates Google Fit returned, or error text, status code)
+    """
+    user = user or get_cache_user()
+    buckets = {}
+    missing = []
+    for date in dates:
+        cached = data_cache.get(f"{user}:activity_day_{date}")
+        if cached is None:
+            missing.append(date)
+        else:
+            buckets[date] = cached
+    
+    if not missing:
+        logger.info(f"Serving activity for {len(dates)} days from cache")
+        return buckets, 200
+    
+    start_time = day_bounds(missing[0])[0]
+    end_time = min(day_bounds(missing[-1])[1], int(time.time()))
+    key = f"{user}:activity_days_{missing[0]}_{missing[-1]}"
+    logger.info(f"Fetching activity for {len(missing)} uncached days ({missing[0]} to {missing[-1]}) in one request")
+    data, status_code = aggregate_flights.do(key, post_aggregate, api_url, headers,
+                                             activity_aggregate_body(start_time, end_time), key, None)
+    if status_code != 200:
+        return data, status_code
+    
+    wanted = set(missing)
+    for bucket in data.get('bucket', []):
+        date = bucket_date(bucket)
+        if date in wanted:
+            data_cache.set(f"{user}:activity_day_{date}", bucket, aggregate_ttl(day_bounds(date)[1]))
+            buckets[date] = bucket
+    return buckets, 200
+
+def activity_aggregate_body(start_time, end_time):
+    """dataset:aggregate request body for steps, calories and active minutes in daily buckets"""
+    return {
+        "aggregateBy": [
+            {
+                "dataTypeName": "com.google.step_count.delta"
+            },
+            {
+                "dataTypeName": "com.google.calories.expended"
+            },
+            {
+                "dataTypeName": "com.google.active_minutes"
+            }
+        ],
+        "bucketByTime": {"durationMillis": 86400000},  # Daily buckets
+        "startTimeMillis": int(start_time) * 1000,
+        "endTimeMillis": int(end_time) * 1000
+    }
+
+def sync_google_fit_user(user_id, token_info, cursor):
+    """
+    Background sync job: warm the aggregate cache with a user's past days
+    
+    Requests the same day views (and cache keys) as the /heart-rate and
+    /activity handlers for SYNC_HEART_RATE_DAYS and SYNC_BACKFILL_DAYS days
+    before today, plus the per-day activity buckets used by multi-day
+    activity views. Days that are still cached are skipped by fetch_aggregate,
+    so after the backfill each run only fetches days that were never
+    fetched or have expired.
+    
+    Returns:
+        str: Last day synced
+    """
+    if token_info.get('expires_at', 0) < time.time():
+        raise RuntimeError("Google Fit token expired; waiting for the user to refresh it")
+    
+    headers = {
+        'Authorization': f"Bearer {token_info.get('access_token')}",
+        'Content-Type': 'application/json'
+    }
+    api_url = f"{current_app.config['GOOGLE_FIT_API_BASE_URL']}/users/me/dataset:aggregate"
+    today = datetime.now()
+    
+    for offset in range(1, current_app.config['SYNC_BACKFILL_DAYS'] + 1):
+        start_time, end_time, date_str = parse_date_param((today - timedelta(days=offset)).strftime('%Y-%m-%d'))
+        fetch_activity_aggregate(api_url, headers, start_time, end_time, date_str, user=user_id)
+        if offset <= current_app.config['SYNC_HEART_RATE_DAYS']:
+            fetch_heart_rate_aggregate(api_url, headers, start_time, end_time, 'day', None, user=user_id)
+    
+    # Per-day buckets behind the week and month activity views, in one call
+    backfill_dates = [(today - timedelta(days=offset)).strftime('%Y-%m-%d')
+                      for offset in range(current_app.config['SYNC_BACKFILL_DAYS'], 0, -1)]
+    fetch_activity_days(api_url, headers, backfill_dates, user=user_id)
+    
+    return (today - timedelta(days=1)).strftime('%Y-%m-%d')
+
+get_scheduler().register('google_fit', sync_google_fit_user)
+
 def parse_date_param(date_param):
     """Parse date parameter and return start/end time in unix timestamp"""
     today = datetime.now()
@@ -318,6 +630,7 @@ def get_heart_rate():
     # Get date parameter from frontend (in YYYY-MM-DD format)
     date_param = request.args.get('date')
     period = request.args.get('period', 'day')
+    max_points = parse_max_points(request.args)  # Optional chart point budget
     
     # Add a timestamp to prevent caching issues
     request_timestamp = request.args.get('_ts', str(int(time.time())))
@@ -351,13 +664,6 @@ def get_heart_rate():
     logger.info(f"Date string parameter: {date_param}, Parsed date: {date_str}")
     logger.info(f"Date range: {datetime.fromtimestamp(start_time)} to {datetime.fromtimestamp(end_time)}")
     
-    # Clear any previous data from cache
-    current_app.config.setdefault('GOOGLE_FIT_DATA_CACHE', {})
-    cache_key = f"heart_rate_{date_str}_{period}"
-    if cache_key in current_app.config['GOOGLE_FIT_DATA_CACHE']:
-        logger.info(f"Clearing cached data for {cache_key}")
-        del current_app.config['GOOGLE_FIT_DATA_CACHE'][cache_key]
-    
     token_info = session['google_fit_token']
     access_token = token_info.get('access_token')
     
@@ -366,9 +672,6 @@ def get_heart_rate():
         'Content-Type': 'application/json'
     }
     
-    # Prepare data source for heart rate
-    data_source = "derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm"
-    
     # Log the time range for debugging
     start_datetime = datetime.fromtimestamp(start_time)
     end_datetime = datetime.fromtimestamp(end_time)
@@ -380,31 +683,21 @@ def get_heart_rate():
     api_url = f"{current_app.config['GOOGLE_FIT_API_BASE_URL']}/users/me/dataset:aggregate"
     use_raw_endpoint = False
     
-    # Create body for request (needed for aggregate endpoint)
-    body = {
-        "aggregateBy": [{
-            "dataTypeName": "com.google.heart_rate.bpm",
-            "dataSourceId": data_source
-        }],
-        "bucketByTime": {"durationMillis": 15000},  # 15-second intervals for higher resolution
-        "startTimeMillis": int(start_time) * 1000,
-        "endTimeMillis": int(end_time) * 1000
-    }
-    
     try:
         # Use the correct API URL based on which endpoint we're using
         if use_raw_endpoint:
             # For raw data endpoint
-            response = requests.get(api_url, headers=headers)
+            response = get_session('google_fit').get(api_url, headers=headers)
+            data = response.json() if response.status_code == 200 else response.text
+            status_code = response.status_code
         else:
-            # For aggregate endpoint
-            response = requests.post(api_url, headers=headers, json=body)
+            # For aggregate endpoint; bucket size follows the period and point budget, and
+            # the range is fetched (and cached) in calendar slices
+            data, status_code = fetch_heart_rate_aggregate(api_url, headers, start_time, end_time, period, max_points)
         
-        if response.status_code != 200:
-            logger.error(f"Failed to get heart rate data: {response.text}")
-            return jsonify({"error": "Failed to get heart rate data"}), response.status_code
-            
-        data = response.json()
+        if status_code != 200:
+            logger.error(f"Failed to get heart rate data: {data}")
+            return jsonify({"error": "Failed to get heart rate data"}), status_code
         
         # Log a sample of the raw response for debugging
         if data and 'bucket' in data and data['bucket']:
@@ -428,170 +721,58 @@ def get_heart_rate():
                             logger.info(f"Point has direct startTimeMillis: {sample_point['startTimeMillis']}")
                         break
             
-            # Additional diagnostics for heartrate data
-            heart_rate_data_points = 0
-            unique_bucket_times = set()
-            unique_point_times = set()
-            
-            for bucket in data['bucket'][:10]:  # Check first 10 buckets
-                bucket_time = bucket.get('startTimeMillis')
-                if bucket_time:
-                    unique_bucket_times.add(bucket_time)
-                
-                if 'dataset' in bucket:
-                    for dataset in bucket['dataset']:
-                        if 'point' in dataset:
-                            for point in dataset['point']:
-                                heart_rate_data_points += 1
-                                point_time = point.get('startTimeMillis') or point.get('startTimeNanos')
-                                if point_time:
-                                    unique_point_times.add(point_time)
-            
-            logger.info(f"First 10 buckets diagnostics: {heart_rate_data_points} points, {len(unique_bucket_times)} unique bucket times, {len(unique_point_times)} unique point times")
-        
-        # Process the response to extract heart rate values
-        heart_rate_data = []
-        requested_date_start = datetime.fromtimestamp(start_time).replace(hour=0, minute=0, second=0)
-        requested_date_end = requested_date_start + timedelta(days=1)
-        logger.info(f"Filtering data for date range: {requested_date_start} to {requested_date_end}")
+        # Decode every bucket into sample arrays in one pass
+        samples = GoogleFitHeartRate.from_aggregate(data)
+        logger.info(f"Decoded {len(samples)} heart rate points from {len(data.get('bucket', []))} buckets")
         
-        if 'bucket' in data:
-            for bucket in data['bucket']:
-                if 'dataset' in bucket:
-                    for dataset in bucket['dataset']:
-                        if 'point' in dataset:
-                            for point in dataset['point']:
-                                if 'value' in point:
-                                    for value in point['value']:
-                                        if 'fpVal' in value:  # Heart rate value
-                                            # CRITICAL CHANGE: Google Fit has several ways of representing time
-                                            # 1. Check for startTimeMillis (milliseconds since epoch)
-                                            # 2. Check for startTimeNanos (nanoseconds since epoch)
-                                            # 3. Fall back to bucket time as last resort
-                                            
-                                            if 'startTimeMillis' in point:
-                                                # Direct millisecond timestamp
-                                                timestamp = int(int(point['startTimeMillis']) / 1000)  # Convert to seconds
-                                                logger.debug(f"Using point startTimeMillis: {point['startTimeMillis']}")
-                                            elif 'startTimeNanos' in point:
-                                                # Nanosecond timestamp (common in Google Fit)
-                                                timestamp = int(int(point['startTimeNanos']) / 1000000000)  # Convert to seconds
-                                                logger.debug(f"Using point startTimeNanos: {point['startTimeNanos']}")
-                                            else:
-                                                # Last resort - bucket time 
-                                                timestamp = int(int(bucket['startTimeMillis']) / 1000)
-                                                logger.debug(f"Falling back to bucket time: {bucket['startTimeMillis']}")
-                                            
-                                            heart_rate = value['fpVal']
-                                            
-                                            # Log the timestamp details for debugging
-                                            logger.debug(f"Point timestamp: {timestamp}, Value: {heart_rate}")
-                                            
-                                            # Convert timestamp to readable time format
-                                            time_obj = datetime.fromtimestamp(timestamp)
-                                            time_str = time_obj.strftime('%I:%M:%S %p')  # 12-hour format with AM/PM
-                                            point_date_str = time_obj.strftime('%Y-%m-%d')
-                                            
-                                            # CRITICAL: Check if this point belongs to the requested date
-                                            # When viewing a specific day's data, only include points from that day
-                                            if period == 'day' and point_date_str != date_str and not is_today:
-                                                # Skip points that don't match the requested date (unless today)
-                                                # We include all points for today regardless of date to get real-time updates
-                                                logger.debug(f"Skipping point with date {point_date_str} - doesn't match requested date {date_str}")
-                                                continue
-                                                
-                                            # Add extra debug logging for today's request to verify filtering
-                                            if is_today and point_date_str != date_str:
-                                                logger.info(f"Including non-today point in today's request: date={point_date_str}, time={time_str}, value={heart_rate}")
-                                            
-                                            # Format for consistency with Fitbit API
-                                            heart_rate_data.append({
-                                                "timestamp": timestamp,
-                                                "value": heart_rate,
-                                                "time": time_str,
-                                                "date": point_date_str,
-                                                "source": "googleFit"  # Add source for tracking
-                                            })
+        # CRITICAL: When viewing a specific past day, only include points from that day
+        # We include all points for today regardless of date to get real-time updates
+        if period == 'day' and not is_today:
+            filtered = samples.on_date(date_str)
+            logger.info(f"Date filtering applied: {len(samples)} points -> {len(filtered)} points")
+            samples = filtered
         
         # Log data counts by date for debugging
-        date_counts = {}
-        for point in heart_rate_data:
-            date = point['date']
-            if date not in date_counts:
-                date_counts[date] = 0
-            date_counts[date] += 1
-        
+        date_counts = samples.date_counts()
         logger.info(f"Heart rate data points by date: {date_counts}")
         
         # Check if we have data
-        if not heart_rate_data:
+        if not len(samples):
             logger.warning(f"No heart rate data found for period {period} from {start_time} to {end_time}")
-            # Current date check for better error messaging
-            today_date = datetime.now().strftime('%Y-%m-%d')
-            requested_date = datetime.fromtimestamp(start_time).strftime('%Y-%m-%d')
-            is_today = (requested_date == today_date)
-            
             if is_today:
                 logger.info("Request is for current day data. This is normal if no data exists for today yet.")
         
         # For today's data, always add a current time marker to extend the chart
+        has_marker = False
         if is_today:
-            # Check if we already have recent data
             current_time = datetime.now()
             current_timestamp = int(current_time.timestamp())
-            current_time_str = current_time.strftime('%I:%M:%S %p')
-            
-            # Get the latest data point timestamp
-            latest_timestamp = 0
-            if heart_rate_data:
-                latest_timestamp = max(point['timestamp'] for point in heart_rate_data)
             
             # Only add a current time marker if the most recent data is more than 5 minutes old
-            time_gap = current_timestamp - latest_timestamp
-            if time_gap > 300:  # 5 minutes in seconds
-                logger.info(f"Adding current time marker at {current_time_str}")
-                
-                # If there's existing data, use the last value as an approximation
-                last_value = 70  # Default value if no data
-                if heart_rate_data:
-                    # Find the most recent value
-                    last_value = heart_rate_data[-1]['value']
-                
-                # Add current time marker with the last known value
-                heart_rate_data.append({
-                    "timestamp": current_timestamp,
-                    "value": last_value,  # Use last known value
-                    "time": current_time_str,
-                    "date": current_time.strftime('%Y-%m-%d'),
-                    "source": "googleFit",
-                    "isCurrentMarker": True  # Flag to identify this as current time marker
-                })
-                
-                # Log the addition
-                logger.info(f"Added current time marker with value {last_value}")
+            latest_timestamp = int(samples.timestamps.max()) if len(samples) else 0
+            if current_timestamp - latest_timestamp > 300:  # 5 minutes in seconds
+                # Use the last known value as an approximation (default if there's no data)
+                last_value = samples.bpm[-1].item() if len(samples) else 70
+                logger.info(f"Adding current time marker at {current_time.strftime('%I:%M:%S %p')} with value {last_value}")
+                samples = samples.append(current_timestamp, last_value)
+                has_marker = True
             else:
                 logger.info(f"Recent data exists (within 5 minutes), not adding current time marker")
         
-        # Check if we have data for the full day (or at least past noon)
-        latest_time = "00:00:00"
-        if heart_rate_data:
-            for point in heart_rate_data:
-                if point.get('time', '') > latest_time:
-                    latest_time = point['time']
-            
-            # Log the time range of data
-            earliest_time = heart_rate_data[0]['time'] if heart_rate_data else "unknown"
-            logger.info(f"Heart rate data time range: {earliest_time} to {latest_time}")
+        # Downsample to the requested point budget while preserving the curve shape,
+        # then format times only for the rows that are returned
+        if max_points and len(samples) > max_points:
+            heart_rate_data = samples.rows(samples.lttb(max_points))
+            logger.info(f"LTTB downsampling applied: {len(samples)} points -> {len(heart_rate_data)} points")
+        else:
+            heart_rate_data = samples.rows()
         
-        # IMPORTANT: Apply strict date filtering if we're still seeing incorrect dates
-        # This is a final safety check to ensure we only return data for the requested date
-        if period == 'day' and not is_today:
-            # Filter to keep only data from the requested date
-            filtered_data = [point for point in heart_rate_data if point['date'] == date_str]
-            logger.info(f"Strict date filtering applied: {len(heart_rate_data)} points -> {len(filtered_data)} points")
-            
-            # Replace with filtered data
-            heart_rate_data = filtered_data
+        if has_marker:
+            heart_rate_data[-1]['value'] = last_value
+            heart_rate_data[-1]['isCurrentMarker'] = True  # Flag to identify this as current time marker
+        
+        if heart_rate_data:
+            logger.info(f"Heart rate data time range: {heart_rate_data[0]['time']} to {heart_rate_data[-1]['time']}")
         
         # Format the response to match the Fitbit API format
         response_data = {
@@ -619,6 +800,57 @@ def get_heart_rate():
         logger.error(f"Error getting heart rate data: {str(e)}")
         return jsonify({"error": f"Failed to get heart rate data: {str(e)}"}), 500
 
+def activity_row(bucket, date_str):
+    """
+    Sum an aggregate bucket's steps, calories and active minutes into one activity row
+    
+    Args:
+        bucket (dict): dataset:aggregate bucket
+        date_str (str): Date (YYYY-MM-DD) to label the row with
+    
+    Returns:
+        dict: Activity row in the same format as the Fitbit endpoints
+    """
+    day_data = {
+        "date": date_str,
+        "dateTime": date_str,  # Add dateTime field for frontend compatibility
+        "steps": 0,
+        "calories": 0,
+        "activeMinutes": 0
+    }
+    
+    if 'dataset' in bucket:
+        for dataset in bucket['dataset']:
+            logger.info(f"Processing dataset: {dataset.get('dataSourceId', 'unknown')}")
+            if 'point' in dataset:
+                for point in dataset['point']:
+                    if 'value' in point:
+                        for value in point['value']:
+                            if ('step_count' in dataset['dataSourceId'] or 
+                                'estimated_steps' in dataset['dataSourceId'] or
+                                'aggregated' in dataset['dataSourceId']) and 'intVal' in value:
+                                day_data['steps'] += value['intVal']
+                                logger.info(f"Added {value['intVal']} steps, total now: {day_data['steps']}")
+                            elif 'calories' in dataset['dataSourceId'] and 'fpVal' in value:
+                                # Google Fit often reports total burned calories including BMR (basal metabolic rate)
+                                # To get active calories only, we need to scale this value
+                                calories_value = value['fpVal']
+                                # If the value seems too large for the step count (typical range: ~40-50 calories per 1000 steps)
+                                if calories_value > day_data['steps'] * 0.1 and day_data['steps'] > 0:
+                                    # Scale down to a more realistic value - max ~0.05 calories per step
+                                    scaled_calories = min(calories_value, day_data['steps'] * 0.05)
+                                    day_data['calories'] += scaled_calories
+                                else:
+                                    day_data['calories'] += calories_value
+                                logger.info(f"Added {value['fpVal']} calories, total now: {day_data['calories']}")
+                            elif 'active_minutes' in dataset['dataSourceId'] and 'intVal' in value:
+                                day_data['activeMinutes'] += value['intVal']
+                                logger.info(f"Added {value['intVal']} active minutes, total now: {day_data['activeMinutes']}")
+    
+    # Calculate distance based on steps (approximation if not available)
+    day_data['distance'] = round(day_data['steps'] / 2000, 2)  # Rough approximation: 2000 steps ≈ 1 mile
+    return day_data
+
 @google_fit_bp.route('/activity')
 @login_required
 def get_activity():
@@ -649,33 +881,17 @@ def get_activity():
         'Content-Type': 'application/json'
     }
     
-    # Create body for request - get steps, calories, and active minutes
-    body = {
-        "aggregateBy": [
-            {
-                "dataTypeName": "com.google.step_count.delta"
-            },
-            {
-                "dataTypeName": "com.google.calories.expended"
-            },
-            {
-                "dataTypeName": "com.google.active_minutes"
-            }
-        ],
-        "bucketByTime": {"durationMillis": 86400000},  # Daily buckets
-        "startTimeMillis": int(start_time) * 1000,
-        "endTimeMillis": int(end_time) * 1000
-    }
+    if period in ACTIVITY_PERIOD_DAYS:
+        return get_multi_day_activity(headers, date_str, period)
     
     try:
         api_url = f"{current_app.config['GOOGLE_FIT_API_BASE_URL']}/users/me/dataset:aggregate"
-        response = requests.post(api_url, headers=headers, json=body)
+        # Steps, calories and active minutes in daily buckets
+        data, status_code = fetch_activity_aggregate(api_url, headers, start_time, end_time, date_str)
         
-        if response.status_code != 200:
-            logger.error(f"Failed to get activity data: {response.text}")
-            return jsonify({"error": "Failed to get activity data"}), response.status_code
-            
-        data = response.json()
+        if status_code != 200:
+            logger.error(f"Failed to get activity data: {data}")
+            return jsonify({"error": "Failed to get activity data"}), status_code
         
         # Log the raw data structure for debugging
         logger.info(f"Google Fit activity response structure: {json.dumps(data, indent=2)[:500]}...")
@@ -685,16 +901,6 @@ def get_activity():
         
         if 'bucket' in data:
             for bucket in data['bucket']:
-                # CRITICAL: Always use the requested date, not the bucket date
-                # This ensures we're returning data for the day the user actually requested
-                day_data = {
-                    "date": date_str,  # Use the explicitly requested date
-                    "dateTime": date_str,  # Add dateTime field for frontend compatibility
-                    "steps": 0,
-                    "calories": 0,
-                    "activeMinutes": 0
-                }
-                
                 bucket_date = time.strftime('%Y-%m-%d', time.localtime(int(bucket['startTimeMillis']) / 1000))
                 logger.info(f"Processing bucket with date {bucket_date}, looking for data on {date_str}")
                 
@@ -713,36 +919,9 @@ def get_activity():
                 
                 logger.info(f"Including bucket from {bucket_date} for requested date {date_str} (diff: {date_diff} days)")
                     
-                if 'dataset' in bucket:
-                    for dataset in bucket['dataset']:
-                        logger.info(f"Processing dataset: {dataset.get('dataSourceId', 'unknown')}")
-                        if 'point' in dataset:
-                            for point in dataset['point']:
-                                if 'value' in point:
-                                    for value in point['value']:
-                                        if ('step_count' in dataset['dataSourceId'] or 
-                                            'estimated_steps' in dataset['dataSourceId'] or
-                                            'aggregated' in dataset['dataSourceId']) and 'intVal' in value:
-                                            day_data['steps'] += value['intVal']
-                                            logger.info(f"Added {value['intVal']} steps, total now: {day_data['steps']}")
-                                        elif 'calories' in dataset['dataSourceId'] and 'fpVal' in value:
-                                            # Google Fit often reports total burned calories including BMR (basal metabolic rate)
-                                            # To get active calories only, we need to scale this value
-                                            calories_value = value['fpVal']
-                                            # If the value seems too large for the step count (typical range: ~40-50 calories per 1000 steps)
-                                            if calories_value > day_data['steps'] * 0.1 and day_data['steps'] > 0:
-                                                # Scale down to a more realistic value - max ~0.05 calories per step
-                                                scaled_calories = min(calories_value, day_data['steps'] * 0.05)
-                                                day_data['calories'] += scaled_calories
-                                            else:
-                                                day_data['calories'] += calories_value
-                                            logger.info(f"Added {value['fpVal']} calories, total now: {day_data['calories']}")
-                                        elif 'active_minutes' in dataset['dataSourceId'] and 'intVal' in value:
-                                            day_data['activeMinutes'] += value['intVal']
-                                            logger.info(f"Added {value['intVal']} active minutes, total now: {day_data['activeMinutes']}")
-                
-                # Calculate distance based on steps (approximation if not available)
-                day_data['distance'] = round(day_data['steps'] / 2000, 2)  # Rough approximation: 2000 steps ≈ 1 mile
+                # CRITICAL: Always use the requested date, not the bucket date
+                # This ensures we're returning data for the day the user actually requested
+                day_data = activity_row(bucket, date_str)
                 
                 logger.info(f"Processed activity data for {day_data['date']}: {day_data}")
                 activity_data.append(day_data)
@@ -783,6 +962,47 @@ def get_activity():
         logger.error(f"Error getting activity data: {str(e)}")
         return jsonify({"error": f"Failed to get activity data: {str(e)}"}), 500
 
+def get_multi_day_activity(headers, date_str, period):
+    """
+    Activity rows for the ACTIVITY_PERIOD_DAYS days ending on date_str, one per day
+    
+    Every row is labelled with its own bucket's date, and all uncached days
+    come from a single aggregate call (see fetch_activity_days).
+    """
+    end_day = datetime.strptime(date_str, '%Y-%m-%d')
+    dates = [(end_day - timedelta(days=offset)).strftime('%Y-%m-%d')
+             for offset in range(ACTIVITY_PERIOD_DAYS[period] - 1, -1, -1)]
+    start_time = day_bounds(dates[0])[0]
+    end_time = min(day_bounds(dates[-1])[1], int(time.time()))
+    
+    try:
+        api_url = f"{current_app.config['GOOGLE_FIT_API_BASE_URL']}/users/me/dataset:aggregate"
+        buckets, status_code = fetch_activity_days(api_url, headers, dates)
+        
+        if status_code != 200:
+            logger.error(f"Failed to get activity data: {buckets}")
+            return jsonify({"error": "Failed to get activity data"}), status_code
+        
+        activity_data = [activity_row(buckets[date], date) for date in dates if date in buckets]
+        
+        logger.info(f"Returning {len(activity_data)} days of activity data for {period} ending {date_str}")
+        return jsonify({
+            'data': activity_data,
+            'period': period,
+            'start_date': dates[0],
+            'end_date': dates[-1],
+            'data_points_count': len(activity_data),
+            'requested_date': date_str,
+            'time_range': {
+                'start': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time)),
+                'end': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time)),
+            }
+        })
+    
+    except Exception as e:
+        logger.error(f"Error getting activity data: {str(e)}")
+        return jsonify({"error": f"Failed to get activity data: {str(e)}"}), 500
+
 @google_fit_bp.route('/sleep')
 @login_required
 def get_sleep():
@@ -832,7 +1052,7 @@ def get_sleep():
     }
     
     try:
-        response = requests.get(api_url, headers=headers, params=params)
+        response = get_session('google_fit').get(api_url, headers=headers, params=params)
         
         if response.status_code != 200:
             logger.error(f"Failed to get sleep data: {response.text}")
@@ -966,16 +1186,20 @@ def disconnect():
         token_info = session['google_fit_token']
         access_token = token_info.get('access_token')
         
+        # Stop background syncs first; this waits for a running job so it can't keep using the token
+        get_scheduler().unenroll('google_fit', get_cache_user(token_info))
+        
         try:
             # Revoke the token
             revoke_url = 'https://oauth2.googleapis.com/revoke'
-            requests.post(revoke_url, params={'token': access_token}, 
+            get_session('google_fit').post(revoke_url, params={'token': access_token}, 
                          headers={'Content-Type': 'application/x-www-form-urlencoded'})
             logger.info("Google token revocation API call completed")
         except Exception as e:
             logger.error(f"Error revoking token: {str(e)}")
         
         # Remove from session regardless of revocation success
+        get_token_manager().forget('google_fit', token_info)
         session.pop('google_fit_token', None)
         session.pop('google_fit_oauth_state', None)
     
@@ -1,8 +1,9 @@
 import os
-import requests
 import sys
 import json
 from flask import Blueprint, jsonify, request, current_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.http_client import get_session
 
 # Create blueprint
 google_places_bp = Blueprint('google_places', __name__)
@@ -36,7 +37,7 @@ def nearby_places():
         url = f'{base_url}?location={lat},{lng}&radius={radius}&type={place_type}&key={google_api_key}'
         
         # Make request to Google Places API
-        response = requests.get(url)
+        response = get_session('google_places').get(url)
         
         # Check if request was successful
         if response.status_code != 200:
@@ -77,7 +78,7 @@ def place_details():
         url = f'{base_url}?place_id={place_id}&fields=name,rating,formatted_address,formatted_phone_number,opening_hours,website,price_level,photos&key={google_api_key}'
         
         # Make request to Google Places API
-        response = requests.get(url)
+        response = get_session('google_places').get(url)
         
         # Check if request was successful
         if response.status_code != 200:
@@ -122,7 +123,7 @@ def place_photo():
             url += f'&maxheight={max_height}'
             
         # Make request to Google Places API - this returns the actual image, not JSON
-        response = requests.get(url, stream=True)
+        response = get_session('google_places').get(url, stream=True)
         
         # Check if request was successful
         if response.status_code != 200:
@@ -218,7 +219,7 @@ def check_doordash_availability():
             }
             
             # Make request to DoorDash API
-            response = requests.post(url, headers=headers, json=payload)
+            response = get_session('doordash').post(url, headers=headers, json=payload)
             
             # Check if request was successful
             if response.status_code != 200:
@@ -337,7 +338,7 @@ def submit_doordash_order():
             }
             
             # Make request to DoorDash API
-            response = requests.post(url, headers=headers, json=doordash_payload)
+            response = get_session('doordash').post(url, headers=headers, json=doordash_payload)
             
             # Check if request was successful
             if response.status_code != 200 and response.status_code != 201:
@@ -477,7 +478,7 @@ def get_doordash_stores():
             }
             
             # Make request to DoorDash API
-            response = requests.get(url, headers=headers, params=params)
+            response = get_session('doordash').get(url, headers=headers, params=params)
             
             # Check if request was successful
             if response.status_code != 200:
@@ -588,7 +589,7 @@ def search_doordash_products():
             }
             
             # Make request to DoorDash API
-            response = requests.get(url, headers=headers, params=params)
+            response = get_session('doordash').get(url, headers=headers, params=params)
             
             # Check if request was successful
             if response.status_code != 200:
@@ -3,14 +3,16 @@ import requests
 import json
 import os
 from functools import wraps
-import time
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from utils.http_client import get_session
+from utils.cache import get_cache
 
 # Create a Blueprint for Spoonacular API routes
 spoonacular_bp = Blueprint('spoonacular', __name__)
 
-# In-memory cache for API responses
-# Format: { 'endpoint_params_hash': {'data': response_data, 'timestamp': time_added} }
-api_cache = {}
+# Shared cache for API responses, keyed by endpoint and query parameters
+api_cache = get_cache('spoonacular')
 
 def cache_response(timeout=3600):
     """
@@ -27,13 +29,9 @@ def cache_response(timeout=3600):
             # Check if cache is enabled
             if current_app.config.get('SPOONACULAR_CACHE_ENABLED', True):
                 # Check if response is in cache and not expired
-                if cache_key in api_cache:
-                    cache_entry = api_cache[cache_key]
-                    current_time = time.time()
-                    
-                    # If the cache entry is still valid
-                    if current_time - cache_entry['timestamp'] < timeout:
-                        return jsonify(cache_entry['data'])
+                cached_data = api_cache.get(cache_key)
+                if cached_data is not None:
+                    return jsonify(cached_data)
             
             # If not in cache or cache disabled, call the original function
             response = f(*args, **kwargs)
@@ -41,11 +39,9 @@ def cache_response(timeout=3600):
             # Cache the response if caching is enabled
             if current_app.config.get('SPOONACULAR_CACHE_ENABLED', True):
                 try:
-                    response_data = response.get_json()
-                    api_cache[cache_key] = {
-                        'data': response_data,
-                        'timestamp': time.time()
-                    }
+                    # Only successful responses are cached
+                    if response.status_code == 200:
+                        api_cache.set(cache_key, response.get_json(), timeout)
                 except Exception as e:
                     current_app.logger.error(f"Error caching response: {e}")
             
@@ -97,7 +93,7 @@ def search_grocery_products():
     
     try:
         # Make the API request
-        response = requests.get(base_url, params=params)
+        response = get_session('spoonacular').get(base_url, params=params)
         response.raise_for_status()  # Raise exception for HTTP errors
         
         # Return the API response
@@ -129,7 +125,7 @@ def get_product_information(product_id):
     
     try:
         # Make the API request
-        response = requests.get(base_url, params=params)
+        response = get_session('spoonacular').get(base_url, params=params)
         response.raise_for_status()  # Raise exception for HTTP errors
         
         # Return the API response
@@ -187,7 +183,7 @@ def search_recipes():
     
     try:
         # Make the API request
-        response = requests.get(base_url, params=params)
+        response = get_session('spoonacular').get(base_url, params=params)
         response.raise_for_status()  # Raise exception for HTTP errors
         
         # Return the API response
@@ -1,6 +1,5 @@
 from flask import Blueprint, jsonify, request, redirect, session, url_for
 import os
-import requests
 from urllib.parse import urlencode
 import json
 import time
@@ -11,6 +10,8 @@ import os
 # Add the parent directory to path to make absolute imports work
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from config import Config
+from utils.http_client import get_session
+from utils.token_manager import get_token_manager, TokenRefreshError
 
 # Add debug logging
 print("YouTube Music routes.py loaded")
@@ -99,7 +100,7 @@ def callback():
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(Config.YOUTUBE_OAUTH_TOKEN_URL, data=token_data)
+        response = get_session('youtube').post(Config.YOUTUBE_OAUTH_TOKEN_URL, data=token_data)
         tokens = response.json()
         
         if 'error' in tokens:
@@ -182,7 +183,7 @@ def status():
             # Try to get user info from Google's userinfo endpoint
             access_token = session.get('youtube_music_access_token')
             if access_token:
-                user_info_response = requests.get(
+                user_info_response = get_session('youtube').get(
                     'https://www.googleapis.com/oauth2/v2/userinfo',
                     headers={'Authorization': f'Bearer {access_token}'}
                 )
@@ -233,18 +234,24 @@ def status():
     is_connected = session.get('youtube_music_connected', False)
     token_expiry = session.get('youtube_music_token_expiry', 0)
     
-    # Check if token is expired
-    if is_connected and token_expiry < time.time():
-        # Token expired, try to refresh
-        refresh_token = session.get('youtube_music_refresh_token')
-        if refresh_token:
-            try:
-                refreshed = refresh_youtube_music_token(refresh_token)
-                is_connected = refreshed
-            except Exception as e:
-                logger.exception(f"Failed to refresh token: {str(e)}")
-                is_connected = False
-        else:
+    # The token manager refreshes tokens in the background before they expire;
+    # an expired token is refreshed here
+    if is_connected:
+        try:
+            token = get_token_manager().current('youtube_music', {
+                'access_token': session.get('youtube_music_access_token'),
+                'refresh_token': session.get('youtube_music_refresh_token'),
+                'expires_at': token_expiry
+            })
+            if token['access_token'] != session.get('youtube_music_access_token'):
+                # Update session with new token
+                session['youtube_music_access_token'] = token['access_token']
+                session['youtube_music_refresh_token'] = token['refresh_token']
+                session['youtube_music_token_expiry'] = token['expires_at']
+                session.modified = True
+            token_expiry = token['expires_at']
+        except Exception as e:
+            logger.exception(f"Failed to refresh token: {str(e)}")
             is_connected = False
     
     return jsonify({
@@ -252,8 +259,17 @@ def status():
         'tokenExpiresAt': token_expiry if is_connected else None
     })
 
-def refresh_youtube_music_token(refresh_token):
-    """Refresh the YouTube Music access token"""
+def refresh_youtube_music_token(token):
+    """
+    Token manager refresh function: exchange the refresh token for a new access token
+    
+    Raises:
+        TokenRefreshError: If there is no refresh token or Google rejects it
+    """
+    refresh_token = token.get('refresh_token')
+    if not refresh_token:
+        raise TokenRefreshError("No YouTube Music refresh token")
+    
     token_data = {
         'refresh_token': refresh_token,
         'client_id': Config.YOUTUBE_MUSIC_CLIENT_ID,
@@ -261,23 +277,21 @@ def refresh_youtube_music_token(refresh_token):
         'grant_type': 'refresh_token'
     }
     
-    response = requests.post(Config.YOUTUBE_OAUTH_TOKEN_URL, data=token_data)
+    response = get_session('youtube').post(Config.YOUTUBE_OAUTH_TOKEN_URL, data=token_data)
     tokens = response.json()
     
     if 'error' in tokens:
         logger.error(f"Token refresh error: {tokens['error']}")
-        return False
+        raise TokenRefreshError(tokens['error'])
     
-    # Update session with new token
-    session['youtube_music_access_token'] = tokens['access_token']
-    session['youtube_music_token_expiry'] = time.time() + tokens['expires_in']
-    session['youtube_music_connected'] = True
-    
-    # Some token responses might include a new refresh token
-    if 'refresh_token' in tokens:
-        session['youtube_music_refresh_token'] = tokens['refresh_token']
-    
-    return True
+    return {
+        'access_token': tokens['access_token'],
+        # Some token responses might include a new refresh token
+        'refresh_token': tokens.get('refresh_token', refresh_token),
+        'expires_at': time.time() + tokens['expires_in']
+    }
+
+get_token_manager().register('youtube_music', refresh_youtube_music_token)
 
 @youtube_music_bp.route('/force-connect', methods=['GET', 'POST'])
 def force_connect():
@@ -307,6 +321,10 @@ def disconnect():
     # Add logging
     logger.info("YouTube Music disconnect called")
     
+    # Stop refreshing this user's token in the background
+    if session.get('youtube_music_refresh_token'):
+        get_token_manager().forget('youtube_music', {'refresh_token': session['youtube_music_refresh_token']})
+    
     # Remove YouTube Music tokens from session
     session.pop('youtube_music_access_token', None)
     session.pop('youtube_music_refresh_token', None)
@@ -363,7 +381,7 @@ def search():
                 params['pageToken'] = page_token
             
             # Make the request to YouTube API
-            response = requests.get(youtube_url, params=params)
+            response = get_session('youtube').get(youtube_url, params=params)
             youtube_data = response.json()
             
             logger.info(f"YouTube API response status: {response.status_code}")
@@ -547,7 +565,7 @@ def get_video_details(video_id, api_key=None):
         # }
         
         logger.info(f"Getting video details for video ID: {video_id}")
-        response = requests.get(
+        response = get_session('youtube').get(
             'https://www.googleapis.com/youtube/v3/videos',
             params=params
             # No headers needed for API key authentication
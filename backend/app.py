@@ -20,6 +20,11 @@ from flask_session import Session
 
 from flask_session_fix import apply_session_fix
 
+from json_provider import apply_json_provider
+
+from utils.sync_scheduler import get_scheduler
+from utils.token_manager import get_token_manager
+
 
 
 # Load environment variables based on environment
@@ -112,6 +117,12 @@ apply_session_fix(app)
 
 
 
+# Serialize JSON responses with the fastest available encoder
+
+apply_json_provider(app)
+
+
+
 # Enable CORS with specific configurations
 
 # Allow both local and production frontend
@@ -186,6 +197,14 @@ app.register_blueprint(google_fit.google_fit_bp, url_prefix='/api/google-fit')
 app.register_blueprint(spoonacular_bp, url_prefix='/api/spoonacular')
 app.register_blueprint(youtube_music_bp, url_prefix='/api/youtube-music')
 
+# Start background sync of connected users' data
+if app.config['SYNC_ENABLED']:
+    get_scheduler().init_app(app)
+
+# Refresh signed-in users' OAuth tokens before they expire
+if app.config['TOKEN_REFRESH_ENABLED']:
+    get_token_manager().init_app(app)
+
 # Create a test blueprint to verify routing
 from flask import Blueprint
 test_bp = Blueprint('test', __name__, url_prefix='/api/test-music')
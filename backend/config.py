@@ -13,6 +13,35 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(days=30)
     SESSION_COOKIE_PATH = '/'  # Ensure cookies are available across all paths
   
+    # Outbound HTTP (shared per-provider sessions, see utils/http_client.py)
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '10'))  # Hosts kept in each pool
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '20'))  # Keep-alive connections per host
+    HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '30'))  # Default timeout in seconds
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+    HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', '0.5'))
+
+    # Upstream response cache shared by the Fitbit, Google Fit and Spoonacular modules
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # memory, sqlite or redis
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # Per cache namespace
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'upstream_cache.sqlite3'))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Local per-user, per-day store for synced wearable data (see utils/timeseries_store.py)
+    TIMESERIES_DB_PATH = os.environ.get('TIMESERIES_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'timeseries.sqlite3'))
+
+    # Background sync of connected users' data (see utils/sync_scheduler.py)
+    SYNC_ENABLED = os.environ.get('SYNC_ENABLED', 'True') == 'True'
+    SYNC_INTERVAL_SECONDS = int(os.environ.get('SYNC_INTERVAL_SECONDS', '1800'))  # Delta sync period per user
+    SYNC_MAX_WORKERS = int(os.environ.get('SYNC_MAX_WORKERS', '2'))
+    SYNC_BACKFILL_DAYS = int(os.environ.get('SYNC_BACKFILL_DAYS', '30'))  # Daily summaries synced after connecting
+    SYNC_HEART_RATE_DAYS = int(os.environ.get('SYNC_HEART_RATE_DAYS', '7'))  # Intraday heart rate costs one request per day
+
+    # Proactive OAuth token refresh (see utils/token_manager.py)
+    TOKEN_REFRESH_ENABLED = os.environ.get('TOKEN_REFRESH_ENABLED', 'True') == 'True'
+    TOKEN_REFRESH_INTERVAL_SECONDS = int(os.environ.get('TOKEN_REFRESH_INTERVAL_SECONDS', '60'))  # How often expiring tokens are looked for
+    TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get('TOKEN_REFRESH_MARGIN_SECONDS', '300'))  # Refresh this long before expiry
+    TOKEN_REFRESH_MAX_WORKERS = int(os.environ.get('TOKEN_REFRESH_MAX_WORKERS', '2'))
+
     # Fitbit API configuration
     FITBIT_CLIENT_ID = os.environ.get('FITBIT_CLIENT_ID', '')
     FITBIT_CLIENT_SECRET = os.environ.get('FITBIT_CLIENT_SECRET', '')
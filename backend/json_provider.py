@@ -0,0 +1,76 @@
+import json
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it
+    orjson = None
+
+
+def _default(o):
+    """Serialize NumPy values and anything Flask's default provider knows about"""
+    if hasattr(o, 'tolist'):
+        return o.tolist()
+    return DefaultJSONProvider.default(o)
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """
+    Stdlib JSON provider tuned for large API payloads
+
+    Responses are always compact (no indentation, even in debug mode) and keys
+    keep their insertion order instead of being sorted, which saves a sort per
+    dict on lists of tens of thousands of small rows. OrjsonProvider falls back
+    to it for stdlib-specific options such as ``indent``.
+    """
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj):
+        """Serialize to UTF-8 bytes"""
+        return self.dumps(obj).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+class OrjsonProvider(CompactJSONProvider):
+    """
+    JSON provider backed by orjson
+
+    orjson writes UTF-8 bytes directly, several times faster than the stdlib
+    encoder. Datetimes are passed through to Flask's default so they keep the
+    same RFC 822 format either way.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for stdlib-specific formatting (e.g. indent) get the stdlib encoder
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        options = self.options | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def apply_json_provider(app: Flask):
+    """Serialize the app's JSON responses with orjson when it is installed, else the compact stdlib provider."""
+    provider_class = OrjsonProvider if orjson is not None else CompactJSONProvider
+    app.json = provider_class(app)
+    app.logger.info(f"Using {provider_class.__name__} for JSON responses")
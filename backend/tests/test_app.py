@@ -2,6 +2,7 @@ import unittest
 import json
 import sys
 import os
+import tempfile
 from unittest.mock import patch, MagicMock
 
 # Add the parent directory to the Python path
@@ -9,6 +10,20 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 
 # Import app directly since we're already in the backend directory
 from app import app
+from utils.timeseries_store import TimeSeriesStore, date_range
+
+
+def json_response(payload, status_code=200):
+    """Mock upstream response carrying a JSON body, readable whole or streamed"""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {}
+    response.json.return_value = payload
+    response.content = body
+    response.text = body.decode('utf-8')
+    response.iter_content.side_effect = lambda chunk_size=1: (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+    return response
 
 
 class TestApp(unittest.TestCase):
@@ -16,6 +31,14 @@ class TestApp(unittest.TestCase):
         self.app = app
         self.app.config['TESTING'] = True
         self.client = self.app.test_client()
+        
+        # Keep synced days in a throwaway store
+        store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(store_dir.cleanup)
+        self.store = TimeSeriesStore(os.path.join(store_dir.name, 'timeseries.sqlite3'))
+        store_patch = patch('utils.timeseries_store._store', self.store)
+        store_patch.start()
+        self.addCleanup(store_patch.stop)
 
     def test_status_endpoint(self):
         """Test the status endpoint returns online status"""
@@ -62,6 +85,527 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(data['message'], 'API is working correctly')
 
+    def test_bluetooth_stream_resumes_from_cursor(self):
+        """The SSE stream replays samples recorded after Last-Event-ID"""
+        from api import fitbit
+        with fitbit.bluetooth_lock:
+            start = fitbit.bluetooth_buffer.total
+            for value in (70, 71, 72):
+                fitbit.bluetooth_buffer.append(1700000000000 + value, value)
+        
+        with patch.object(fitbit, 'STREAM_MAX_SECONDS', 0.2), patch.object(fitbit, 'STREAM_HEARTBEAT_SECONDS', 0.1):
+            response = self.client.get('/api/fitbit/bluetooth/stream', headers={'Last-Event-ID': f'{start + 1}:0'})
+            body = response.get_data(as_text=True)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertNotIn('"value": 70', body)
+        self.assertIn(f'id: {start + 3}:0\nevent: heart-rate\ndata: {{"value": 72', body)
+
+    def test_bluetooth_day_uses_sensor_rr_intervals(self):
+        """Abnormal rhythms on a Bluetooth-backed day use the buffered RR intervals instead of BPM deltas"""
+        from datetime import datetime
+        from api import fitbit
+        from utils.ring_buffer import HeartRateRingBuffer
+        
+        today = datetime.now().strftime('%Y-%m-%d')
+        minute_ms = int(datetime.strptime(today, '%Y-%m-%d').timestamp() * 1000) + 60000
+        buffer = HeartRateRingBuffer()
+        for idx in range(12):
+            # A flat 75 BPM looks like low HRV, but the sensor reports widely varying beats
+            buffer.append(minute_ms + 5000 * idx, 75, rr_intervals=[600, 1000])
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER9', 'scope': 'heartrate'}
+        
+        with patch.object(fitbit, 'bluetooth_buffer', buffer), patch.object(fitbit, 'bluetooth_connected', True):
+            data = json.loads(self.client.get(f'/api/fitbit/heart-rate?period=day&date={today}').data)
+            self.assertEqual(data['source'], 'bluetooth')
+            self.assertEqual(data['abnormal_events'], [])
+            
+            flat = HeartRateRingBuffer()
+            for idx in range(12):
+                flat.append(minute_ms + 5000 * idx, 75)
+            with patch.object(fitbit, 'bluetooth_buffer', flat):
+                data = json.loads(self.client.get(f'/api/fitbit/heart-rate?period=day&date={today}').data)
+            self.assertEqual([event['type'] for event in data['abnormal_events']], ['Low HRV'])
+
+    def test_activity_metrics_fetched_concurrently(self):
+        """Multi-day activity issues its time series requests in parallel and tolerates failures"""
+        import time
+        import requests
+        
+        def fake_get(url, **kwargs):
+            time.sleep(0.2)
+            metric = 'activities-' + url.split('/activities/')[1].split('/')[0]
+            response = MagicMock()
+            if metric == 'activities-floors':
+                raise requests.exceptions.Timeout('timed out')
+            response.status_code = 200
+            response.headers = {}
+            response.json.return_value = {metric: [{'dateTime': '2023-01-01', 'value': '10'}]}
+            return response
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'scope': 'activity'}
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get) as mock_get:
+            started = time.time()
+            response = self.client.get('/api/fitbit/activity?period=week&date=2023-01-07')
+            elapsed = time.time() - started
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 8)
+        self.assertLess(elapsed, 1.0)  # Sequential calls would take 1.6 seconds
+
+    def test_fitbit_responses_are_cached_per_user(self):
+        """Repeated Fitbit calls are served from the per-user cache"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {}
+        response.content = b'{"user": {}}'
+        response.json.return_value = {'user': {}}
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER1'}
+        hits = fitbit.cache.stats()['hits']
+        
+        with patch('utils.http_client.PooledSession.get', return_value=response) as mock_get:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/fitbit/profile').status_code, 200)
+        
+        self.assertEqual(mock_get.call_count, 1)
+        stats = json.loads(self.client.get('/api/fitbit/cache/stats').data)
+        self.assertEqual(stats['hits'] - hits, 2)
+        self.assertTrue(all(key.startswith('USER1:') for key in fitbit.cache.keys()))
+        self.assertNotIn('cache_keys', stats)
+        self.assertNotIn('USER1', self.client.get('/api/fitbit/cache/stats').get_data(as_text=True))
+
+    def test_fitbit_rate_limit_serves_stale_cache(self):
+        """Once Fitbit reports the budget is spent, stale entries are served and misses get a 429"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {'Fitbit-Rate-Limit-Remaining': '0', 'Fitbit-Rate-Limit-Reset': '600'}
+        response.content = b'{"user": {}}'
+        response.json.return_value = {'user': {}}
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER2'}
+        
+        with patch('utils.http_client.PooledSession.get', return_value=response) as mock_get:
+            # Cache the entry already expired so only the stale fallback can serve it
+            with patch.object(fitbit, 'get_cache_ttl', return_value=0):
+                self.assertEqual(self.client.get('/api/fitbit/profile').status_code, 200)
+            
+            stale = self.client.get('/api/fitbit/profile')
+            self.assertEqual(stale.status_code, 200)
+            
+            missing = self.client.get('/api/fitbit/sleep?period=day&date=2023-01-02')
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(missing.status_code, 429)
+        self.assertGreater(int(missing.headers['Retry-After']), 500)
+        self.assertEqual(fitbit.rate_limiter.remaining('USER2'), 0)
+
+    def test_heart_rate_days_served_from_local_store(self):
+        """Historical days are fetched once per day and then served from the time-series store"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        def fake_get(url, **kwargs):
+            day = url.split('/date/')[1].split('/')[0]
+            return json_response({
+                'activities-heart': [{'dateTime': day, 'value': {'restingHeartRate': 60}}],
+                'activities-heart-intraday': {'dataset': [
+                    {'time': '08:00:00', 'value': 70},
+                    {'time': '08:00:01', 'value': 72}
+                ]}
+            })
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER3', 'scope': 'heartrate'}
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get) as mock_get:
+            first = json.loads(self.client.get('/api/fitbit/heart-rate?period=week&date=2023-01-08').data)
+            fitbit.cache.clear()
+            second = json.loads(self.client.get('/api/fitbit/heart-rate?period=week&date=2023-01-08').data)
+        
+        self.assertEqual(mock_get.call_count, 8)  # One request per day, none the second time
+        self.assertEqual(first['data'], second['data'])
+        intraday_dates = sorted({row['date'] for row in first['data'] if not row.get('is_daily_summary')})
+        self.assertEqual(intraday_dates, ['2023-01-%02d' % day for day in range(1, 9)])
+        self.assertEqual(self.store.stats()['heart-rate:1sec']['days'], 8)
+
+    def test_heart_rate_daily_detail_uses_rollups(self):
+        """detail=daily returns one summary row per day, while resolution stays the max_points alias"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        def fake_get(url, **kwargs):
+            day = url.split('/date/')[1].split('/')[0]
+            return json_response({
+                'activities-heart': [{'dateTime': day, 'value': {'restingHeartRate': 60}}],
+                'activities-heart-intraday': {'dataset': [
+                    {'time': '08:00:00', 'value': 70},
+                    {'time': '08:00:01', 'value': 72}
+                ]}
+            })
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER7', 'scope': 'heartrate'}
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get):
+            daily = json.loads(self.client.get('/api/fitbit/heart-rate?period=week&date=2023-01-08&detail=daily').data)
+            fitbit.cache.clear()
+            budgeted = json.loads(self.client.get('/api/fitbit/heart-rate?period=week&date=2023-01-08&resolution=100').data)
+        
+        self.assertEqual(daily['detail'], 'daily')
+        self.assertEqual(len(daily['data']), 8)
+        self.assertTrue(all(row['is_daily_summary'] for row in daily['data']))
+        self.assertEqual({row['avg'] for row in daily['data']}, {71})
+        self.assertTrue(any(not row.get('is_daily_summary') for row in budgeted['data']))
+        self.assertLessEqual(len(budgeted['data']), 100)
+
+    def test_activity_rollups_grouped_by_week(self):
+        """Multi-day activity is built from stored daily rollups, which are summed per week"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        def fake_get(url, **kwargs):
+            metric = url.split('/activities/')[1].split('/')[0]
+            start, end = url.split('/date/')[1].split('.json')[0].split('/')
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = {}
+            response.json.return_value = {f'activities-{metric}': [
+                {'dateTime': day, 'value': '100'} for day in date_range(start, end)
+            ]}
+            return response
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER5', 'scope': 'activity'}
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get) as mock_get:
+            daily = json.loads(self.client.get('/api/fitbit/activity?period=week&date=2023-01-08').data)
+            fitbit.cache.clear()
+            weekly = json.loads(self.client.get('/api/fitbit/activity?period=week&date=2023-01-08&group=week').data)
+        
+        self.assertEqual(mock_get.call_count, 8)  # One request per metric, none the second time
+        self.assertEqual(len(daily['data']), 8)
+        self.assertEqual([row['dateTime'] for row in weekly['data']], ['2022-12-26', '2023-01-02'])
+        self.assertEqual([row['steps'] for row in weekly['data']], [100, 700])
+        self.assertEqual(self.store.stats()['rollup:activity']['days'], 8)
+        
+        response = self.client.get('/api/fitbit/activity?period=week&date=2023-01-08&group=year')
+        self.assertEqual(response.status_code, 400)
+
+    def test_heart_rate_days_fetched_with_bounded_concurrency(self):
+        """A month of intraday heart rate is fetched day by day, never more than HEART_RATE_DAY_WORKERS at once"""
+        import threading
+        import time
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        lock = threading.Lock()
+        active = [0, 0]  # Current and peak concurrent requests
+        
+        def fake_get(url, **kwargs):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            day = url.split('/date/')[1].split('/')[0]
+            return json_response({
+                'activities-heart': [{'dateTime': day, 'value': {}}],
+                'activities-heart-intraday': {'dataset': [{'time': '12:00:00', 'value': 65}]}
+            })
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER6', 'scope': 'heartrate'}
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get) as mock_get:
+            response = self.client.get('/api/fitbit/heart-rate?period=month&date=2023-03-31')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 31)
+        self.assertTrue(all('/1d/1sec.json' in call.args[0] for call in mock_get.call_args_list))
+        self.assertLessEqual(active[1], fitbit.HEART_RATE_DAY_WORKERS)
+        dates = [row['date'] for row in json.loads(response.data)['data'] if not row.get('is_daily_summary')]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(dates), 31)
+
+    def test_three_month_heart_rate_fetched_in_one_range_request(self):
+        """1min heart rate for a 3-month view costs one range request, split by day into the store"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        def fake_get(url, **kwargs):
+            start, end = url.split('/date/')[1].split('/')[:2]
+            sample = {'dataset': [{'time': '12:00:00', 'value': 65}]}
+            # The first day's samples are top level, the rest are nested in each day's summary
+            days = [{'dateTime': day, 'value': {}, 'intraday': sample} for day in date_range(start, end)]
+            del days[0]['intraday']
+            return json_response({'activities-heart': days, 'activities-heart-intraday': sample})
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER8', 'scope': 'heartrate'}
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get) as mock_get:
+            response = self.client.get('/api/fitbit/heart-rate?period=3month&date=2023-03-31')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('/date/2022-12-31/2023-03-31/1min.json', mock_get.call_args.args[0])
+        self.assertEqual(self.store.stats()['heart-rate:1min']['days'], 91)
+        dates = {row['date'] for row in json.loads(response.data)['data'] if not row.get('is_daily_summary')}
+        self.assertEqual(len(dates), 91)
+
+    def test_streamed_intraday_responses_are_cached_packed(self):
+        """Streamed intraday bodies are cached as packed samples and decoded again on a cache hit"""
+        from api import fitbit
+        fitbit.cache.clear()
+        
+        payload = {
+            'activities-heart': [{'dateTime': '2023-01-01', 'value': {}}],
+            'activities-heart-intraday': {'dataset': [
+                {'time': '08:00:%02d' % second, 'value': 60 + second % 7} for second in range(60)
+            ]}
+        }
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'test_token', 'user_id': 'USER7', 'scope': 'heartrate'}
+        
+        with patch('utils.http_client.PooledSession.get', return_value=json_response(payload)) as mock_get:
+            first = json.loads(self.client.get('/api/fitbit/hrv?date=2023-01-01').data)
+            second = json.loads(self.client.get('/api/fitbit/hrv?date=2023-01-01').data)
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertTrue(mock_get.call_args.kwargs['stream'])
+        self.assertEqual(first, second)
+        self.assertEqual(len(first['data']), 1)
+        
+        cached = fitbit.get_cached_response(mock_get.call_args.args[0], None, 'USER7')
+        self.assertIn('packed', cached['activities-heart-intraday']['dataset'])
+
+    def test_google_fit_month_fetched_in_cached_slices(self):
+        """Long Google Fit ranges are fetched as concurrent calendar slices that later views reuse"""
+        from api import google_fit
+        import time
+        google_fit.data_cache.clear()
+        
+        def fake_post(url, json=None, **kwargs):
+            step = json['bucketByTime']['durationMillis']
+            return json_response({'bucket': [
+                {'startTimeMillis': str(start), 'dataset': [{'point': [{'value': [{'fpVal': 70.0}]}]}]}
+                for start in range(json['startTimeMillis'], json['endTimeMillis'], step)
+            ]})
+        
+        with self.client.session_transaction() as sess:
+            sess['google_fit_token'] = {
+                'access_token': 'fit_token', 'refresh_token': 'fit_refresh', 'expires_at': time.time() + 3600,
+                'scope': 'https://www.googleapis.com/auth/fitness.heart_rate.read https://www.googleapis.com/auth/fitness.activity.read'
+            }
+        
+        with patch('utils.http_client.PooledSession.post', side_effect=fake_post) as mock_post:
+            first = json.loads(self.client.get('/api/google-fit/heart-rate?period=month&date=2023-01-15').data)
+            first_calls = mock_post.call_count
+            self.client.get('/api/google-fit/heart-rate?period=month&date=2023-01-16')
+        
+        # Month views use 5-minute buckets in week slices; the next day's view only refetches its two edge slices
+        self.assertGreater(first_calls, 3)
+        self.assertEqual(mock_post.call_count - first_calls, 2)
+        self.assertEqual({call.kwargs['json']['bucketByTime']['durationMillis'] for call in mock_post.call_args_list}, {300000})
+        timestamps = [row['timestamp'] for row in first['data']]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(len(timestamps), len(set(timestamps)))
+        
+        # Leading edge slices start at 22:00 and are not cached
+        from utils.bucket_planner import is_local_midnight
+        slice_starts = [int(key.split('_')[-2]) for key in google_fit.data_cache.keys() if ':heart_rate_' in key]
+        self.assertTrue(slice_starts)
+        self.assertTrue(all(is_local_midnight(start) for start in slice_starts))
+    
+    def test_google_fit_monday_activity_in_one_request(self):
+        """A day view that spans Monday midnight is fetched unsliced, so its first bucket is a whole day"""
+        from api import google_fit
+        from datetime import datetime
+        import time
+        google_fit.data_cache.clear()
+        
+        def fake_post(url, json=None, **kwargs):
+            step = json['bucketByTime']['durationMillis']
+            buckets = []
+            for start in range(json['startTimeMillis'], json['endTimeMillis'], step):
+                end = min(start + step, json['endTimeMillis'])
+                buckets.append({
+                    'startTimeMillis': str(start),
+                    'endTimeMillis': str(end),
+                    'dataset': [{
+                        'dataSourceId': 'derived:com.google.step_count.delta:com.google.android.gms:aggregated',
+                        'point': [{'value': [{'intVal': (end - start) // 36000}]}]  # 100 steps per hour
+                    }]
+                })
+            return json_response({'bucket': buckets})
+        
+        with self.client.session_transaction() as sess:
+            sess['google_fit_token'] = {
+                'access_token': 'fit_token', 'refresh_token': 'fit_refresh_monday', 'expires_at': time.time() + 3600,
+                'scope': 'https://www.googleapis.com/auth/fitness.heart_rate.read https://www.googleapis.com/auth/fitness.activity.read'
+            }
+        
+        with patch('utils.http_client.PooledSession.post', side_effect=fake_post) as mock_post:
+            first = json.loads(self.client.get('/api/google-fit/activity?period=day&date=2023-03-20').data)
+            second = json.loads(self.client.get('/api/google-fit/activity?period=day&date=2023-03-20').data)
+        
+        self.assertEqual(mock_post.call_count, 1)
+        body = mock_post.call_args.kwargs['json']
+        self.assertEqual(body['startTimeMillis'], int(datetime(2023, 3, 19, 22).timestamp()) * 1000)
+        self.assertEqual(body['endTimeMillis'], int(datetime(2023, 3, 21, 2).timestamp()) * 1000)
+        self.assertEqual([row['steps'] for row in first['data']], [2400, 400])
+        self.assertEqual(second['data'], first['data'])
+    
+    def test_google_fit_multi_day_activity_in_one_request(self):
+        """Week and month activity views fetch all uncached days in one call and label rows by bucket date"""
+        from api import google_fit
+        from datetime import datetime
+        import time
+        google_fit.data_cache.clear()
+        
+        def fake_post(url, json=None, **kwargs):
+            step = json['bucketByTime']['durationMillis']
+            buckets = []
+            for start in range(json['startTimeMillis'], json['endTimeMillis'], step):
+                day = datetime.fromtimestamp(start / 1000 + 3600).day
+                buckets.append({
+                    'startTimeMillis': str(start),
+                    'endTimeMillis': str(min(start + step, json['endTimeMillis'])),
+                    'dataset': [{
+                        'dataSourceId': 'derived:com.google.step_count.delta:com.google.android.gms:aggregated',
+                        'point': [{'value': [{'intVal': 1000 * day}]}]
+                    }]
+                })
+            return json_response({'bucket': buckets})
+        
+        with self.client.session_transaction() as sess:
+            sess['google_fit_token'] = {
+                'access_token': 'fit_token', 'refresh_token': 'fit_refresh_days', 'expires_at': time.time() + 3600,
+                'scope': 'https://www.googleapis.com/auth/fitness.heart_rate.read https://www.googleapis.com/auth/fitness.activity.read'
+            }
+        
+        with patch('utils.http_client.PooledSession.post', side_effect=fake_post) as mock_post:
+            month = json.loads(self.client.get('/api/google-fit/activity?period=month&date=2023-03-30').data)
+            week = json.loads(self.client.get('/api/google-fit/activity?period=week&date=2023-03-20').data)
+            self.assertEqual(mock_post.call_count, 1)
+            later = json.loads(self.client.get('/api/google-fit/activity?period=week&date=2023-04-01').data)
+        
+        self.assertEqual([row['date'] for row in month['data']], ['2023-03-%02d' % day for day in range(1, 31)])
+        self.assertEqual([row['steps'] for row in month['data']], [1000 * day for day in range(1, 31)])
+        self.assertEqual(week['data'], month['data'][13:20])
+        
+        # Only the two days not seen before are requested
+        self.assertEqual(mock_post.call_count, 2)
+        body = mock_post.call_args.kwargs['json']
+        self.assertEqual(body['startTimeMillis'], int(datetime(2023, 3, 31).timestamp()) * 1000)
+        self.assertEqual(body['endTimeMillis'], int(datetime(2023, 4, 2).timestamp()) * 1000)
+        self.assertEqual([row['date'] for row in later['data']][-2:], ['2023-03-31', '2023-04-01'])
+    
+    def test_background_sync_fills_store_for_requests(self):
+        """A sync job stores the user's recent days so the next request needs no upstream calls"""
+        from api import fitbit
+        from datetime import datetime, timedelta
+        fitbit.cache.clear()
+        
+        def fake_get(url, **kwargs):
+            if '/activities/heart/' in url:
+                day = url.split('/date/')[1].split('/')[0]
+                return json_response({
+                    'activities-heart': [{'dateTime': day, 'value': {}}],
+                    'activities-heart-intraday': {'dataset': [{'time': '08:00:00', 'value': 70}]}
+                })
+            return json_response({})
+        
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get), \
+                patch.dict(self.app.config, {'SYNC_BACKFILL_DAYS': 3, 'SYNC_HEART_RATE_DAYS': 3}):
+            with self.app.app_context():
+                cursor = fitbit.sync_fitbit_user('USER4', {'access_token': 'sync_token'}, None)
+        
+        self.assertEqual(self.store.stats()['heart-rate:1sec']['days'], 4)
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'sync_token', 'user_id': 'USER4', 'scope': 'heartrate'}
+        
+        # Two days ago is final, and the response cache is empty, so only the store can serve it
+        fitbit.cache.clear()
+        settled_day = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
+        with patch('utils.http_client.PooledSession.get', side_effect=fake_get) as mock_get:
+            response = self.client.get(f'/api/fitbit/heart-rate?period=day&date={settled_day}')
+        
+        self.assertEqual(cursor, (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['data'][0]['value'], 70)
+        self.assertEqual(mock_get.call_count, 0)
+
+    def test_disconnect_and_logout_delete_stored_days(self):
+        """Disconnecting or logging out removes the user's synced days from the store"""
+        self.store.put_day('USER8', 'sleep', '2023-01-01', [])
+        self.store.put_day('USER9', 'sleep', '2023-01-01', [])
+        self.store.put_day('OTHER', 'sleep', '2023-01-01', [])
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'token8', 'user_id': 'USER8'}
+        self.assertEqual(self.client.post('/api/fitbit/disconnect').status_code, 200)
+        self.assertEqual(self.store.get_days('USER8', 'sleep', ['2023-01-01']), {})
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'token9', 'user_id': 'USER9'}
+        self.assertEqual(self.client.post('/api/auth/logout').status_code, 200)
+        self.assertEqual(self.store.get_days('USER9', 'sleep', ['2023-01-01']), {})
+        
+        self.assertEqual(self.store.stats()['sleep']['days'], 1)
+
+
+    def test_disconnect_waits_for_running_sync(self):
+        """A sync job running during disconnect can't write the user's days back after they are deleted"""
+        import threading
+        from utils.sync_scheduler import SyncScheduler
+        
+        scheduler = SyncScheduler(interval=3600, max_workers=1)
+        scheduler.init_app(self.app)
+        self.addCleanup(scheduler.stop)
+        started, release = threading.Event(), threading.Event()
+        
+        def sync(user_id, token, cursor):
+            started.set()
+            release.wait(2)
+            self.store.put_day(user_id, 'sleep', '2023-01-01', [])
+            return '2023-01-01'
+        
+        scheduler.register('fitbit', sync)
+        scheduler.enroll('fitbit', 'USER10', {'access_token': 'token10'})
+        self.assertTrue(started.wait(2))
+        
+        with self.client.session_transaction() as sess:
+            sess['oauth_token'] = {'access_token': 'token10', 'user_id': 'USER10'}
+        responses = []
+        with patch('api.fitbit.get_scheduler', return_value=scheduler):
+            disconnect = threading.Thread(target=lambda: responses.append(self.client.post('/api/fitbit/disconnect')))
+            disconnect.start()
+            disconnect.join(0.2)
+            self.assertTrue(disconnect.is_alive())  # Still waiting for the sync job
+            release.set()
+            disconnect.join(2)
+        
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertEqual(self.store.get_days('USER10', 'sleep', ['2023-01-01']), {})
+        self.assertIsNone(scheduler.status('fitbit', 'USER10'))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.bucket_planner import calendar_slices, is_local_midnight, plan_buckets
+
+
+class TestBucketPlanner(unittest.TestCase):
+    def test_default_resolution_per_period(self):
+        """Without a point budget a day keeps 15s buckets and longer periods get coarser ones"""
+        self.assertEqual(plan_buckets('day').duration_ms, 15000)
+        self.assertEqual(plan_buckets('week').duration_ms, 60000)
+        self.assertEqual(plan_buckets('month').duration_ms, 300000)
+        self.assertEqual(plan_buckets('unknown').duration_ms, 15000)
+
+    def test_point_budget_picks_the_finest_sufficient_bucket(self):
+        """Buckets are about OVERSAMPLE times the point budget, never finer than 15 seconds"""
+        self.assertEqual(plan_buckets('day', 500).duration_ms, 60000)  # 1440 buckets
+        self.assertEqual(plan_buckets('week', 1000).duration_ms, 300000)  # 2016 buckets
+        self.assertEqual(plan_buckets('month', 1000).duration_ms, 900000)  # 2880 buckets
+        self.assertEqual(plan_buckets('day', 100000).duration_ms, 15000)
+        self.assertEqual(plan_buckets('month', 1).duration_ms, 3600000)
+
+    def test_plans_are_cached(self):
+        """Repeated lookups return the same plan object"""
+        self.assertIs(plan_buckets('week', 800), plan_buckets('week', 800))
+
+    def test_slice_size_follows_the_bucket_cap(self):
+        """A slice is a week when a week of buckets fits in one request, else a day"""
+        self.assertEqual(plan_buckets('day').slice_days, 1)
+        self.assertEqual(plan_buckets('week').slice_days, 1)
+        self.assertEqual(plan_buckets('month').slice_days, 7)
+
+    def test_day_slices_end_at_midnight(self):
+        """Day slices cover whole days except at the ends of the range"""
+        start = int(datetime(2023, 3, 8, 22).timestamp())
+        end = int(datetime(2023, 3, 11, 2).timestamp())
+        self.assertEqual(calendar_slices(start, end), [
+            (start, int(datetime(2023, 3, 9).timestamp())),
+            (int(datetime(2023, 3, 9).timestamp()), int(datetime(2023, 3, 10).timestamp())),
+            (int(datetime(2023, 3, 10).timestamp()), int(datetime(2023, 3, 11).timestamp())),
+            (int(datetime(2023, 3, 11).timestamp()), end)
+        ])
+
+    def test_week_slices_start_on_monday(self):
+        """Week slices are cut at the midnight starting each Monday"""
+        start = int(datetime(2023, 3, 8, 22).timestamp())  # Wednesday
+        end = int(datetime(2023, 3, 22, 2).timestamp())
+        slices = calendar_slices(start, end, 7)
+        self.assertEqual([datetime.fromtimestamp(t).strftime('%a %H') for t, _ in slices], ['Wed 22', 'Mon 00', 'Mon 00'])
+        self.assertEqual(slices[-1][1], end)
+        for (_, previous_end), (next_start, _) in zip(slices, slices[1:]):
+            self.assertEqual(previous_end, next_start)
+
+    def test_short_ranges_use_one_slice(self):
+        """A range within one day, including an empty one, is a single slice"""
+        start = int(datetime(2023, 3, 8, 1).timestamp())
+        self.assertEqual(plan_buckets('day').slices(start, start + 3600), [(start, start + 3600)])
+        self.assertEqual(calendar_slices(start, start, 7), [(start, start)])
+
+    def test_local_midnight(self):
+        """Only timestamps exactly on a local midnight count as one"""
+        self.assertTrue(is_local_midnight(int(datetime(2023, 3, 20).timestamp())))
+        self.assertFalse(is_local_midnight(int(datetime(2023, 3, 19, 22).timestamp())))
+        self.assertFalse(is_local_midnight(int(datetime(2023, 3, 20).timestamp()) + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.cache import LRUCache, SQLiteCache, RedisCache, create_cache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_hit_miss_and_expiry(self):
+        cache = LRUCache()
+        cache.set('a', {'value': 1}, ttl=60)
+        self.assertEqual(cache.get('a'), {'value': 1})
+        self.assertIsNone(cache.get('b'))
+
+        with patch('utils.cache.time.time', return_value=10 ** 12):
+            self.assertIsNone(cache.get('a'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations']), (1, 2, 1))
+        self.assertEqual(stats['entries'], 0)
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = LRUCache(max_bytes=30)
+        cache.set('a', 'x', ttl=60, size=10)
+        cache.set('b', 'y', ttl=60, size=10)
+        cache.set('c', 'z', ttl=60, size=10)
+        cache.get('a')  # 'b' is now the least recently used
+        cache.set('d', 'w', ttl=60, size=10)
+
+        self.assertEqual(cache.keys(), ['c', 'a', 'd'])
+        self.assertEqual(cache.stats()['bytes'], 30)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_oversized_and_zero_ttl_values_are_not_cached(self):
+        cache = LRUCache(max_bytes=10)
+        cache.set('big', 'x' * 50, ttl=60)
+        cache.set('none', 'x', ttl=0)
+        self.assertEqual(len(cache), 0)
+
+
+
+class FakeRedis(object):
+    """Minimal local stand-in for the parts of redis-py used by RedisCache"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        value, expires_at = self.store.get(key, (None, 0))
+        return value if expires_at > time.time() else None
+
+    def set(self, key, value, ex=None):
+        self.store[key] = (value, time.time() + ex)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key.decode('utf-8') if isinstance(key, bytes) else key, None)
+
+    def scan_iter(self, match='*'):
+        prefix = match.rstrip('*')
+        return [key.encode('utf-8') for key in self.store if key.startswith(prefix)]
+
+
+class TestSharedBackends(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sqlite_is_shared_between_instances(self):
+        writer = SQLiteCache(self.path, 'fitbit')
+        writer.set('key', {'activities-heart': [1, 2]}, ttl=60)
+
+        # A second instance stands in for another gunicorn worker
+        reader = SQLiteCache(self.path, 'fitbit')
+        self.assertEqual(reader.get('key'), {'activities-heart': [1, 2]})
+        self.assertIsNone(SQLiteCache(self.path, 'spoonacular').get('key'))
+        self.assertEqual(reader.stats()['hits'], 1)
+
+        reader.clear()
+        self.assertIsNone(writer.get('key'))
+
+    def test_sqlite_expiry_and_lru_eviction(self):
+        cache = SQLiteCache(self.path, 'test', max_bytes=20)
+        cache.set('a', 'aaaaaa', ttl=60)
+        cache.set('b', 'bbbbbb', ttl=60)
+        cache.get('a')
+        cache.set('c', 'cccccc', ttl=60)
+        self.assertEqual(sorted(cache.keys()), ['a', 'c'])
+
+        with patch('utils.cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get('a'))
+
+    def test_redis_backend_with_stand_in(self):
+        client = FakeRedis()
+        cache = RedisCache(namespace='google_fit', client=client)
+        cache.set('heart_rate_2024-01-01_day', {'bucket': []}, ttl=60)
+        self.assertEqual(cache.get('heart_rate_2024-01-01_day'), {'bucket': []})
+        self.assertEqual(cache.keys(), ['heart_rate_2024-01-01_day'])
+        cache.clear()
+        self.assertEqual(client.store, {})
+
+    def test_factory_selects_backend(self):
+        self.assertIsInstance(create_cache('x', backend='memory'), LRUCache)
+        with patch('config.Config.CACHE_SQLITE_PATH', self.path):
+            self.assertIsInstance(create_cache('x', backend='sqlite'), SQLiteCache)
+        with self.assertRaises(ValueError):
+            create_cache('x', backend='memcached')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,290 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.data_processor import process_heart_rate_data, attach_rr_intervals, detect_abnormal_rhythms
+from utils.heart_rate_series import HeartRateSeries, parse_time_strings
+from utils.downsampling import lttb_indices, downsample_rows
+from utils.hrv import compute_hrv_batch
+from utils.rhythm_detector import RhythmWindow, LiveRhythmMonitor
+from utils.ring_buffer import HeartRateRingBuffer
+from utils.ble_heart_rate import parse_heart_rate_measurement
+
+
+def make_dataset(count, step=1, start_bpm=60):
+    """Build a synthetic Fitbit intraday dataset"""
+    dataset = []
+    for idx in range(count):
+        seconds = (idx * step) % 86400
+        dataset.append({
+            'time': '%02d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60),
+            'value': start_bpm + idx % 40
+        })
+    return dataset
+
+
+class TestHeartRateSeries(unittest.TestCase):
+    def test_parse_time_strings(self):
+        """Packed and fallback parsing agree on seconds since midnight"""
+        self.assertEqual(parse_time_strings(['00:00:00', '13:05:09', '23:59:59']).tolist(), [0, 47109, 86399])
+        self.assertEqual(parse_time_strings(['0:00:01', '13:05:09']).tolist(), [1, 47109])
+
+    def test_full_resolution_rows(self):
+        """Small datasets keep one row per sample in 12-hour format"""
+        raw = {
+            'activities-heart': [{'dateTime': '2024-01-01', 'value': {'restingHeartRate': 60}}],
+            'activities-heart-intraday': {'dataset': [
+                {'time': '00:00:05', 'value': 68},
+                {'time': '13:30:00', 'value': 90}
+            ]}
+        }
+        rows = process_heart_rate_data(raw, 'day')
+        self.assertEqual(rows, [
+            {'time': '12:00:05 AM', 'rawTime': '00:00:05', 'date': '2024-01-01', 'value': 68, 'avg': 68, 'timestamp': 0},
+            {'time': '1:30:00 PM', 'rawTime': '13:30:00', 'date': '2024-01-01', 'value': 90, 'avg': 90, 'timestamp': 1}
+        ])
+
+    def test_minute_grouping(self):
+        """Large datasets are grouped per minute with vectorized statistics"""
+        dataset = make_dataset(6000)
+        raw = {
+            'activities-heart': [{'dateTime': '2024-01-01'}],
+            'activities-heart-intraday': {'dataset': list(reversed(dataset))}
+        }
+        rows = process_heart_rate_data(raw, 'day')
+        self.assertEqual(len(rows), 100)
+        self.assertEqual([row['rawTime'] for row in rows], sorted(row['rawTime'] for row in rows))
+
+        first = rows[0]
+        expected_values = [point['value'] for point in reversed(dataset) if point['time'].startswith('00:00')]
+        self.assertEqual(first['time'], '12:00 AM')
+        self.assertEqual(first['values'], expected_values)
+        self.assertEqual(first['count'], 60)
+        self.assertEqual(first['min'], min(expected_values))
+        self.assertEqual(first['max'], max(expected_values))
+        self.assertEqual(first['avg'], round(sum(expected_values) / len(expected_values)))
+
+    def test_series_length(self):
+        series = HeartRateSeries.from_dataset(make_dataset(10), '2024-01-01')
+        self.assertEqual(len(series), 10)
+        self.assertEqual(series.bpm.dtype.name, 'uint16')
+
+
+class TestDownsampling(unittest.TestCase):
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        """LTTB returns the requested number of points and keeps spikes"""
+        y = [60] * 1000
+        y[500] = 180
+        indices = lttb_indices(list(range(1000)), y, 50).tolist()
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(500, indices)
+        self.assertEqual(indices, sorted(indices))
+
+    def test_max_points_limits_heart_rate_rows(self):
+        raw = {
+            'activities-heart': [{'dateTime': '2024-01-01'}],
+            'activities-heart-intraday': {'dataset': make_dataset(86400)}
+        }
+        rows = process_heart_rate_data(raw, 'day', max_points=500)
+        self.assertEqual(len(rows), 500)
+        self.assertNotIn('values', rows[0])
+        self.assertEqual(rows[-1]['rawTime'], '23:59:59')
+
+    def test_max_points_bounds_multi_day_rows(self):
+        """One LTTB pass spans every day, and daily summary rows count toward max_points"""
+        raw = {'activities-heart': [
+            {'dateTime': f'2024-01-{day:02d}', 'intraday': {'dataset': make_dataset(100)}} for day in range(1, 31)
+        ]}
+        for max_points in (20, 45, 600):
+            rows = process_heart_rate_data(raw, 'month', max_points=max_points)
+            self.assertEqual(len(rows), min(max_points, 3000))
+            self.assertEqual([row['date'] for row in rows], sorted(row['date'] for row in rows))
+        # With a point per day or more, no day is dropped
+        rows = process_heart_rate_data(raw, 'month', max_points=90)
+        self.assertEqual(len({row['date'] for row in rows}), 30)
+
+        zones = {'heartRateZones': [{'name': 'Out of Range', 'min': 30, 'max': 90}], 'restingHeartRate': 60}
+        raw['activities-heart'] += [{'dateTime': '2024-01-31', 'value': zones}]
+        rows = process_heart_rate_data(raw, 'month', max_points=20)
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(rows[-1]['date'], '2024-01-31')
+        self.assertTrue(rows[-1]['is_daily_summary'])
+
+    def test_downsample_rows_passthrough(self):
+        rows = [{'timestamp': idx, 'value': 70} for idx in range(10)]
+        self.assertIs(downsample_rows(rows, 20), rows)
+        self.assertEqual(len(downsample_rows(rows, 4)), 4)
+
+
+class TestAbnormalRhythms(unittest.TestCase):
+    def test_sustained_and_sudden_events(self):
+        """Tachycardia, bradycardia and sudden changes are reported in order"""
+        values = [110, 112, 115, 118, 125, 126, 45, 44, 43, 42, 41, 40]
+        events = detect_abnormal_rhythms([{'date': '2024-01-01', 'time': '1:00 AM', 'values': values}])
+        self.assertEqual([event['type'] for event in events], ['Tachycardia', 'Bradycardia', 'Sudden change'])
+        self.assertEqual(events[0]['value'], '125 BPM sustained')
+        self.assertEqual(events[0]['severity'], 'High')
+        self.assertEqual(events[1]['value'], '41 BPM sustained')
+        self.assertEqual(events[2]['value'], 'Change of 81 BPM')
+        self.assertEqual(set(events[0]['hrv_metrics']), {'rmssd', 'sdnn', 'pnn50'})
+
+    def test_flat_window(self):
+        """A perfectly flat minute reports low HRV instead of dividing by zero"""
+        events = detect_abnormal_rhythms([{'values': [70] * 25}])
+        self.assertEqual([event['type'] for event in events], ['Low HRV'])
+
+    def test_short_windows_are_skipped(self):
+        self.assertEqual(detect_abnormal_rhythms([{'values': [150, 150, 150]}, {'avg': 70}]), [])
+
+
+class TestLiveRhythmMonitor(unittest.TestCase):
+    def test_matches_batch_detection_per_minute(self):
+        """Incremental events equal batch detection over the same minute windows"""
+        start = 1700000000 - 1700000000 % 60
+        values = [70, 72, 150, 151, 152, 153, 154, 90, 60, 61] * 12
+        monitor = LiveRhythmMonitor()
+        for offset, bpm in enumerate(values):
+            monitor.add(bpm, start + offset)
+
+        expected = []
+        for minute in range(2):
+            window = RhythmWindow()
+            window.extend(values[minute * 60:(minute + 1) * 60])
+            expected.extend(window.events(monitor.window_date, ''))
+
+        events = monitor.events()
+        self.assertEqual([event['type'] for event in events], [event['type'] for event in expected])
+        self.assertEqual(monitor.events(since=start + 60), events[len(events) // 2:])
+
+    def test_finalized_since_cursor(self):
+        start = 1700000000 - 1700000000 % 60
+        monitor = LiveRhythmMonitor()
+        for offset, bpm in enumerate([150] * 60 + [70]):
+            monitor.add(bpm, start + offset)
+
+        cursor, events = monitor.finalized_since(0)
+        self.assertEqual(cursor, monitor.finalized_total)
+        self.assertEqual([event['type'] for event in events], ['Tachycardia', 'Low HRV'])
+        self.assertEqual(monitor.finalized_since(cursor), (cursor, []))
+
+
+class TestHrvBatch(unittest.TestCase):
+    def test_batch_matches_scalar_detector(self):
+        """Vectorized metrics agree with the single-window RhythmWindow"""
+        windows = [[70, 72, 75, 71, 90, 60, 65, 0, 80, 82], [60, 61], [], [100, 55, 101, 56, 99, 57, 98]]
+        flat = [value for window in windows for value in window]
+        offsets = [0, 10, 12, 12]
+        metrics = compute_hrv_batch(flat, offsets)
+        self.assertEqual(len(metrics), 4)
+
+        for window, record in zip(windows, metrics):
+            scalar = RhythmWindow()
+            scalar.extend(window)
+            expected = scalar.hrv_metrics()
+            self.assertEqual(record['rr_count'], scalar.rr_count)
+            self.assertEqual(record['ectopic_beats'], scalar.ectopic_count)
+            for key in ('rmssd', 'sdnn', 'pnn50', 'sd1', 'sd2'):
+                self.assertAlmostEqual(record[key], expected[key], places=6)
+
+    def test_two_dimensional_windows(self):
+        metrics = compute_hrv_batch([[70, 72, 75, 71], [80, 80, 80, 80]])
+        self.assertEqual(metrics['rr_count'].tolist(), [3, 3])
+        self.assertEqual(metrics['sdnn'][1], 0)
+
+
+
+class TestHeartRateRingBuffer(unittest.TestCase):
+    def test_wraps_and_keeps_latest_samples(self):
+        buffer = HeartRateRingBuffer(capacity=5)
+        for idx in range(12):
+            buffer.append(1000 * idx, 60 + idx)
+
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(buffer.latest(), (11000, 71))
+        timestamps, bpm = buffer.samples()
+        self.assertEqual(timestamps.tolist(), [7000, 8000, 9000, 10000, 11000])
+        self.assertEqual(bpm.tolist(), [67, 68, 69, 70, 71])
+
+    def test_window_and_cursor(self):
+        buffer = HeartRateRingBuffer(capacity=4)
+        for idx in range(6):
+            buffer.append(1000 * idx, 70, rr_intervals=[850] if idx % 2 else [])
+
+        timestamps, bpm = buffer.window(4000)
+        self.assertEqual(timestamps.tolist(), [4000, 5000])
+        first, timestamps, _ = buffer.since_cursor(1)
+        self.assertEqual((first, timestamps.tolist()), (2, [2000, 3000, 4000, 5000]))
+        rr_timestamps, rr = buffer.rr_window(2000)
+        self.assertEqual((rr_timestamps.tolist(), rr.tolist()), ([3000, 5000], [850, 850]))
+
+    def test_series_from_buffer(self):
+        buffer = HeartRateRingBuffer(capacity=10)
+        start_ms = int(datetime(2024, 1, 1, 13, 30, 5).timestamp() * 1000)
+        for idx in range(3):
+            buffer.append(start_ms + 1000 * idx, 80 + idx)
+
+        series = HeartRateSeries.from_epoch_ms(*buffer.samples())
+        rows = process_heart_rate_data({'activities-heart-intraday': {'dataset': series}}, 'day')
+        self.assertEqual([row['rawTime'] for row in rows], ['13:30:05', '13:30:06', '13:30:07'])
+        self.assertEqual(rows[0]['time'], '1:30:05 PM')
+        self.assertEqual(rows[0]['date'], '2024-01-01')
+        self.assertEqual([row['value'] for row in rows], [80, 81, 82])
+
+
+
+class TestBleHeartRate(unittest.TestCase):
+    def test_uint8_without_optional_fields(self):
+        measurement = parse_heart_rate_measurement(bytes([0x00, 72]))
+        self.assertEqual(measurement, {
+            'heart_rate': 72, 'sensor_contact': None, 'energy_expended': None, 'rr_intervals': []
+        })
+
+    def test_uint16_with_energy_and_rr_intervals(self):
+        # Flags: UINT16 value, contact supported+detected, energy and RR present
+        packet = bytes([0x1F]) + (130).to_bytes(2, 'little') + (512).to_bytes(2, 'little') \
+            + (1024).to_bytes(2, 'little') + (512).to_bytes(2, 'little')
+        measurement = parse_heart_rate_measurement(bytearray(packet))
+        self.assertEqual(measurement['heart_rate'], 130)
+        self.assertTrue(measurement['sensor_contact'])
+        self.assertEqual(measurement['energy_expended'], 512)
+        self.assertEqual(measurement['rr_intervals'], [1000, 500])
+
+    def test_truncated_packet(self):
+        with self.assertRaises(ValueError):
+            parse_heart_rate_measurement(bytes([0x01, 72]))
+
+    def test_true_rr_intervals_drive_hrv(self):
+        rr = [800, 810, 790, 805, 795, 800]
+        window = RhythmWindow(derive_rr=False)
+        window.extend([75] * 6)
+        window.extend_rr(rr)
+        self.assertEqual(window.rr_count, len(rr))
+        self.assertAlmostEqual(window.rr_mean, sum(rr) / len(rr))
+
+        events = detect_abnormal_rhythms([{'values': [75] * 12, 'rr': [800, 810] * 6}])
+        self.assertEqual([event['type'] for event in events], ['Low HRV'])
+
+        start = 1700000000000 - 1700000000000 % 60000
+        minute_rows = HeartRateSeries.from_epoch_ms([start, start + 60000], [75, 76]).minute_rows()
+        rr_series = HeartRateSeries.from_epoch_ms([start + 1000, start + 1000], [800, 810])
+        rows = attach_rr_intervals(minute_rows, rr_series)
+        self.assertEqual([row.get('rr') for row in rows], [[800, 810], None])
+
+    def test_live_monitor_switches_to_true_rr(self):
+        monitor = LiveRhythmMonitor()
+        start = 1700000000 - 1700000000 % 60
+        monitor.add(70, start)
+        monitor.add(90, start + 1, [700, 650])
+        self.assertTrue(monitor.rr_supported)
+        self.assertEqual(monitor.window.rr_count, 2)
+        self.assertEqual(monitor.window.rr_mean, 675)
+
+
+if __name__ == '__main__':
+    unittest.main()
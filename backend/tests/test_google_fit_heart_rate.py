@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.google_fit_heart_rate import GoogleFitHeartRate, decode_heart_rate_buckets
+
+
+def bucket(start_seconds, points):
+    """A dataset:aggregate bucket holding the given points"""
+    return {
+        'startTimeMillis': str(start_seconds * 1000),
+        'endTimeMillis': str((start_seconds + 15) * 1000),
+        'dataset': [{'point': points}]
+    }
+
+
+class TestGoogleFitHeartRate(unittest.TestCase):
+    def setUp(self):
+        self.day_start = int(datetime(2023, 1, 1).timestamp())
+        self.next_day = int(datetime(2023, 1, 2).timestamp())
+
+    def test_point_timing_precedence(self):
+        """Points are timed by millis, else nanos, else their bucket's start"""
+        data = {'bucket': [
+            bucket(self.day_start, [{'startTimeMillis': str((self.day_start + 5) * 1000), 'value': [{'fpVal': 60.0}]}]),
+            bucket(self.day_start + 15, [{'startTimeNanos': str((self.day_start + 20) * 1000000000 + 999),
+                                          'value': [{'fpVal': 61.5}]}]),
+            bucket(self.day_start + 30, [{'value': [{'fpVal': 62.0}]}]),
+            bucket(self.day_start + 45, [{'value': []}]),
+            {'startTimeMillis': str((self.day_start + 60) * 1000), 'dataset': []}
+        ]}
+        timestamps, bpm = decode_heart_rate_buckets(data)
+        self.assertEqual(timestamps.tolist(), [self.day_start + 5, self.day_start + 20, self.day_start + 30])
+        self.assertEqual(bpm.tolist(), [60.0, 61.5, 62.0])
+
+    def test_every_value_is_a_sample(self):
+        """Points carrying several fpVals yield one sample each; non-fp values are skipped"""
+        data = {'bucket': [bucket(self.day_start, [
+            {'value': [{'fpVal': 70.0}, {'fpVal': 80.0}, {'intVal': 1}]}
+        ])]}
+        timestamps, bpm = decode_heart_rate_buckets(data)
+        self.assertEqual(timestamps.tolist(), [self.day_start, self.day_start])
+        self.assertEqual(bpm.tolist(), [70.0, 80.0])
+        self.assertEqual(len(decode_heart_rate_buckets({})[0]), 0)
+
+    def test_rows_match_local_time(self):
+        """Rows carry the same fields and formats as the per-point conversion they replace"""
+        times = [self.day_start + 3661, self.day_start + 13 * 3600 + 5, self.next_day + 59]
+        samples = GoogleFitHeartRate(times, [65.0, 90.5, 70.0])
+        expected = [{
+            'timestamp': ts,
+            'value': value,
+            'time': datetime.fromtimestamp(ts).strftime('%I:%M:%S %p'),
+            'date': datetime.fromtimestamp(ts).strftime('%Y-%m-%d'),
+            'source': 'googleFit'
+        } for ts, value in zip(times, [65.0, 90.5, 70.0])]
+        self.assertEqual(samples.rows(), expected)
+        self.assertEqual(samples.rows([0, 2]), [expected[0], expected[2]])
+
+    def test_date_filter_and_counts(self):
+        """Samples are filtered and counted by local date"""
+        samples = GoogleFitHeartRate([self.day_start + 10, self.day_start + 20, self.next_day + 10], [60, 61, 62])
+        self.assertEqual(samples.date_counts(), {'2023-01-01': 2, '2023-01-02': 1})
+
+        first_day = samples.on_date('2023-01-01')
+        self.assertEqual(first_day.timestamps.tolist(), [self.day_start + 10, self.day_start + 20])
+        self.assertEqual([row['date'] for row in first_day.rows()], ['2023-01-01', '2023-01-01'])
+        self.assertEqual(len(samples.on_date('2023-01-05')), 0)
+        self.assertEqual(samples.on_date('2023-01-05').rows(), [])
+
+    def test_append_and_lttb(self):
+        """A marker sample can be appended and the series downsampled to at most max_points"""
+        samples = GoogleFitHeartRate([self.day_start + i * 15 for i in range(1000)],
+                                     [60 + (i % 40) for i in range(1000)])
+        marked = samples.append(self.day_start + 15000, 75.0)
+        self.assertEqual(len(samples), 1000)
+        self.assertEqual(len(marked), 1001)
+        self.assertEqual(marked.rows([1000])[0]['value'], 75.0)
+
+        indices = marked.lttb(100)
+        self.assertLessEqual(len(indices), 100)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
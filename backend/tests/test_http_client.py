@@ -0,0 +1,153 @@
+import unittest
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from utils import http_client
+from utils.http_client import create_session, get_session
+
+
+class RecordingAdapter(BaseAdapter):
+    """Transport adapter that records each request's timeout and answers 200 without touching the network"""
+
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.timeouts.append(timeout)
+        response = requests.Response()
+        response.status_code = 200
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class CookieHandler(BaseHTTPRequestHandler):
+    """Sets a cookie on every response and records the Cookie header it was sent"""
+    received = []
+
+    def do_GET(self):
+        self.received.append(self.headers.get('Cookie'))
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'session=user-a; Path=/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 to every other request on a path, counting hits per method"""
+    hits = {}
+
+    def respond(self):
+        key = (self.command, self.path)
+        self.hits[key] = self.hits.get(key, 0) + 1
+        self.send_response(503 if self.hits[key] % 2 else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    def test_default_timeout_applied(self):
+        """Requests without a timeout get the session default; explicit timeouts are kept"""
+        session = create_session(timeout=7)
+        adapter = RecordingAdapter()
+        session.mount('https://', adapter)
+
+        session.get('https://api.fitbit.com/1/user/-/profile.json')
+        session.post('https://api.fitbit.com/oauth2/token', timeout=3)
+        session.get('https://api.fitbit.com/1/user/-/profile.json', timeout=None)
+
+        self.assertEqual(adapter.timeouts, [7, 3, 7])
+        self.assertEqual(create_session().default_timeout, Config.HTTP_TIMEOUT)
+
+    def test_retry_policy(self):
+        """Only idempotent methods are retried, and only on 502/503/504"""
+        session = create_session(max_retries=3, backoff_factor=0)
+        adapter = session.get_adapter('https://api.fitbit.com')
+        self.assertIsInstance(adapter, HTTPAdapter)
+        self.assertIs(session.get_adapter('http://localhost'), adapter)
+
+        retry = adapter.max_retries
+        self.assertEqual(retry.total, 3)
+        for status in (502, 503, 504):
+            self.assertTrue(retry.is_retry('GET', status))
+            self.assertTrue(retry.is_retry('PUT', status))
+            self.assertFalse(retry.is_retry('POST', status))
+            self.assertFalse(retry.is_retry('PATCH', status))
+        for status in (200, 401, 429, 500):
+            self.assertFalse(retry.is_retry('GET', status))
+        self.assertFalse(retry.raise_on_status)
+
+    def test_retries_against_server(self):
+        """A 503 is retried for GET but returned as is for POST"""
+        server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        FlakyHandler.hits = {}
+
+        url = f'http://127.0.0.1:{server.server_port}/data'
+        session = create_session(max_retries=2, backoff_factor=0, timeout=5)
+        self.assertEqual(session.get(url).status_code, 200)
+        self.assertEqual(session.post(url).status_code, 503)
+        self.assertEqual(FlakyHandler.hits, {('GET', '/data'): 2, ('POST', '/data'): 1})
+
+    def test_cookies_not_shared_between_requests(self):
+        """Set-Cookie from one response is never stored or sent on a later request"""
+        server = HTTPServer(('127.0.0.1', 0), CookieHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        CookieHandler.received = []
+
+        url = f'http://127.0.0.1:{server.server_port}/profile'
+        session = create_session(timeout=5)
+        session.get(url)
+        session.get(url)
+
+        self.assertEqual(CookieHandler.received, [None, None])
+        self.assertEqual(len(session.cookies), 0)
+
+    def test_one_session_per_provider(self):
+        """Concurrent callers share one session per provider; providers don't share pools"""
+        sessions = []
+        with patch.dict(http_client._sessions, clear=True), \
+                patch('utils.http_client.create_session', wraps=create_session) as mock_create:
+            threads = [threading.Thread(target=lambda: sessions.append(get_session('fitbit'))) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            google_fit = get_session('google_fit')
+
+            self.assertEqual(mock_create.call_count, 2)
+            self.assertEqual(len({id(session) for session in sessions}), 1)
+            self.assertIs(get_session('fitbit'), sessions[0])
+            self.assertIsNot(google_fit, sessions[0])
+            self.assertIsNot(google_fit.get_adapter('https://'), sessions[0].get_adapter('https://'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import json
+from datetime import datetime
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json_provider
+from json_provider import CompactJSONProvider, OrjsonProvider, apply_json_provider
+
+
+class TestJsonProvider(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.debug = True  # Responses must stay compact even in debug mode
+        self.payload = {
+            'data': [{'time': '8:00:00 AM', 'value': np.int64(72), 'avg': 72.5}],
+            'samples': np.arange(3, dtype=np.uint16),
+            'when': datetime(2023, 1, 1, 8, 0),
+            'name': 'café'
+        }
+        self.expected = {
+            'data': [{'time': '8:00:00 AM', 'value': 72, 'avg': 72.5}],
+            'samples': [0, 1, 2],
+            'when': 'Sun, 01 Jan 2023 08:00:00 GMT',
+            'name': 'café'
+        }
+
+    def providers(self):
+        providers = [CompactJSONProvider(self.app)]
+        if json_provider.orjson is not None:
+            providers.append(OrjsonProvider(self.app))
+        return providers
+
+    def test_responses_are_compact_and_equivalent(self):
+        """Every provider emits the same compact JSON, including NumPy values and datetimes"""
+        with self.app.app_context():
+            for provider in self.providers():
+                response = provider.response(self.payload)
+                body = response.get_data()
+                self.assertEqual(response.mimetype, 'application/json')
+                self.assertNotIn(b'\n ', body)
+                self.assertNotIn(b'": ', body)
+                self.assertEqual(json.loads(body), self.expected)
+                self.assertEqual(provider.loads(provider.dumps(self.payload)), self.expected)
+
+    def test_keys_keep_insertion_order(self):
+        """Keys are not sorted, which keeps serialization cheap"""
+        with self.app.app_context():
+            for provider in self.providers():
+                self.assertEqual(provider.dumps({'b': 1, 'a': 2}), '{"b":1,"a":2}')
+
+    def test_apply_json_provider(self):
+        """The fastest available provider is installed on the app"""
+        apply_json_provider(self.app)
+        expected = OrjsonProvider if json_provider.orjson is not None else CompactJSONProvider
+        self.assertIs(type(self.app.json), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.heart_rate_series import HeartRateSeries
+from utils.json_stream import IntradayDatasetParser, ListStreamParser
+
+
+def chunked(payload, size, **dump_args):
+    """Serialize a payload and split the bytes into fixed-size chunks"""
+    body = json.dumps(payload, **dump_args).encode('utf-8')
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestJsonStream(unittest.TestCase):
+    def setUp(self):
+        self.payload = {
+            'activities-heart': [{'dateTime': '2023-01-01', 'value': {'restingHeartRate': 60}}],
+            'activities-heart-intraday': {
+                'dataset': [{'time': '%02d:%02d:%02d' % (i // 3600, i // 60 % 60, i % 60), 'value': 60 + i % 50}
+                            for i in range(0, 86400, 7)],
+                'datasetInterval': 1,
+                'datasetType': 'second'
+            }
+        }
+
+    def test_intraday_dataset_matches_full_parse(self):
+        """Streaming gives the same samples as decoding the whole body, whatever the chunk size"""
+        expected = HeartRateSeries.from_dataset(self.payload['activities-heart-intraday']['dataset'])
+        for size in (41, 333, 65536):
+            document = IntradayDatasetParser().parse(chunked(self.payload, size, separators=(',', ':')))
+            series = document['activities-heart-intraday']['dataset']
+            self.assertEqual(series.seconds.tolist(), expected.seconds.tolist())
+            self.assertEqual(series.bpm.tolist(), expected.bpm.tolist())
+            self.assertEqual(series.dates, ['2023-01-01'])
+            self.assertEqual(document['activities-heart-intraday']['datasetInterval'], 1)
+            self.assertEqual(document['activities-heart'], self.payload['activities-heart'])
+
+    def test_irregular_samples_use_the_json_decoder(self):
+        """Pretty-printed bodies, reordered keys and float values still parse"""
+        payload = {'activities-heart-intraday': {'dataset': [
+            {'value': 70.5, 'time': '01:00:00'},
+            {'time': '01:00:01', 'value': 71}
+        ]}}
+        document = IntradayDatasetParser().parse(chunked(payload, 3, indent=2))
+        series = document['activities-heart-intraday']['dataset']
+        self.assertEqual(series.seconds.tolist(), [3600, 3601])
+        self.assertEqual(series.bpm.tolist(), [70.5, 71.0])
+
+    def test_list_parser_keeps_items(self):
+        """Items are collected back into the document, including multi-byte text split across chunks"""
+        payload = {'bucket': [{'n': i, 'name': 'café'} for i in range(20)], 'numbers': [1, 22, 333]}
+        self.assertEqual(ListStreamParser('bucket').parse(chunked(payload, 4)), payload)
+        self.assertEqual(ListStreamParser('numbers').parse(chunked(payload, 2)), payload)
+
+    def test_documents_without_the_array(self):
+        """Bodies without the streamed key are decoded as-is"""
+        self.assertEqual(ListStreamParser('bucket').parse([b'{"error": ', b'"invalid"}']), {'error': 'invalid'})
+
+    def test_truncated_body_raises(self):
+        """A body that ends inside the array is an error, not a silently short dataset"""
+        with self.assertRaises(ValueError):
+            IntradayDatasetParser().parse([b'{"dataset":[{"time":"00:00:00","value":60}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
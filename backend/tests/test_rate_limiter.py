@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.rate_limiter import TokenBucket, RateLimiter, RateLimitExceeded
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_continuously(self):
+        """Without upstream information tokens trickle back at capacity/window per second"""
+        bucket = TokenBucket(150, 3600, now=0)
+        bucket.tokens = 0
+        bucket.refill(now=240)
+        self.assertAlmostEqual(bucket.tokens, 10)
+        bucket.refill(now=100000)
+        self.assertEqual(bucket.tokens, 150)
+
+    def test_sync_follows_upstream_window(self):
+        """After a sync the bucket stays put until the upstream window resets"""
+        bucket = TokenBucket(150, 3600, now=0)
+        bucket.sync(remaining=3, reset_in=600, now=0)
+        bucket.refill(now=300)
+        self.assertEqual(bucket.tokens, 3)
+        bucket.tokens = 0
+        self.assertEqual(bucket.wait_time(now=300), 300)
+        bucket.refill(now=600)
+        self.assertEqual(bucket.tokens, 150)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_buckets_are_per_user(self):
+        """Spending one user's budget leaves other users untouched"""
+        limiter = RateLimiter(2, 3600)
+        limiter.acquire('a')
+        limiter.acquire('a')
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            limiter.acquire('a')
+        self.assertEqual(ctx.exception.retry_after, 1800)
+        limiter.acquire('b')
+        self.assertEqual(limiter.stats(), {'a': 0, 'b': 1})
+
+    def test_acquire_waits_for_short_resets(self):
+        """acquire sleeps when the next token is within max_wait"""
+        limiter = RateLimiter(150, 3600)
+        limiter.update_from_headers('a', remaining=0, reset_in=0.05)
+        with patch('utils.rate_limiter.time.sleep', wraps=time.sleep) as mock_sleep:
+            limiter.acquire('a', max_wait=1)
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(limiter.remaining('a'), 149)
+
+    def test_low_water_mark(self):
+        """is_low reports when the remaining budget reaches the low-water mark"""
+        limiter = RateLimiter(150, 3600, low_water=10)
+        self.assertFalse(limiter.is_low('a'))
+        limiter.update_from_headers('a', remaining=10, reset_in=600)
+        self.assertTrue(limiter.is_low('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.rollups import (heart_rate_rollup, heart_rate_row, sleep_rollup, sleep_row, activity_rollup,
+                           activity_row, bucket_start, group_rollups)
+from utils.data_processor import process_sleep_data, process_activity_data
+
+
+class TestRollups(unittest.TestCase):
+    def test_heart_rate_rollup_summarizes_samples_and_zones(self):
+        """Samples give min/max/mean; zone minutes and resting heart rate come from the summary"""
+        summary = {'dateTime': '2023-01-01', 'value': {'restingHeartRate': 58, 'heartRateZones': [
+            {'name': 'Out of Range', 'min': 30, 'max': 100, 'minutes': 1200},
+            {'name': 'Fat Burn', 'min': 100, 'max': 140, 'minutes': 40}
+        ]}}
+        rollup = heart_rate_rollup(summary, [0, 1, 2], [60, 90, 75])
+        self.assertEqual((rollup['samples'], rollup['min'], rollup['max'], rollup['sum']), (3, 60, 90, 225))
+        self.assertEqual(rollup['zoneMinutes'], {'Out of Range': 1200, 'Fat Burn': 40})
+
+        row = heart_rate_row('2023-01-01', rollup)
+        self.assertEqual((row['restingHeartRate'], row['avg']), (58, 75))
+
+        # Without samples the bounds fall back to the zones
+        no_samples = heart_rate_rollup(summary)
+        self.assertEqual((no_samples['min'], no_samples['max']), (30, 140))
+
+    def test_sleep_rows_match_raw_processing(self):
+        """Rows built from rollups are identical to processing the raw sleep logs"""
+        logs = [
+            {'dateOfSleep': '2023-01-01', 'duration': 25200000, 'efficiency': 90,
+             'levels': {'summary': {'deep': {'minutes': 80}, 'light': {'minutes': 250}, 'rem': {'minutes': 90}, 'wake': {'minutes': 30}}}},
+            {'dateOfSleep': '2023-01-01', 'duration': 3600000, 'efficiency': 80,
+             'levels': {'summary': {'light': {'minutes': 50}, 'wake': {'minutes': 10}}}},
+            {'dateOfSleep': '2023-01-02', 'duration': 27000000, 'efficiency': 95, 'sleep_score': {'total_score': 81},
+             'levels': {'summary': {'deep': {'minutes': 90}, 'light': {'minutes': 260}, 'rem': {'minutes': 100}}}}
+        ]
+        expected = process_sleep_data({'sleep': logs}, 'week')
+        rows = [
+            sleep_row('2023-01-01', sleep_rollup(logs[:2])),
+            sleep_row('2023-01-02', sleep_rollup(logs[2:]))
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_activity_rows_match_raw_processing(self):
+        """Rows built from rollups are identical to processing the raw time series"""
+        raw = {
+            'activities-steps': [{'dateTime': '2023-01-01', 'value': '1000'}, {'dateTime': '2023-01-02', 'value': '2500'}],
+            'activities-distance': [{'dateTime': '2023-01-01', 'value': '0.75'}],
+            'activities-minutesFairlyActive': [{'dateTime': '2023-01-02', 'value': '12'}],
+            'activities-minutesVeryActive': [{'dateTime': '2023-01-02', 'value': '5'}]
+        }
+        expected = process_activity_data(raw, 'week')
+        rows = [
+            activity_row('2023-01-01', activity_rollup({'steps': '1000', 'distance': '0.75'})),
+            activity_row('2023-01-02', activity_rollup({'steps': '2500', 'minutesFairlyActive': '12', 'minutesVeryActive': '5'}))
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_bucket_start(self):
+        """Weeks start on Monday and months on the first"""
+        self.assertEqual(bucket_start('2023-01-08', 'week'), '2023-01-02')
+        self.assertEqual(bucket_start('2023-01-09', 'week'), '2023-01-09')
+        self.assertEqual(bucket_start('2023-02-17', 'month'), '2023-02-01')
+        self.assertEqual(bucket_start('2023-02-17', 'day'), '2023-02-17')
+        with self.assertRaises(ValueError):
+            bucket_start('2023-02-17', 'year')
+
+    def test_group_rollups_combines_days(self):
+        """Weekly buckets sum totals, combine min/max and average resting heart rate"""
+        rollups = {
+            '2023-01-01': {'restingHeartRate': 60, 'samples': 2, 'min': 55, 'max': 120, 'sum': 175, 'zoneMinutes': {'Fat Burn': 10}},
+            '2023-01-02': {'restingHeartRate': 62, 'samples': 1, 'min': 65, 'max': 90, 'sum': 65, 'zoneMinutes': {'Fat Burn': 5}},
+            '2023-01-03': {'restingHeartRate': 0, 'samples': 0, 'min': None, 'max': None, 'sum': 0, 'zoneMinutes': {}}
+        }
+        groups = group_rollups(rollups, 'week')
+        self.assertEqual([start for start, _ in groups], ['2022-12-26', '2023-01-02'])
+
+        week = groups[1][1]
+        self.assertEqual((week['samples'], week['min'], week['max'], week['sum']), (1, 65, 90, 65))
+        self.assertEqual(week['restingHeartRate'], 62)
+        self.assertEqual(week['zoneMinutes'], {'Fat Burn': 5})
+
+        activity = group_rollups({
+            '2023-01-02': activity_rollup({'steps': '1000', 'minutesVeryActive': '10'}),
+            '2023-01-03': activity_rollup({'steps': '500', 'minutesFairlyActive': '4'})
+        }, 'month')
+        row = activity_row(*activity[0])
+        self.assertEqual((row['dateTime'], row['steps'], row['activeMinutes']), ('2023-01-01', 1500, 14))
+        self.assertNotIn('restingHeartRate', activity[0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def run_concurrently(self, flights, key, fn, count=5):
+        results = []
+        errors = []
+
+        def worker():
+            try:
+                results.append(flights.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Callers arriving while a call is in flight get its result"""
+        flights = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results, errors = self.run_concurrently(flights, 'user:url', fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [{'value': 42}] * 5)
+        self.assertEqual(flights.shared, 4)
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_errors_are_shared_and_not_remembered(self):
+        """Every waiter sees the leader's exception, and the next call runs again"""
+        flights = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise RuntimeError('upstream down')
+
+        results, errors = self.run_concurrently(flights, 'key', fail, count=3)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flights.do('key', lambda: 'ok'), 'ok')
+
+    def test_different_keys_run_independently(self):
+        """Calls with different keys are not coalesced"""
+        flights = SingleFlight()
+        self.assertEqual(flights.do('a', lambda: 1), 1)
+        self.assertEqual(flights.do('b', lambda: 2), 2)
+        self.assertEqual(flights.shared, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, current_app
+
+from utils.sync_scheduler import SyncScheduler
+
+
+class TestSyncScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = SyncScheduler(interval=3600, max_workers=2)
+        self.scheduler.init_app(Flask(__name__))
+        self.addCleanup(self.scheduler.stop)
+
+    def wait_until_idle(self, provider, user_id):
+        deadline = time.time() + 2
+        while self.scheduler.status(provider, user_id)['running'] and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_enroll_backfills_then_syncs_from_cursor(self):
+        """The first job gets no cursor, later jobs resume from the returned cursor"""
+        calls = []
+
+        def sync(user_id, credentials, cursor):
+            self.assertTrue(current_app)  # Jobs run inside an app context
+            calls.append((user_id, credentials['access_token'], cursor))
+            return 'cursor-%d' % len(calls)
+
+        self.scheduler.register('fitbit', sync)
+        self.scheduler.enroll('fitbit', 'u1', {'access_token': 'a'})
+        self.wait_until_idle('fitbit', 'u1')
+
+        self.scheduler.enroll('fitbit', 'u1', {'access_token': 'b'})  # Credential update only
+        self.scheduler.trigger('fitbit', 'u1')
+        self.wait_until_idle('fitbit', 'u1')
+
+        self.assertEqual(calls, [('u1', 'a', None), ('u1', 'b', 'cursor-1')])
+        self.assertEqual(self.scheduler.status('fitbit', 'u1')['cursor'], 'cursor-2')
+
+    def test_one_job_per_user_at_a_time(self):
+        """Triggers while a job is queued or running are dropped"""
+        release = threading.Event()
+        calls = []
+
+        def sync(user_id, credentials, cursor):
+            calls.append(user_id)
+            release.wait(2)
+            return cursor
+
+        self.scheduler.register('fitbit', sync)
+        self.scheduler.enroll('fitbit', 'u1', {})
+        self.assertFalse(self.scheduler.trigger('fitbit', 'u1'))
+        release.set()
+        self.wait_until_idle('fitbit', 'u1')
+        self.assertEqual(calls, ['u1'])
+
+    def test_failures_are_recorded(self):
+        """A failing job keeps the old cursor and reports the error"""
+        def sync(user_id, credentials, cursor):
+            raise RuntimeError('token expired')
+
+        self.scheduler.register('google_fit', sync)
+        self.scheduler.enroll('google_fit', 'u1', {})
+        self.wait_until_idle('google_fit', 'u1')
+
+        status = self.scheduler.status('google_fit', 'u1')
+        self.assertIsNone(status['cursor'])
+        self.assertEqual(status['last_error'], 'token expired')
+
+        self.scheduler.unenroll('google_fit', 'u1')
+        self.assertIsNone(self.scheduler.status('google_fit', 'u1'))
+
+
+    def test_unenroll_waits_for_running_job(self):
+        """unenroll returns only after a running job finishes, and queued jobs are dropped"""
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def sync(user_id, credentials, cursor):
+            calls.append(user_id)
+            started.set()
+            release.wait(2)
+            return cursor
+
+        self.scheduler.register('fitbit', sync)
+        self.scheduler.enroll('fitbit', 'u1', {})
+        self.assertTrue(started.wait(2))
+
+        unenroll = threading.Thread(target=self.scheduler.unenroll, args=('fitbit', 'u1'))
+        unenroll.start()
+        unenroll.join(0.1)
+        self.assertTrue(unenroll.is_alive())
+        release.set()
+        unenroll.join(2)
+        self.assertFalse(unenroll.is_alive())
+        self.assertFalse(self.scheduler.trigger('fitbit', 'u1'))
+        self.assertEqual(calls, ['u1'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime, timedelta
+
+from utils.timeseries_store import TimeSeriesStore, date_range
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = TimeSeriesStore(os.path.join(directory.name, 'timeseries.sqlite3'))
+
+    def test_round_trips_summaries_and_samples(self):
+        """Summaries and packed intraday samples come back unchanged"""
+        self.store.put_day('u1', 'heart-rate:1sec', '2023-01-01', {'restingHeartRate': 60}, [0, 1, 86399], [70, 71, 250])
+        record = self.store.get_days('u1', 'heart-rate:1sec', ['2023-01-01'])['2023-01-01']
+        self.assertEqual(record.summary, {'restingHeartRate': 60})
+        self.assertEqual(record.seconds.tolist(), [0, 1, 86399])
+        self.assertEqual(record.bpm.tolist(), [70, 71, 250])
+
+    def test_days_are_scoped_per_user_and_kind(self):
+        """Other users' and other kinds' rows are never returned"""
+        self.store.put_day('u1', 'sleep', '2023-01-01', [])
+        self.assertEqual(self.store.get_days('u2', 'sleep', ['2023-01-01']), {})
+        self.assertEqual(self.store.get_days('u1', 'activity', ['2023-01-01']), {})
+
+    def test_missing_days_refetches_recent_and_partial_days(self):
+        """Only days that are absent, synced before they settled or marked partial are missing"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        days = ['2023-01-01', '2023-01-02', '2023-01-03', yesterday, today]
+
+        self.store.put_days('u1', 'sleep', {day: ([], None, None) for day in days[:2] + days[3:]})
+        self.store.put_days('u1', 'sleep', {'2023-01-02': ([], None, None)}, synced_at=0)
+        self.assertEqual(self.store.missing_days('u1', 'sleep', days), ['2023-01-02', '2023-01-03', yesterday, today])
+
+    def test_date_range(self):
+        """date_range is inclusive and crosses month boundaries"""
+        self.assertEqual(date_range('2023-01-30', '2023-02-01'), ['2023-01-30', '2023-01-31', '2023-02-01'])
+        self.assertEqual(date_range('2023-01-02', '2023-01-01'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
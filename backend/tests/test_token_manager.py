@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, current_app
+
+from utils.token_manager import TokenManager, TokenRefreshError, token_user
+
+
+class TestTokenManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = TokenManager(interval=3600, refresh_margin=300, max_workers=2)
+        self.manager.init_app(Flask(__name__))
+        self.addCleanup(self.manager.stop)
+        self.refreshes = []
+
+    def refresh(self, token):
+        self.assertTrue(current_app)  # Refreshes run inside an app context
+        self.refreshes.append(token['access_token'])
+        return dict(token, access_token=token['access_token'] + '+', expires_at=time.time() + 3600)
+
+    def wait_until_idle(self):
+        deadline = time.time() + 2
+        while self.manager._pending and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_valid_tokens_are_returned_without_refreshing(self):
+        """A token that isn't expired is tracked and handed back as-is"""
+        self.manager.register('google_fit', self.refresh)
+        token = {'access_token': 'a', 'refresh_token': 'r', 'expires_at': time.time() + 120}
+        self.assertIs(self.manager.current('google_fit', token), token)
+        self.assertIs(self.manager.get('google_fit', token_user(token)), token)
+        self.assertEqual(self.refreshes, [])
+
+    def test_expired_token_is_refreshed_once_for_concurrent_requests(self):
+        """Requests holding the same expired token share one refresh"""
+        release = threading.Event()
+
+        def slow_refresh(token):
+            release.wait(2)
+            return self.refresh(token)
+
+        self.manager.register('fitbit', slow_refresh)
+        token = {'access_token': 'a', 'refresh_token': 'r', 'user_id': 'U1', 'expires_at': time.time() - 1}
+        results = []
+
+        def request():
+            with self.manager.app.app_context():
+                results.append(self.manager.current('fitbit', dict(token)))
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.refreshes, ['a'])
+        self.assertEqual([result['access_token'] for result in results], ['a+'] * 4)
+
+    def test_expiring_tokens_are_refreshed_in_the_background(self):
+        """Tokens close to expiry are refreshed ahead of time and served to the next request"""
+        self.manager.register('google_fit', self.refresh)
+        session_token = {'access_token': 'a', 'refresh_token': 'r', 'expires_at': time.time() + 60}
+        self.manager.current('google_fit', session_token)
+        self.manager.current('google_fit', {'access_token': 'b', 'refresh_token': 'other', 'expires_at': time.time() + 3600})
+
+        self.assertEqual(self.manager.refresh_expiring(), 1)
+        self.wait_until_idle()
+
+        self.assertEqual(self.refreshes, ['a'])
+        self.assertEqual(self.manager.current('google_fit', session_token)['access_token'], 'a+')
+
+    def test_rotated_refresh_tokens_stay_reachable(self):
+        """After the refresh token changes, the old session token still finds the new one"""
+        def rotating_refresh(token):
+            return {'access_token': 'new', 'refresh_token': 'r2', 'expires_at': time.time() + 3600}
+
+        self.manager.register('youtube_music', rotating_refresh)
+        old = {'access_token': 'old', 'refresh_token': 'r1', 'expires_at': time.time() - 1}
+        with self.manager.app.app_context():
+            self.assertEqual(self.manager.current('youtube_music', old)['access_token'], 'new')
+        self.assertEqual(self.manager.current('youtube_music', old)['access_token'], 'new')
+
+        self.manager.forget('youtube_music', old)
+        self.assertIsNone(self.manager.get('youtube_music', token_user({'refresh_token': 'r2'})))
+
+    def test_rejected_refresh_drops_the_token(self):
+        """A refresh token the provider rejects is no longer refreshed in the background"""
+        def rejected(token):
+            raise TokenRefreshError('invalid_grant')
+
+        self.manager.register('apple_fitness', rejected)
+        token = {'access_token': 'a', 'refresh_token': 'r', 'expires_at': time.time() + 10}
+        self.manager.current('apple_fitness', token)
+        self.manager.refresh_expiring()
+        self.wait_until_idle()
+
+        self.assertIsNone(self.manager.get('apple_fitness', token_user(token)))
+        with self.assertRaises(TokenRefreshError):
+            self.manager.current('apple_fitness', dict(token, expires_at=time.time() - 1))
+
+    def test_single_use_refresh_tokens_survive_a_restart(self):
+        """Fitbit tokens aren't refreshed in the background, so the session's refresh token stays usable"""
+        spent = set()
+
+        def single_use_refresh(token):
+            # Like Fitbit: each refresh token works once and the response carries the next one
+            if token['refresh_token'] in spent:
+                raise TokenRefreshError('invalid_grant')
+            spent.add(token['refresh_token'])
+            return dict(token, access_token=token['access_token'] + '+',
+                        refresh_token=token['refresh_token'] + '+', expires_at=time.time() + 3600)
+
+        self.manager.register('fitbit', single_use_refresh, background=False)
+        session_token = {'access_token': 'a', 'refresh_token': 'r', 'user_id': 'U2', 'expires_at': time.time() + 60}
+        self.assertIs(self.manager.current('fitbit', session_token), session_token)
+        self.assertEqual(self.manager.refresh_expiring(), 0)
+        self.wait_until_idle()
+        self.assertEqual(spent, set())
+
+        # After a restart the session token expires and is refreshed on the request path
+        restarted = TokenManager(interval=3600, refresh_margin=300, max_workers=2)
+        restarted.init_app(self.manager.app)
+        self.addCleanup(restarted.stop)
+        restarted.register('fitbit', single_use_refresh, background=False)
+        expired = dict(session_token, expires_at=time.time() - 1)
+        with restarted.app.app_context():
+            session_token = restarted.current('fitbit', expired)
+        self.assertEqual((session_token['access_token'], session_token['refresh_token']), ('a+', 'r+'))
+
+        # The token written back to the session keeps working in yet another process
+        another = TokenManager(interval=3600, refresh_margin=300, max_workers=2)
+        another.init_app(self.manager.app)
+        self.addCleanup(another.stop)
+        another.register('fitbit', single_use_refresh, background=False)
+        with another.app.app_context():
+            refreshed = another.current('fitbit', dict(session_token, expires_at=time.time() - 1))
+        self.assertEqual(refreshed['refresh_token'], 'r++')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import struct
+
+# Flag bits of the Heart Rate Measurement characteristic (GATT 0x2A37)
+FLAG_VALUE_UINT16 = 0x01      # Bit 0: Heart Rate Value Format (0: UINT8, 1: UINT16)
+FLAG_CONTACT_DETECTED = 0x02  # Bit 1: Sensor Contact Status
+FLAG_CONTACT_SUPPORTED = 0x04 # Bit 2: Sensor Contact Support
+FLAG_ENERGY_PRESENT = 0x08    # Bit 3: Energy Expended field present (UINT16, kJ)
+FLAG_RR_PRESENT = 0x10        # Bit 4: One or more RR-Interval fields present (UINT16 each)
+
+# RR intervals are transmitted in units of 1/1024 second
+RR_UNITS_PER_SECOND = 1024
+
+
+def parse_heart_rate_measurement(data):
+    """
+    Decode a Heart Rate Measurement notification
+
+    The whole packet is unpacked with a single ``struct.unpack_from`` call over
+    a memoryview, using a format string derived from the flags byte.
+
+    Args:
+        data (bytes-like): Raw characteristic value
+
+    Returns:
+        dict: heart_rate (int), sensor_contact (bool, or None when not
+        supported), energy_expended (int kJ or None) and rr_intervals
+        (list of RR intervals in milliseconds, possibly empty)
+
+    Raises:
+        ValueError: If the packet is shorter than its flags require
+    """
+    packet = memoryview(data)
+    if len(packet) < 2:
+        raise ValueError("Heart Rate Measurement packet is too short")
+
+    flags = packet[0]
+    fields = '<B' + ('H' if flags & FLAG_VALUE_UINT16 else 'B')
+    if flags & FLAG_ENERGY_PRESENT:
+        fields += 'H'
+
+    rr_count = 0
+    if flags & FLAG_RR_PRESENT:
+        rr_count = (len(packet) - struct.calcsize(fields)) // 2
+        fields += '%dH' % max(rr_count, 0)
+
+    try:
+        values = struct.unpack_from(fields, packet)
+    except struct.error as e:
+        raise ValueError(f"Malformed Heart Rate Measurement packet: {e}")
+
+    energy_expended = values[2] if flags & FLAG_ENERGY_PRESENT else None
+    raw_rr = values[len(values) - rr_count:] if rr_count else ()
+
+    return {
+        'heart_rate': values[1],
+        'sensor_contact': bool(flags & FLAG_CONTACT_DETECTED) if flags & FLAG_CONTACT_SUPPORTED else None,
+        'energy_expended': energy_expended,
+        'rr_intervals': [round(rr * 1000 / RR_UNITS_PER_SECOND) for rr in raw_rr]
+    }
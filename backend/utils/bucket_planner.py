@@ -0,0 +1,112 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# bucketByTime sizes to choose from, finest first
+BUCKET_DURATIONS_MS = (15000, 30000, 60000, 120000, 300000, 600000, 900000, 1800000, 3600000)
+
+# Nominal span of each chart period
+PERIOD_SECONDS = {
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400
+}
+
+# Buckets per period when the client doesn't send a point budget: 15 seconds
+# for a day (the original resolution), 1 minute for a week, 5 minutes for a month
+DEFAULT_BUCKETS = {
+    'day': 5760,
+    'week': 10080,
+    'month': 8640
+}
+
+# Buckets requested per returned point, so LTTB still has peaks and troughs to pick from
+OVERSAMPLE = 4
+
+# Upper bound on buckets in one aggregate call; see BucketPlan.slice_days
+MAX_BUCKETS_PER_REQUEST = 8640
+
+
+class BucketPlan(namedtuple('BucketPlan', ['duration_ms', 'max_buckets'])):
+    """
+    Bucket size for an aggregate query and how to split its range
+
+    Attributes:
+        duration_ms (int): bucketByTime.durationMillis
+        max_buckets (int): Most buckets a single request may cover
+    """
+    __slots__ = ()
+
+    @property
+    def slice_days(self):
+        """Week-sized slices when a week of buckets fits in one request, else day-sized"""
+        return 7 if 7 * 86400000 // self.duration_ms <= self.max_buckets else 1
+
+    def slices(self, start_time, end_time):
+        """Split [start_time, end_time) (unix seconds) into calendar slices of slice_days"""
+        return calendar_slices(start_time, end_time, self.slice_days)
+
+
+def calendar_slices(start_time, end_time, days=1):
+    """
+    Split a time range at local midnights
+
+    Day slices end at every midnight; week slices end at midnight between
+    Sunday and Monday. Except at the ends of the range, slices therefore
+    cover whole calendar days or weeks, so the same slice recurs in every
+    range that contains it and can be cached on its own.
+
+    Args:
+        start_time (int): Range start, unix seconds
+        end_time (int): Range end, unix seconds
+        days (int): 1 for day slices, 7 for week slices
+
+    Returns:
+        list: (start_time, end_time) pairs in time order
+    """
+    slices = []
+    start = start_time
+    day = datetime.fromtimestamp(start_time).date()
+    while start < end_time:
+        day += timedelta(days=1)
+        if days == 7:
+            day += timedelta(days=-day.weekday() % 7)
+        boundary = int(datetime(day.year, day.month, day.day).timestamp())
+        slices.append((start, min(boundary, end_time)))
+        start = boundary
+    return slices or [(start_time, end_time)]
+
+
+def is_local_midnight(timestamp):
+    """Whether a unix timestamp falls exactly on a local midnight"""
+    moment = datetime.fromtimestamp(timestamp)
+    return moment.hour == moment.minute == moment.second == 0
+
+
+@lru_cache(maxsize=256)
+def plan_buckets(period, max_points=None):
+    """
+    Choose the bucketByTime size for a chart period and point budget
+
+    The finest bucket that yields no more than OVERSAMPLE buckets per
+    requested point (or the period's default bucket count) is used, so long
+    ranges are no longer fetched at 15-second resolution only to be
+    downsampled afterwards. Plans are cached per (period, max_points).
+
+    Args:
+        period (str): 'day', 'week' or 'month'; anything else is treated as a day
+        max_points (int, optional): Number of points the chart will show
+
+    Returns:
+        BucketPlan: The chosen plan
+    """
+    span_ms = PERIOD_SECONDS.get(period, PERIOD_SECONDS['day']) * 1000
+    if max_points:
+        target = max_points * OVERSAMPLE
+    else:
+        target = DEFAULT_BUCKETS.get(period, DEFAULT_BUCKETS['day'])
+
+    for duration_ms in BUCKET_DURATIONS_MS:
+        if span_ms / duration_ms <= target:
+            break
+    return BucketPlan(duration_ms, MAX_BUCKETS_PER_REQUEST)
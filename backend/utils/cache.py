@@ -0,0 +1,442 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+from config import Config
+
+# One cache per namespace (e.g. 'fitbit', 'google_fit', 'spoonacular'), created on first use
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def estimate_size(value):
+    """Approximate the memory footprint of a cached value by its JSON length"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    try:
+        return len(json.dumps(value, separators=(',', ':')))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+def serialize(value):
+    """Encode a cached value for storage outside the process"""
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def deserialize(payload):
+    """Decode a value stored with ``serialize``"""
+    return json.loads(payload)
+
+
+class CacheBackend(ABC):
+    """
+    Interface shared by all cache backends
+
+    Values must be JSON serializable. Backends that store values outside the
+    process return a fresh copy on every ``get``; the in-memory backend returns
+    the stored object itself, so callers must treat cached values as read-only.
+    """
+
+    @abstractmethod
+    def get(self, key, default=None):
+        """The live value for ``key``, or ``default`` when missing or expired"""
+
+    @abstractmethod
+    def set(self, key, value, ttl, size=None):
+        """Store ``value`` for ``ttl`` seconds"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove ``key`` if present"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry"""
+
+    @abstractmethod
+    def keys(self):
+        """Keys of the live entries"""
+
+    @abstractmethod
+    def stats(self):
+        """Hit, miss and size counters as a dict"""
+
+    def __len__(self):
+        return len(self.keys())
+
+
+class LRUCache(CacheBackend):
+    """
+    Thread-safe in-memory cache with per-entry TTLs and a total size bound
+
+    Entries are kept in least-recently-used order. When adding an entry would
+    exceed ``max_bytes`` (or ``max_entries``), the least recently used
+    entries are evicted first. Expired entries are dropped lazily when they
+    are looked up or reached during eviction.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        """Cached keys, least recently used first"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get(self, key, default=None):
+        """
+        Look up a cached value
+
+        Returns:
+            The cached value, or ``default`` if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, size = entry
+            if expires_at <= time.time():
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl, size=None):
+        """
+        Store a value
+
+        Args:
+            key (str): Cache key
+            value: Value to cache (stored by reference, callers must not mutate it)
+            ttl (float): Time to live in seconds; non-positive values skip caching
+            size (int, optional): Size in bytes, estimated when not given
+        """
+        if ttl <= 0:
+            return
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return  # Never let one huge response flush the whole cache
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._remove(key, existing[2])
+
+            self._entries[key] = (value, time.time() + ttl, size)
+            self.current_bytes += size
+            self._evict()
+
+    def delete(self, key):
+        """Remove a single entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove(key, entry[2])
+
+    def clear(self):
+        """Remove every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _remove(self, key, size):
+        del self._entries[key]
+        self.current_bytes -= size
+
+    def _evict(self):
+        """Drop least recently used entries until the size bounds hold (lock held)"""
+        now = time.time()
+        while self._entries and (self.current_bytes > self.max_bytes or
+                                 (self.max_entries and len(self._entries) > self.max_entries)):
+            key, (_, expires_at, size) = next(iter(self._entries.items()))
+            self._remove(key, size)
+            if expires_at <= now:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a SQLite database file shared by every worker process
+
+    Entries survive restarts and are visible to all gunicorn workers on the
+    host. Each namespace is a separate set of rows in the same file. Access
+    times are tracked so the least recently used rows are evicted once the
+    namespace exceeds ``max_bytes``. Hit/miss counters are per process.
+    """
+
+    def __init__(self, path, namespace='default', max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (namespace, accessed_at)')
+
+    def _connect(self):
+        """One connection per thread; WAL lets readers and a writer work concurrently"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?',
+            (self.namespace, key)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            if row is not None:
+                conn.execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+            self._count(False)
+            return default
+
+        conn.execute(
+            'UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?',
+            (now, self.namespace, key)
+        )
+        self._count(True)
+        return deserialize(row[0])
+
+    def set(self, key, value, ttl, size=None):
+        if ttl <= 0:
+            return
+        payload = serialize(value)
+        if len(payload) > self.max_bytes:
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at, size) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (self.namespace, key, payload, now + ttl, now, len(payload))
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        """Drop expired rows, then least recently used rows until the namespace fits"""
+        conn.execute('DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?', (self.namespace, now))
+        total = conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?', (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute(
+                'SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed_at', (self.namespace,)):
+            victims.append((self.namespace, key))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', victims)
+        with self._stats_lock:
+            self.evictions += len(victims)
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+    def keys(self):
+        rows = self._connect().execute(
+            'SELECT key FROM cache_entries WHERE namespace = ? AND expires_at > ? ORDER BY accessed_at',
+            (self.namespace, time.time())
+        )
+        return [row[0] for row in rows]
+
+    def stats(self):
+        entries, total = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ? AND expires_at > ?',
+            (self.namespace, time.time())
+        ).fetchone()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'entries': entries,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions
+            }
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache stored in Redis, shared by every worker and host
+
+    Expiry uses Redis TTLs and size bounds are left to the server's
+    ``maxmemory``/``maxmemory-policy allkeys-lru`` settings. A client object
+    with the redis-py interface can be injected (e.g. a local stand-in in tests).
+    """
+
+    def __init__(self, url=None, namespace='default', client=None):
+        if client is None:
+            # Import lazily so redis is only required when this backend is selected
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.namespace = namespace
+        self.prefix = f"cache:{namespace}:"
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        payload = self.client.get(self.prefix + key)
+        with self._stats_lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return default if payload is None else deserialize(payload)
+
+    def set(self, key, value, ttl, size=None):
+        if ttl <= 0:
+            return
+        # Redis expiries are whole seconds
+        self.client.set(self.prefix + key, serialize(value), ex=max(int(round(ttl)), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def keys(self):
+        prefix_length = len(self.prefix)
+        return [
+            (key.decode('utf-8') if isinstance(key, bytes) else key)[prefix_length:]
+            for key in self.client.scan_iter(match=self.prefix + '*')
+        ]
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'redis',
+                'entries': len(self.keys()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+
+def _cache_setting(name):
+    """Read a CACHE_* setting from the app config, falling back to Config outside an app"""
+    if has_app_context() and name in current_app.config:
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def create_cache(namespace, backend=None):
+    """
+    Build a cache backend from the CACHE_* settings
+
+    Args:
+        namespace (str): Name that keeps this cache's keys apart from other caches
+        backend (str, optional): 'memory', 'sqlite' or 'redis'; defaults to CACHE_BACKEND
+
+    Returns:
+        CacheBackend: The configured cache
+    """
+    backend = backend or _cache_setting('CACHE_BACKEND')
+    max_bytes = _cache_setting('CACHE_MAX_BYTES')
+    if backend == 'sqlite':
+        return SQLiteCache(_cache_setting('CACHE_SQLITE_PATH'), namespace, max_bytes)
+    if backend == 'redis':
+        return RedisCache(_cache_setting('CACHE_REDIS_URL'), namespace)
+    if backend != 'memory':
+        raise ValueError(f"Unknown cache backend: {backend}")
+    return LRUCache(max_bytes=max_bytes)
+
+
+def get_cache(namespace):
+    """
+    Get the shared cache for a namespace, creating it on first use
+
+    All modules that cache upstream responses go through this function, so
+    switching CACHE_BACKEND moves every cache to the same shared store.
+    """
+    cache = _caches.get(namespace)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(namespace)
+            if cache is None:
+                cache = _caches[namespace] = create_cache(namespace)
+    return cache
@@ -1,19 +1,25 @@
 from datetime import datetime
-import statistics
-import math
+from utils.heart_rate_series import HeartRateSeries
+from utils.rhythm_detector import RhythmWindow
+from utils.hrv import compute_hrv_batch
+from utils.rollups import ACTIVITY_FIELDS, sleep_rollup, sleep_row, activity_rollup, activity_row
 
-def process_heart_rate_data(raw_data, period):
+def process_heart_rate_data(raw_data, period, max_points=None):
     """
     Process heart rate data from Fitbit API
     
     Args:
         raw_data (dict): Raw data from Fitbit API
         period (str): Time period (day, week, month, 3month)
+        max_points (int, optional): Downsample intraday data to at most this
+            many points using LTTB instead of grouping by minute
     
     Returns:
         list: Processed data
     """
     processed_data = []
+    budgeted_series = []  # Intraday samples sharing the max_points budget
+    summary_rows = []
     
     # Extract heart rate data handling both intraday and multi-day data
     try:
@@ -27,67 +33,25 @@ def process_heart_rate_data(raw_data, period):
                 has_intraday_data = True
                 base_date = raw_data['activities-heart'][0]['dateTime'] if 'activities-heart' in raw_data and raw_data['activities-heart'] else ''
                 
-                # Process full intraday dataset when available - this gives the most detailed view
-                processed_data_full = []
-                for idx, point in enumerate(intraday_data):
-                    time_str = point['time']
-                    hour_min_sec = time_str.split(':')
-                    hour = int(hour_min_sec[0])
-                    hour_12 = hour % 12 or 12
-                    am_pm = 'AM' if hour < 12 else 'PM'
-                    
-                    processed_data_full.append({
-                        'time': f"{hour_12}:{hour_min_sec[1]}:{hour_min_sec[2]} {am_pm}",
-                        'rawTime': time_str,
-                        'date': base_date,
-                        'value': point['value'],  # Raw heart rate value
-                        'avg': point['value'],    # For visualization compatibility
-                        'timestamp': idx  # For sorting and animation
-                    })
+                # Pack the dataset into columnar arrays; rows are only built at the end
+                if isinstance(intraday_data, HeartRateSeries):
+                    series = intraday_data  # Already columnar (e.g. the BLE ring buffer)
+                else:
+                    series = HeartRateSeries.from_dataset(intraday_data, base_date)
                 
+                # With a point budget, all intraday samples are downsampled together at the end
+                if max_points:
+                    budgeted_series.append(series)
                 # If there are too many points, downsample by grouping by minutes
                 # This helps with performance while still preserving the data distribution
-                if len(processed_data_full) > 5000:
-                    print(f"Downsampling large dataset with {len(processed_data_full)} points")
-                    # Group by minutes
-                    minute_groups = {}
-                    for point in intraday_data:
-                        time_str = point['time']
-                        minute_key = time_str[:5]  # Get HH:MM part
-                        
-                        if minute_key not in minute_groups:
-                            minute_groups[minute_key] = []
-                        
-                        minute_groups[minute_key].append(point['value'])
-                    
-                    # Create one data point per minute with stats
-                    processed_data_minutes = []
-                    for minute, values in minute_groups.items():
-                        # Get hour and minute for better display
-                        hour_min = minute.split(':')
-                        hour = int(hour_min[0])
-                        hour_12 = hour % 12 or 12  # Convert to 12-hour format
-                        am_pm = 'AM' if hour < 12 else 'PM'
-                        
-                        processed_data_minutes.append({
-                            'time': f"{hour_12}:{hour_min[1]} {am_pm}",
-                            'rawTime': minute,  # For sorting
-                            'date': base_date,
-                            'avg': round(statistics.mean(values)),
-                            'min': min(values),
-                            'max': max(values),
-                            'values': values,
-                            'count': len(values)  # How many original data points
-                        })
-                    
-                    # Sort by raw time
-                    processed_data_minutes.sort(key=lambda x: x['rawTime'])
-                    processed_data = processed_data_minutes
-                    print(f"Downsampled to {len(processed_data_minutes)} minute-grouped points")
+                elif len(series) > 5000:
+                    print(f"Downsampling large dataset with {len(series)} points")
+                    processed_data = series.minute_rows()
+                    print(f"Downsampled to {len(processed_data)} minute-grouped points")
                 else:
                     # Use full resolution data
-                    processed_data = processed_data_full
-                    print(f"Using full resolution data with {len(processed_data_full)} points")
+                    processed_data = series.rows()
+                    print(f"Using full resolution data with {len(processed_data)} points")
         
         # If no intraday data or if we have a multi-day period, also process daily summaries
         if not has_intraday_data or period != 'day':
@@ -102,21 +66,11 @@ def process_heart_rate_data(raw_data, period):
                     
                     # If we have intraday data for this day, process it (for multi-day requests)
                     if day_intraday_data and len(day_intraday_data) > 0:
-                        for idx, point in enumerate(day_intraday_data):
-                            time_str = point['time']
-                            hour_min_sec = time_str.split(':')
-                            hour = int(hour_min_sec[0])
-                            hour_12 = hour % 12 or 12
-                            am_pm = 'AM' if hour < 12 else 'PM'
-                            
-                            processed_data.append({
-                                'time': f"{hour_12}:{hour_min_sec[1]}:{hour_min_sec[2]} {am_pm}",
-                                'rawTime': time_str,
-                                'date': date,
-                                'value': point['value'],
-                                'avg': point['value'],
-                                'timestamp': idx
-                            })
+                        day_series = HeartRateSeries.from_dataset(day_intraday_data, date)
+                        if max_points:
+                            budgeted_series.append(day_series)
+                        else:
+                            processed_data.extend(day_series.rows())
                     else:
                         # Otherwise use daily summary
                         if 'value' in day and 'heartRateZones' in day['value']:
@@ -134,13 +88,30 @@ def process_heart_rate_data(raw_data, period):
                             
                             # Only add day summaries if we don't have intraday data (to avoid duplicates)
                             if not has_intraday_data or date != base_date:
-                                processed_data.append({
+                                (summary_rows if max_points else processed_data).append({
                                     'date': date,
                                     'restingHeartRate': resting_hr,
                                     'min': min_hr,
                                     'max': max_hr,
                                     'is_daily_summary': True
                                 })
+        
+        # Run LTTB once over every day's samples so the intraday and daily summary
+        # rows together stay within max_points however many days there are
+        if budgeted_series:
+            series = HeartRateSeries.concat(budgeted_series)
+            intraday_points = max_points - len(summary_rows)
+            if intraday_points <= 0:
+                intraday_rows = []
+            elif len(series) > intraday_points:
+                intraday_rows = series.rows(series.lttb(intraday_points))
+                print(f"Downsampled {len(series)} points to {len(intraday_rows)} with LTTB")
+            else:
+                intraday_rows = series.rows()
+            # Both lists are already in date order; the sort is stable, so this is a merge
+            processed_data = sorted(intraday_rows + summary_rows, key=lambda row: row['date'])
+        elif summary_rows:
+            processed_data = summary_rows
     except (KeyError, IndexError) as e:
         # Handle missing data
         print(f"Error processing heart rate data: {e}")
@@ -148,10 +119,34 @@ def process_heart_rate_data(raw_data, period):
     
     return processed_data
 
+def attach_rr_intervals(minute_rows, rr_series):
+    """
+    Add sensor-reported RR intervals to per-minute heart rate rows
+    
+    Args:
+        minute_rows (list): Rows from HeartRateSeries.minute_rows
+        rr_series (HeartRateSeries): RR intervals (milliseconds) in place of bpm,
+            e.g. a BLE ring buffer RR window
+    
+    Returns:
+        list: The same rows; those with RR intervals in their minute carry them under 'rr'
+    """
+    rr_by_minute = {(row['date'], row['rawTime']): row['values'] for row in rr_series.minute_rows()}
+    for row in minute_rows:
+        rr_intervals = rr_by_minute.get((row['date'], row['rawTime']))
+        if rr_intervals:
+            row['rr'] = rr_intervals
+    return minute_rows
+
 def detect_abnormal_rhythms(heart_rate_data):
     """
     Detect potentially abnormal heart rhythms using advanced analysis algorithms
     
+    Each entry's values are streamed once through a RhythmWindow, which keeps
+    running HRV statistics and run-length counters instead of rescanning the
+    values for every check. Entries that carry sensor-reported RR intervals
+    under 'rr' (milliseconds) use them for HRV instead of BPM deltas.
+    
     Args:
         heart_rate_data (list): Processed heart rate data
         
@@ -160,212 +155,68 @@ def detect_abnormal_rhythms(heart_rate_data):
     """
     abnormal_events = []
     
-    # Implement more sophisticated analysis algorithms backed by medical research
-    # These algorithms detect various cardiac arrhythmias and anomalies
-    
     for entry in heart_rate_data:
         values = entry.get('values', [])
         
         if not values or len(values) < 2:
             continue
         
-        # Calculate heart rate variability metrics
-        rr_intervals = []  # Time between consecutive beats in ms
-        for i in range(1, len(values)):
-            if values[i-1] > 0 and values[i] > 0:
-                # Convert BPM to milliseconds between beats
-                rr_prev = 60000 / values[i-1]  
-                rr_curr = 60000 / values[i]
-                rr_intervals.append(abs(rr_curr - rr_prev))
-        
-        # Skip if insufficient RR intervals for analysis
-        if len(rr_intervals) < 3:
-            continue
-            
-        # Calculate RMSSD (Root Mean Square of Successive Differences)
-        rmssd = calculate_rmssd(rr_intervals)
-        
-        # Calculate time-domain HRV metrics
-        sdnn = calculate_sdnn(rr_intervals)  # Standard deviation of NN intervals
-        
-        # Calculate pNN50 (percentage of adjacent NN intervals that differ by more than 50 ms)
-        differences = [abs(rr_intervals[i] - rr_intervals[i-1]) for i in range(1, len(rr_intervals))]
-        pnn50 = 100 * sum(1 for diff in differences if diff > 50) / len(differences) if differences else 0
-        
-        # Tachycardia detection (persistent high heart rate)
-        consecutive_high = 0
-        for val in values:
-            if val > 100:  # Resting HR consistently above 100 BPM
-                consecutive_high += 1
-            else:
-                consecutive_high = 0
-                
-            # Detect sustained tachycardia (high heart rate for 5+ consecutive readings)
-            if consecutive_high >= 5:
-                abnormal_events.append({
-                    'date': entry.get('date', ''),
-                    'time': entry.get('time', ''),
-                    'type': 'Tachycardia',
-                    'value': f"{val} BPM sustained",
-                    'severity': 'Medium' if val < 120 else 'High',
-                    'details': 'Sustained elevated heart rate at rest',
-                    'hrv_metrics': {'rmssd': round(rmssd, 2), 'sdnn': round(sdnn, 2), 'pnn50': round(pnn50, 2)}
-                })
-                break
-                
-        # Bradycardia detection (persistent low heart rate)
-        consecutive_low = 0
-        for val in values:
-            if val < 50:  # Consistently below 50 BPM
-                consecutive_low += 1
-            else:
-                consecutive_low = 0
-                
-            # Detect sustained bradycardia (low heart rate for 5+ consecutive readings)
-            if consecutive_low >= 5:
-                abnormal_events.append({
-                    'date': entry.get('date', ''),
-                    'time': entry.get('time', ''),
-                    'type': 'Bradycardia',
-                    'value': f"{val} BPM sustained",
-                    'severity': 'Medium' if val > 40 else 'High',
-                    'details': 'Sustained low heart rate',
-                    'hrv_metrics': {'rmssd': round(rmssd, 2), 'sdnn': round(sdnn, 2), 'pnn50': round(pnn50, 2)}
-                })
-                break
-                
-        # Check for rapid changes in heart rate (potential arrythmia)
-        for i in range(1, len(values)):
-            change = abs(values[i] - values[i-1])
-            
-            # Flag sudden changes greater than 30 BPM
-            if change > 30:
-                abnormal_events.append({
-                    'date': entry.get('date', ''),
-                    'time': entry.get('time', ''),
-                    'type': 'Sudden change',
-                    'value': f"Change of {change} BPM",
-                    'severity': 'Medium' if change < 40 else 'High',
-                    'details': 'Rapid change in heart rate may indicate ectopic beats or arrhythmia',
-                    'hrv_metrics': {'rmssd': round(rmssd, 2), 'sdnn': round(sdnn, 2), 'pnn50': round(pnn50, 2)}
-                })
-        
-        # Heart Rate Variability Analysis for potential arrhythmias
-        if sdnn < 20 and len(rr_intervals) > 10:
-            # Low HRV can indicate cardiac stress or autonomic dysfunction
-            abnormal_events.append({
-                'date': entry.get('date', ''),
-                'time': entry.get('time', ''),
-                'type': 'Low HRV',
-                'value': f"SDNN: {round(sdnn, 2)} ms",
-                'severity': 'Medium',
-                'details': 'Low heart rate variability may indicate reduced cardiac autonomic function',
-                'hrv_metrics': {'rmssd': round(rmssd, 2), 'sdnn': round(sdnn, 2), 'pnn50': round(pnn50, 2)}
-            })
-            
-        # Detect potential Atrial Fibrillation using HRV analysis
-        if len(rr_intervals) > 20:
-            # Poincaré plot analysis
-            sd1, sd2 = calculate_poincare_metrics(rr_intervals)
-            sd_ratio = sd1/sd2 if sd2 != 0 else 0
-            
-            # Irregularity metrics
-            cov_rr = (statistics.stdev(rr_intervals) / statistics.mean(rr_intervals)) * 100 if rr_intervals else 0
-            
-            # Potential AFib detection based on RR irregularity and Poincaré plot metrics
-            if cov_rr > 15 and sd_ratio > 0.8:
-                abnormal_events.append({
-                    'date': entry.get('date', ''),
-                    'time': entry.get('time', ''),
-                    'type': 'Potential AFib',
-                    'value': f"High irregularity (COV: {round(cov_rr, 2)}%)",
-                    'severity': 'High',
-                    'details': 'Irregular rhythm pattern suggestive of atrial fibrillation',
-                    'hrv_metrics': {
-                        'rmssd': round(rmssd, 2), 
-                        'sdnn': round(sdnn, 2), 
-                        'pnn50': round(pnn50, 2),
-                        'sd1': round(sd1, 2),
-                        'sd2': round(sd2, 2)
-                    }
-                })
-        
-        # Ectopic beat detection
-        potential_ectopics = detect_ectopic_beats(values, rr_intervals)
-        if potential_ectopics > 3:
-            abnormal_events.append({
-                'date': entry.get('date', ''),
-                'time': entry.get('time', ''),
-                'type': 'Ectopic Beats',
-                'value': f"{potential_ectopics} detected",
-                'severity': 'Medium' if potential_ectopics < 10 else 'High',
-                'details': 'Potential premature ventricular or atrial contractions',
-                'hrv_metrics': {'rmssd': round(rmssd, 2), 'sdnn': round(sdnn, 2), 'pnn50': round(pnn50, 2)}
-            })
+        rr_intervals = entry.get('rr')
+        window = RhythmWindow(derive_rr=not rr_intervals)
+        window.extend(values)
+        if rr_intervals:
+            window.extend_rr(rr_intervals)
+        abnormal_events.extend(window.events(entry.get('date', ''), entry.get('time', '')))
             
     return abnormal_events
 
-def calculate_rmssd(rr_intervals):
-    """Calculate Root Mean Square of Successive Differences (RMSSD)"""
-    if not rr_intervals or len(rr_intervals) < 2:
-        return 0
-        
-    # Calculate differences between adjacent RR intervals
-    differences = [abs(rr_intervals[i] - rr_intervals[i-1]) for i in range(1, len(rr_intervals))]
+def process_hrv_data(raw_data):
+    """
+    Compute per-minute heart rate variability from Fitbit intraday data
     
-    # Calculate mean of squared differences
-    mean_squared_diff = sum(diff**2 for diff in differences) / len(differences)
+    All minute windows of the day are analyzed in a single vectorized call.
     
-    # Return the square root
-    return math.sqrt(mean_squared_diff)
-
-def calculate_sdnn(rr_intervals):
-    """Calculate Standard Deviation of NN (normal-to-normal) intervals"""
-    if not rr_intervals:
-        return 0
-    try:
-        return statistics.stdev(rr_intervals)
-    except statistics.StatisticsError:
-        return 0
-
-def calculate_poincare_metrics(rr_intervals):
-    """
-    Calculates Poincaré plot metrics SD1 and SD2
-    SD1 represents short-term variability
-    SD2 represents long-term variability
+    Args:
+        raw_data (dict): Raw intraday heart rate data from Fitbit API
+    
+    Returns:
+        list: One entry per minute with enough samples for HRV analysis
     """
-    if len(rr_intervals) < 2:
-        return 0, 0
-        
-    # Create scatter plot coordinates
-    x = rr_intervals[:-1]  # RRn
-    y = rr_intervals[1:]   # RRn+1
+    dataset = raw_data.get('activities-heart-intraday', {}).get('dataset', [])
+    if not dataset:
+        return []
     
-    # Calculate SD1 and SD2 using ellipse fitting method
-    sd1 = math.sqrt(statistics.variance([y[i] - x[i] for i in range(len(x))]) / 2)
-    sd2 = math.sqrt(statistics.variance([y[i] + x[i] for i in range(len(x))]) / 2)
+    heart_days = raw_data.get('activities-heart') or [{}]
+    if isinstance(dataset, HeartRateSeries):
+        series = dataset  # Already columnar (e.g. a streamed response)
+    else:
+        series = HeartRateSeries.from_dataset(dataset, heart_days[0].get('dateTime', ''))
+    groups = series.minute_groups()
+    metrics = compute_hrv_batch(series.bpm[groups['order']], groups['starts'])
     
-    return sd1, sd2
-
-def detect_ectopic_beats(heart_rates, rr_intervals):
-    """
-    Detect potential ectopic beats (premature ventricular contractions or atrial contractions)
-    based on RR interval patterns
-    """
-    if len(rr_intervals) < 3:
-        return 0
+    processed_data = []
+    for minute_of_day, record in zip(groups['minute'].tolist(), metrics.tolist()):
+        rr_count, rmssd, sdnn, pnn50, sd1, sd2, ectopic_beats = record
         
-    ectopic_count = 0
+        # Same minimum as the abnormal rhythm detector
+        if rr_count < 3:
+            continue
+        
+        hour, minute = divmod(minute_of_day, 60)
+        processed_data.append({
+            'time': f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}",
+            'rawTime': f"{hour:02d}:{minute:02d}",
+            'date': series.dates[0],
+            'rrCount': rr_count,
+            'rmssd': round(rmssd, 2),
+            'sdnn': round(sdnn, 2),
+            'pnn50': round(pnn50, 2),
+            'sd1': round(sd1, 2),
+            'sd2': round(sd2, 2),
+            'ectopicBeats': ectopic_beats
+        })
     
-    # Analyze consecutive intervals for characteristic ectopic patterns
-    for i in range(2, len(rr_intervals)):
-        # PVC typically shows a short-long pattern:
-        # A premature beat followed by a compensatory pause
-        if (rr_intervals[i-1] < 0.8 * rr_intervals[i-2] and 
-            rr_intervals[i] > 1.2 * rr_intervals[i-2]):
-            ectopic_count += 1
-            
-    return ectopic_count
+    return processed_data
 
 def process_sleep_data(raw_data, period):
     """
@@ -454,71 +305,11 @@ def process_sleep_data(raw_data, period):
             sleep_by_date = {}
             
             for sleep_record in raw_data['sleep']:
-                date = sleep_record.get('dateOfSleep', '')
-                
-                if date not in sleep_by_date:
-                    sleep_by_date[date] = []
-                
-                sleep_by_date[date].append(sleep_record)
+                sleep_by_date.setdefault(sleep_record.get('dateOfSleep', ''), []).append(sleep_record)
             
-            # Process each date
+            # Sum each night's logs into a daily rollup and build its row
             for date, records in sleep_by_date.items():
-                total_duration = 0
-                total_efficiency = 0
-                total_deep = 0
-                total_light = 0
-                total_rem = 0
-                total_wake = 0
-                total_score = 0
-                score_count = 0
-                
-                for record in records:
-                    duration_ms = record.get('duration', 0)
-                    total_duration += duration_ms
-                    
-                    total_efficiency += record.get('efficiency', 0)
-                    
-                    summary = record.get('levels', {}).get('summary', {})
-                    
-                    total_deep += summary.get('deep', {}).get('minutes', 0)
-                    total_light += summary.get('light', {}).get('minutes', 0)
-                    total_rem += summary.get('rem', {}).get('minutes', 0)
-                    total_wake += summary.get('wake', {}).get('minutes', 0)
-                    
-                    if 'sleep_score' in record and 'total_score' in record['sleep_score']:
-                        total_score += record['sleep_score']['total_score']
-                        score_count += 1
-                
-                # Calculate averages
-                avg_duration_min = (total_duration / 60000) if records else 0  # convert to minutes
-                avg_efficiency = total_efficiency / len(records) if records else 0
-                avg_score = total_score / score_count if score_count > 0 else 0
-                
-                # Calculate percentages
-                total_sleep_minutes = total_deep + total_light + total_rem
-                if total_sleep_minutes > 0:
-                    deep_percent = round((total_deep / total_sleep_minutes) * 100)
-                    light_percent = round((total_light / total_sleep_minutes) * 100)
-                    rem_percent = round((total_rem / total_sleep_minutes) * 100)
-                else:
-                    deep_percent = light_percent = rem_percent = 0
-                
-                # Create processed record
-                sleep_entry = {
-                    'date': date,
-                    'durationMinutes': round(avg_duration_min),
-                    'efficiency': round(avg_efficiency),
-                    'deepSleepMinutes': total_deep,
-                    'lightSleepMinutes': total_light,
-                    'remSleepMinutes': total_rem,
-                    'awakeDuringNight': total_wake,
-                    'deepSleepPercentage': deep_percent,
-                    'lightSleepPercentage': light_percent,
-                    'remSleepPercentage': rem_percent,
-                    'score': round(avg_score)
-                }
-                
-                processed_data.append(sleep_entry)
+                processed_data.append(sleep_row(date, sleep_rollup(records)))
     
     # Sort by date
     processed_data.sort(key=lambda x: x['date'])
@@ -651,75 +442,16 @@ def process_activity_data(raw_data, period):
             available_dates = [day.get('dateTime', '') for day in steps_data]
             print(f"CRITICAL: Available dates: {available_dates}")
             
+            # Index every metric by date once instead of scanning each series per day
+            values_by_date = {date: {} for date in available_dates}
+            for _, metric, _ in ACTIVITY_FIELDS:
+                for entry in raw_data.get(f'activities-{metric}', []):
+                    if entry.get('dateTime') in values_by_date:
+                        values_by_date[entry['dateTime']][metric] = entry.get('value', 0)
+            
             # Process each day
-            for day_data in steps_data:
-                date = day_data.get('dateTime', '')
-                steps = int(day_data.get('value', 0))
-                print(f"CRITICAL: Processing day {date}, steps={steps}")
-                
-                # Find corresponding data for other metrics
-                calories = 0
-                for cal_data in raw_data.get('activities-calories', []):
-                    if cal_data.get('dateTime') == date:
-                        calories = int(cal_data.get('value', 0))
-                        print(f"CRITICAL: Found calories={calories} for {date}")
-                        break
-                
-                distance = 0
-                for dist_data in raw_data.get('activities-distance', []):
-                    if dist_data.get('dateTime') == date:
-                        distance = float(dist_data.get('value', 0))
-                        print(f"CRITICAL: Found distance={distance} for {date}")
-                        break
-                
-                floors = 0
-                for floor_data in raw_data.get('activities-floors', []):
-                    if floor_data.get('dateTime') == date:
-                        floors = int(floor_data.get('value', 0))
-                        print(f"CRITICAL: Found floors={floors} for {date}")
-                        break
-                
-                # Active minutes
-                sedentary = 0
-                lightly_active = 0
-                fairly_active = 0
-                very_active = 0
-                
-                # Get activity minutes from raw data if available
-                for min_data in raw_data.get('activities-minutesSedentary', []):
-                    if min_data.get('dateTime') == date:
-                        sedentary = int(min_data.get('value', 0))
-                        break
-                
-                for min_data in raw_data.get('activities-minutesLightlyActive', []):
-                    if min_data.get('dateTime') == date:
-                        lightly_active = int(min_data.get('value', 0))
-                        break
-                
-                for min_data in raw_data.get('activities-minutesFairlyActive', []):
-                    if min_data.get('dateTime') == date:
-                        fairly_active = int(min_data.get('value', 0))
-                        break
-                
-                for min_data in raw_data.get('activities-minutesVeryActive', []):
-                    if min_data.get('dateTime') == date:
-                        very_active = int(min_data.get('value', 0))
-                        break
-                
-                active_minutes = fairly_active + very_active
-                
-                processed_data.append({
-                    'dateTime': date,
-                    'steps': steps,
-                    'calories': calories,
-                    'distance': distance,
-                    'floors': floors,
-                    'activeMinutes': active_minutes,
-                    'sedentaryMinutes': sedentary,
-                    'lightActiveMinutes': lightly_active,
-                    'moderateActiveMinutes': fairly_active,
-                    'vigorousActiveMinutes': very_active
-                })
+            for date in available_dates:
+                processed_data.append(activity_row(date, activity_rollup(values_by_date[date])))
         except Exception as e:
             print(f"Error processing activity data: {e}")
     
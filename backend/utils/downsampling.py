@@ -0,0 +1,96 @@
+import numpy as np
+
+
+def parse_max_points(args):
+    """
+    Read the point budget for a chart response from the query string
+
+    Accepts either ``max_points`` or its alias ``resolution``. Missing,
+    malformed or non-positive values mean "no limit".
+
+    Args:
+        args (MultiDict): Request query arguments
+
+    Returns:
+        int or None: Maximum number of points to return
+    """
+    max_points = args.get('max_points', type=int)
+    if max_points is None:
+        max_points = args.get('resolution', type=int)
+    if max_points is None or max_points <= 0:
+        return None
+    return max_points
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Select points using the Largest-Triangle-Three-Buckets algorithm
+
+    LTTB keeps the first and last points and, for every bucket in between,
+    the point forming the largest triangle with the previously selected point
+    and the average of the next bucket. It preserves peaks and troughs far
+    better than taking every n-th sample.
+
+    Args:
+        x (array-like): Monotonically increasing x values (e.g. timestamps)
+        y (array-like): Values to preserve the shape of
+        threshold (int): Maximum number of points to keep
+
+    Returns:
+        numpy.ndarray: Sorted indices of the selected points
+    """
+    count = len(x)
+    if threshold >= count or count <= 2:
+        return np.arange(count)
+    if threshold < 3:
+        return np.array([0, count - 1][:max(threshold, 1)])
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket boundaries for the points between the first and last sample
+    every = (count - 2) / (threshold - 2)
+    edges = (np.floor(np.arange(threshold - 1) * every) + 1).astype(np.int64)
+    edges[-1] = count - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Triangle areas (times two) formed with the anchor and next average
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor]) -
+                      (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[bucket + 1] = anchor
+
+    return selected
+
+
+def downsample_rows(rows, max_points, x_key='timestamp', y_key='value'):
+    """
+    Downsample a list of chart rows with LTTB
+
+    Args:
+        rows (list): Rows sorted by ``x_key``
+        max_points (int): Maximum number of rows to return (None for no limit)
+        x_key (str): Key holding the x value
+        y_key (str): Key holding the value whose shape should be preserved
+
+    Returns:
+        list: The selected rows, in their original order
+    """
+    if not max_points or len(rows) <= max_points:
+        return rows
+
+    x = np.fromiter((row[x_key] for row in rows), dtype=np.float64, count=len(rows))
+    y = np.fromiter((row.get(y_key) or 0 for row in rows), dtype=np.float64, count=len(rows))
+    return [rows[idx] for idx in lttb_indices(x, y, max_points).tolist()]
@@ -0,0 +1,129 @@
+import numpy as np
+
+from utils.downsampling import lttb_indices
+from utils.heart_rate_series import HeartRateSeries, TWO_DIGIT_LABELS, AM_PM_LABELS
+
+# Zero-padded 12-hour labels, matching strftime('%I')
+HOUR_12_PADDED_LABELS = [TWO_DIGIT_LABELS[hour % 12 or 12] for hour in range(24)]
+
+NANOS_PER_SECOND = 1000000000
+
+
+def decode_heart_rate_buckets(data):
+    """
+    Flatten a dataset:aggregate heart rate response into sample arrays in one pass
+
+    Every ``fpVal`` of every point becomes one sample. A point is timed by its
+    startTimeMillis, else its startTimeNanos, else the start of its bucket.
+
+    Args:
+        data (dict): Decoded aggregate response with a 'bucket' list
+
+    Returns:
+        tuple: (int64 epoch seconds, float64 bpm) arrays in response order
+    """
+    timestamps = []
+    values = []
+    add_time = timestamps.append
+    add_value = values.append
+    for bucket in data.get('bucket') or ():
+        bucket_seconds = None
+        for dataset in bucket.get('dataset') or ():
+            for point in dataset.get('point') or ():
+                point_values = point.get('value')
+                if not point_values:
+                    continue
+                if 'startTimeMillis' in point:
+                    seconds = int(point['startTimeMillis']) // 1000
+                elif 'startTimeNanos' in point:
+                    seconds = int(point['startTimeNanos']) // NANOS_PER_SECOND
+                else:
+                    if bucket_seconds is None:
+                        bucket_seconds = int(bucket['startTimeMillis']) // 1000
+                    seconds = bucket_seconds
+                for value in point_values:
+                    if 'fpVal' in value:
+                        add_time(seconds)
+                        add_value(value['fpVal'])
+    return np.array(timestamps, dtype=np.int64), np.array(values, dtype=np.float64)
+
+
+class GoogleFitHeartRate(object):
+    """
+    Google Fit heart rate samples held as arrays
+
+    Epoch seconds and bpm come straight from the decoder; local dates and
+    times of day are worked out once for all samples (see
+    HeartRateSeries.from_epoch_ms), so filtering and counting by day are
+    integer operations. Row dicts are only built by ``rows``, for the samples
+    that are actually returned.
+    """
+    __slots__ = ('timestamps', 'bpm', 'local')
+
+    def __init__(self, timestamps, bpm, local=None):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.bpm = np.asarray(bpm, dtype=np.float64)
+        self.local = local if local is not None else HeartRateSeries.from_epoch_ms(self.timestamps * 1000, self.bpm)
+
+    @classmethod
+    def from_aggregate(cls, data):
+        """Decode a dataset:aggregate response"""
+        return cls(*decode_heart_rate_buckets(data))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _subset(self, positions):
+        local = HeartRateSeries(self.local.seconds[positions], self.local.bpm[positions],
+                                self.local.date_index[positions], self.local.dates)
+        return GoogleFitHeartRate(self.timestamps[positions], self.bpm[positions], local)
+
+    def on_date(self, date_str):
+        """Samples whose local date is date_str (YYYY-MM-DD)"""
+        if date_str not in self.local.dates:
+            return self._subset(np.zeros(0, dtype=np.int64))
+        return self._subset(np.flatnonzero(self.local.date_index == self.local.dates.index(date_str)))
+
+    def date_counts(self):
+        """Number of samples per local date, in date order"""
+        counts = np.bincount(self.local.date_index, minlength=len(self.local.dates)) if len(self) else []
+        return {date: int(count) for date, count in zip(self.local.dates, counts) if count}
+
+    def append(self, timestamp, value):
+        """Copy of the samples with one more sample at the end"""
+        return GoogleFitHeartRate(np.append(self.timestamps, timestamp), np.append(self.bpm, value))
+
+    def lttb(self, max_points):
+        """Sample positions that preserve the curve's shape, at most max_points of them"""
+        return lttb_indices(self.timestamps.astype(np.float64), self.bpm, max_points)
+
+    def rows(self, indices=None):
+        """
+        Materialize chart rows
+
+        Args:
+            indices (array-like, optional): Subset of sample positions to emit
+
+        Returns:
+            list: Dicts with timestamp, value, time ('%I:%M:%S %p'), date and source keys
+        """
+        positions = slice(None) if indices is None else np.asarray(indices, dtype=np.int64)
+        seconds = self.local.seconds[positions]
+        hours = (seconds // 3600).tolist()
+        minutes = (seconds // 60 % 60).tolist()
+        secs = (seconds % 60).tolist()
+        dates = self.local.dates
+
+        rows = []
+        append = rows.append
+        for timestamp, value, hour, minute, sec, day in zip(
+                self.timestamps[positions].tolist(), self.bpm[positions].tolist(),
+                hours, minutes, secs, self.local.date_index[positions].tolist()):
+            append({
+                "timestamp": timestamp,
+                "value": value,
+                "time": f"{HOUR_12_PADDED_LABELS[hour]}:{TWO_DIGIT_LABELS[minute]}:{TWO_DIGIT_LABELS[sec]} {AM_PM_LABELS[hour]}",
+                "date": dates[day],
+                "source": "googleFit"  # Add source for tracking
+            })
+        return rows
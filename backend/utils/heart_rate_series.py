@@ -0,0 +1,302 @@
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+
+import numpy as np
+
+from utils.downsampling import lttb_indices
+
+# Lookup tables used when formatting rows, indexed by hour of day / minute / second
+HOUR_12_LABELS = [str(hour % 12 or 12) for hour in range(24)]
+AM_PM_LABELS = ['AM' if hour < 12 else 'PM' for hour in range(24)]
+TWO_DIGIT_LABELS = ['%02d' % n for n in range(60)]
+
+# Day zero for converting local day numbers back to calendar dates
+EPOCH_DATE = date(1970, 1, 1)
+
+_get_time = itemgetter('time')
+_get_value = itemgetter('value')
+
+# ASCII code for ':' and '0', used by the packed time parser
+_COLON = 58
+_ZERO = 48
+
+
+def parse_time_strings(times):
+    """
+    Convert a list of 'HH:MM:SS' strings into seconds since midnight
+
+    Fitbit always sends zero-padded times, so the common case is handled by
+    viewing all strings as one packed byte buffer and decoding the digits in
+    a single vectorized step. Anything irregular falls back to a Python loop.
+
+    Args:
+        times (list): Time strings in HH:MM:SS format
+
+    Returns:
+        numpy.ndarray: int32 seconds since midnight
+    """
+    count = len(times)
+    if count == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    joined = ''.join(times)
+    if len(joined) == 8 * count and joined.isascii():
+        packed = np.frombuffer(joined.encode('ascii'), dtype=np.uint8).reshape(count, 8)
+        digits = packed[:, [0, 1, 3, 4, 6, 7]].astype(np.int32) - _ZERO
+        if ((digits >= 0) & (digits <= 9)).all() and (packed[:, 2] == _COLON).all() and (packed[:, 5] == _COLON).all():
+            hours = digits[:, 0] * 10 + digits[:, 1]
+            minutes = digits[:, 2] * 10 + digits[:, 3]
+            seconds = digits[:, 4] * 10 + digits[:, 5]
+            return hours * 3600 + minutes * 60 + seconds
+
+    # Slow path for times that aren't zero-padded
+    seconds = np.empty(count, dtype=np.int32)
+    for idx, time_str in enumerate(times):
+        hour_min_sec = time_str.split(':')
+        seconds[idx] = int(hour_min_sec[0]) * 3600 + int(hour_min_sec[1]) * 60 + int(hour_min_sec[2])
+    return seconds
+
+
+def pack_bpm_values(values):
+    """
+    Pack heart rate values into the smallest suitable NumPy array
+
+    Integer readings (the normal case for Fitbit and BLE) are stored as uint16.
+    Anything else is kept as float64 so the values round-trip unchanged.
+    """
+    bpm = np.asarray(values)
+    if bpm.dtype.kind in 'iu' and (bpm.size == 0 or (bpm.min() >= 0 and bpm.max() <= 0xFFFF)):
+        return bpm.astype(np.uint16)
+    return bpm.astype(np.float64)
+
+
+class HeartRateSeries(object):
+    """
+    Columnar representation of intraday heart rate samples
+
+    Samples are held as packed arrays (seconds since midnight, bpm and an index
+    into ``dates``) so grouping and statistics run vectorized. JSON-ready dicts
+    are only built by ``rows`` and ``minute_rows`` at the very end.
+    """
+    __slots__ = ('seconds', 'bpm', 'date_index', 'dates')
+
+    def __init__(self, seconds, bpm, date_index=None, dates=None):
+        self.seconds = np.asarray(seconds, dtype=np.int32)
+        self.bpm = bpm if isinstance(bpm, np.ndarray) else pack_bpm_values(bpm)
+        if date_index is None:
+            date_index = np.zeros(len(self.seconds), dtype=np.uint16)
+        self.date_index = np.asarray(date_index, dtype=np.uint16)
+        self.dates = list(dates) if dates else ['']
+
+    @classmethod
+    def from_dataset(cls, dataset, date=''):
+        """Build a series from a Fitbit style dataset of {'time', 'value'} dicts"""
+        seconds = parse_time_strings(list(map(_get_time, dataset)))
+        bpm = pack_bpm_values(list(map(_get_value, dataset)))
+        return cls(seconds, bpm, dates=[date])
+
+    @classmethod
+    def from_epoch_ms(cls, timestamps_ms, bpm):
+        """
+        Build a series from epoch millisecond timestamps (e.g. a BLE ring buffer window)
+
+        Timestamps are converted to local wall clock time. The UTC offset is
+        looked up once; only a window that crosses a DST change falls back to
+        a per-sample conversion. The arrays are copied, so the series stays
+        valid after the source buffer is overwritten. Fractional bpm values
+        (e.g. Google Fit averages) are kept as floats.
+        """
+        epoch_seconds = np.asarray(timestamps_ms, dtype=np.int64) // 1000
+        bpm = pack_bpm_values(np.asarray(bpm))
+        if len(epoch_seconds) == 0:
+            return cls(np.zeros(0, dtype=np.int32), bpm)
+
+        first_offset = datetime.fromtimestamp(int(epoch_seconds[0])).astimezone().utcoffset()
+        last_offset = datetime.fromtimestamp(int(epoch_seconds[-1])).astimezone().utcoffset()
+        if first_offset == last_offset:
+            local_seconds = epoch_seconds + int(first_offset.total_seconds())
+        else:
+            local_seconds = np.fromiter(
+                (sec + int(datetime.fromtimestamp(sec).astimezone().utcoffset().total_seconds())
+                 for sec in epoch_seconds.tolist()),
+                dtype=np.int64, count=len(epoch_seconds))
+
+        local_days = local_seconds // 86400
+        days, date_index = np.unique(local_days, return_inverse=True)
+        dates = [(EPOCH_DATE + timedelta(days=int(day))).strftime('%Y-%m-%d') for day in days]
+        return cls(local_seconds - local_days * 86400, bpm, date_index, dates)
+
+    @classmethod
+    def from_days(cls, days):
+        """
+        Concatenate per-day sample arrays (e.g. from the time-series store) into one series
+
+        Args:
+            days (list): (date, seconds, bpm) tuples in chronological order
+
+        Returns:
+            HeartRateSeries: Series with one entry in ``dates`` per non-empty day
+        """
+        days = [(date, seconds, bpm) for date, seconds, bpm in days if seconds is not None and len(seconds)]
+        if not days:
+            return cls(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16))
+
+        dates = [date for date, _, _ in days]
+        seconds = np.concatenate([day_seconds for _, day_seconds, _ in days])
+        bpm = np.concatenate([day_bpm for _, _, day_bpm in days])
+        date_index = np.repeat(np.arange(len(days), dtype=np.uint16), [len(day_seconds) for _, day_seconds, _ in days])
+        return cls(seconds, bpm, date_index, dates)
+
+    @classmethod
+    def concat(cls, series_list):
+        """
+        Join several series into one, keeping each sample's date
+
+        Args:
+            series_list (list): HeartRateSeries in chronological order
+
+        Returns:
+            HeartRateSeries: Series whose ``dates`` are those of the inputs in order
+        """
+        if len(series_list) == 1:
+            return series_list[0]
+
+        dates = []
+        date_index = []
+        for series in series_list:
+            date_index.append(series.date_index.astype(np.int64) + len(dates))
+            dates.extend(series.dates)
+        seconds = np.concatenate([series.seconds for series in series_list])
+        bpm = np.concatenate([series.bpm for series in series_list])
+        return cls(seconds, bpm, np.concatenate(date_index), dates)
+
+    def __len__(self):
+        return len(self.seconds)
+
+    def lttb(self, max_points):
+        """
+        Pick at most ``max_points`` samples that preserve the shape of the series
+
+        Returns:
+            numpy.ndarray: Sample positions in chronological order
+        """
+        elapsed = self.date_index.astype(np.int64) * 86400 + self.seconds
+        order = np.argsort(elapsed, kind='stable')
+        selected = lttb_indices(elapsed[order], self.bpm[order], max_points)
+        return order[selected]
+
+    def rows(self, indices=None):
+        """
+        Materialize full resolution rows
+
+        Args:
+            indices (array-like, optional): Subset of sample positions to emit
+
+        Returns:
+            list: Dicts with time, rawTime, date, value, avg and timestamp keys
+        """
+        if indices is None:
+            positions = range(len(self))
+            seconds = self.seconds
+            bpm = self.bpm
+            date_index = self.date_index
+        else:
+            positions = np.asarray(indices, dtype=np.int64)
+            seconds = self.seconds[positions]
+            bpm = self.bpm[positions]
+            date_index = self.date_index[positions]
+            positions = positions.tolist()
+
+        hours = (seconds // 3600).tolist()
+        minutes = (seconds // 60 % 60).tolist()
+        secs = (seconds % 60).tolist()
+        dates = self.dates
+
+        rows = []
+        append = rows.append
+        for position, hour, minute, sec, value, day in zip(positions, hours, minutes, secs, bpm.tolist(), date_index.tolist()):
+            mm = TWO_DIGIT_LABELS[minute]
+            ss = TWO_DIGIT_LABELS[sec]
+            append({
+                'time': f"{HOUR_12_LABELS[hour]}:{mm}:{ss} {AM_PM_LABELS[hour]}",
+                'rawTime': f"{TWO_DIGIT_LABELS[hour]}:{mm}:{ss}",
+                'date': dates[day],
+                'value': value,  # Raw heart rate value
+                'avg': value,    # For visualization compatibility
+                'timestamp': position  # For sorting and animation
+            })
+        return rows
+
+    def minute_groups(self):
+        """
+        Group samples by (date, minute) and compute per-minute statistics
+
+        Returns:
+            dict: Arrays keyed by 'order', 'starts', 'counts', 'minute',
+            'date_index', 'min', 'max' and 'avg'. ``order`` sorts samples
+            into group order and ``starts`` are offsets into that order.
+        """
+        minute_key = self.date_index.astype(np.int64) * 1440 + self.seconds // 60
+        order = np.argsort(minute_key, kind='stable')
+        sorted_key = minute_key[order]
+        sorted_bpm = self.bpm[order]
+
+        if len(sorted_key):
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_key)) + 1))
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        counts = np.diff(np.append(starts, len(sorted_key)))
+        group_key = sorted_key[starts]
+
+        if len(starts):
+            mins = np.minimum.reduceat(sorted_bpm, starts)
+            maxs = np.maximum.reduceat(sorted_bpm, starts)
+            sums = np.add.reduceat(sorted_bpm.astype(np.float64), starts)
+            # np.rint rounds half to even, matching Python's round()
+            avgs = np.rint(sums / counts).astype(np.int64)
+        else:
+            mins = maxs = sorted_bpm
+            avgs = np.zeros(0, dtype=np.int64)
+
+        return {
+            'order': order,
+            'starts': starts,
+            'counts': counts,
+            'minute': group_key % 1440,
+            'date_index': group_key // 1440,
+            'min': mins,
+            'max': maxs,
+            'avg': avgs
+        }
+
+    def minute_rows(self):
+        """
+        Materialize one row per minute with avg/min/max and the raw values
+
+        Returns:
+            list: Dicts sorted by date and minute, matching the shape used
+            when downsampling large intraday datasets
+        """
+        groups = self.minute_groups()
+        flat_values = self.bpm[groups['order']].tolist()
+        bounds = np.append(groups['starts'], len(flat_values)).tolist()
+        dates = self.dates
+
+        rows = []
+        append = rows.append
+        for idx, (minute_of_day, day, avg, low, high, count) in enumerate(zip(
+                groups['minute'].tolist(), groups['date_index'].tolist(), groups['avg'].tolist(),
+                groups['min'].tolist(), groups['max'].tolist(), groups['counts'].tolist())):
+            hour, minute = divmod(minute_of_day, 60)
+            mm = TWO_DIGIT_LABELS[minute]
+            append({
+                'time': f"{HOUR_12_LABELS[hour]}:{mm} {AM_PM_LABELS[hour]}",
+                'rawTime': f"{TWO_DIGIT_LABELS[hour]}:{mm}",  # For sorting
+                'date': dates[day],
+                'avg': avg,
+                'min': low,
+                'max': high,
+                'values': flat_values[bounds[idx]:bounds[idx + 1]],
+                'count': count  # How many original data points
+            })
+        return rows
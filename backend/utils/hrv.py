@@ -0,0 +1,126 @@
+import numpy as np
+
+# One record per window; compact enough to keep a full day (1440 minutes) in ~70 KB
+HRV_DTYPE = np.dtype([
+    ('rr_count', np.uint32),
+    ('rmssd', np.float64),
+    ('sdnn', np.float64),
+    ('pnn50', np.float64),
+    ('sd1', np.float64),
+    ('sd2', np.float64),
+    ('ectopic_beats', np.uint32)
+])
+
+
+def _segment_ids(offsets, total):
+    """Expand window start offsets into a per-sample window id array"""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if len(offsets) and offsets[-1] == total and len(offsets) > 1:
+        # Accept offsets given with a trailing end marker
+        offsets = offsets[:-1]
+    lengths = np.diff(np.append(offsets, total))
+    return np.repeat(np.arange(len(offsets), dtype=np.int64), lengths), len(offsets)
+
+
+def bpm_to_rr(bpm, segment):
+    """
+    Derive RR values from consecutive heart rate readings within each window
+
+    Mirrors the scalar detector: only pairs of positive readings in the same
+    window contribute, and the value is the absolute change in beat interval.
+
+    Args:
+        bpm (numpy.ndarray): Flat heart rate samples
+        segment (numpy.ndarray): Window id of every sample
+
+    Returns:
+        tuple: (rr values, window id of every rr value)
+    """
+    bpm = np.asarray(bpm, dtype=np.float64)
+    valid = (segment[1:] == segment[:-1]) & (bpm[1:] > 0) & (bpm[:-1] > 0)
+    idx = np.flatnonzero(valid) + 1
+    rr = np.abs(60000 / bpm[idx] - 60000 / bpm[idx - 1])
+    return rr, segment[idx]
+
+
+def _segment_variance(values, segment, counts, window_count):
+    """Sample variance per window using a two-pass (mean, then deviations) reduction"""
+    sums = np.bincount(segment, weights=values, minlength=window_count)
+    means = np.divide(sums, counts, out=np.zeros(window_count), where=counts > 0)
+    deviations = values - means[segment]
+    m2 = np.bincount(segment, weights=deviations * deviations, minlength=window_count)
+    return np.divide(m2, counts - 1, out=np.zeros(window_count), where=counts > 1)
+
+
+def hrv_from_rr(rr, segment, window_count):
+    """
+    Compute HRV metrics for many windows of RR values in one vectorized call
+
+    Args:
+        rr (numpy.ndarray): Flat RR values in milliseconds
+        segment (numpy.ndarray): Window id of every RR value (non-decreasing)
+        window_count (int): Number of windows
+
+    Returns:
+        numpy.ndarray: Structured array with HRV_DTYPE, one record per window
+    """
+    rr = np.asarray(rr, dtype=np.float64)
+    segment = np.asarray(segment, dtype=np.int64)
+    result = np.zeros(window_count, dtype=HRV_DTYPE)
+
+    rr_counts = np.bincount(segment, minlength=window_count)
+    result['rr_count'] = rr_counts
+    result['sdnn'] = np.sqrt(_segment_variance(rr, segment, rr_counts, window_count))
+
+    # Successive pairs (RRn, RRn+1) that belong to the same window
+    pair = np.flatnonzero(segment[1:] == segment[:-1])
+    pair_segment = segment[pair + 1]
+    diff = rr[pair + 1] - rr[pair]
+    total = rr[pair + 1] + rr[pair]
+    pair_counts = np.bincount(pair_segment, minlength=window_count)
+    has_pairs = pair_counts > 0
+
+    squared = np.bincount(pair_segment, weights=diff * diff, minlength=window_count)
+    result['rmssd'] = np.sqrt(np.divide(squared, pair_counts, out=np.zeros(window_count), where=has_pairs))
+    over_50 = np.bincount(pair_segment, weights=np.abs(diff) > 50, minlength=window_count)
+    result['pnn50'] = 100 * np.divide(over_50, pair_counts, out=np.zeros(window_count), where=has_pairs)
+
+    # Poincaré plot: SD1 (short-term) and SD2 (long-term) variability
+    result['sd1'] = np.sqrt(_segment_variance(diff, pair_segment, pair_counts, window_count) / 2)
+    result['sd2'] = np.sqrt(_segment_variance(total, pair_segment, pair_counts, window_count) / 2)
+
+    # Ectopic beats: a short interval followed by a compensatory pause
+    triple = np.flatnonzero(segment[2:] == segment[:-2])
+    ectopic = (rr[triple + 1] < 0.8 * rr[triple]) & (rr[triple + 2] > 1.2 * rr[triple])
+    result['ectopic_beats'] = np.bincount(segment[triple + 2][ectopic], minlength=window_count)
+
+    return result
+
+
+def compute_hrv_batch(values, offsets=None):
+    """
+    Compute HRV metrics (RMSSD, SDNN, pNN50, SD1/SD2, ectopic beats) for many windows
+
+    Args:
+        values (array-like): Either a 2-D array with one heart rate window per
+            row, or a flat array of samples when ``offsets`` is given. In the
+            2-D form, non-positive readings act as padding.
+        offsets (array-like, optional): Start offset of every window in the
+            flat array (an optional trailing end offset is accepted)
+
+    Returns:
+        numpy.ndarray: Structured array with HRV_DTYPE, one record per window
+    """
+    values = np.asarray(values)
+    if offsets is None:
+        if values.ndim != 2:
+            raise ValueError("values must be 2-D when no offsets are given")
+        window_count, window_length = values.shape
+        flat = values.reshape(-1)
+        segment = np.repeat(np.arange(window_count, dtype=np.int64), window_length)
+    else:
+        flat = values.reshape(-1)
+        segment, window_count = _segment_ids(offsets, len(flat))
+
+    rr, rr_segment = bpm_to_rr(flat, segment)
+    return hrv_from_rr(rr, rr_segment, window_count)
@@ -0,0 +1,90 @@
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+# One pooled session per upstream provider, created on first use
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class PooledSession(requests.Session):
+    """requests.Session that applies a default timeout when the caller doesn't pass one"""
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self.default_timeout = timeout
+        # The session is shared by every user, so cookies set by one user's response must not ride along on another's
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        return super().request(method, url, **kwargs)
+
+
+def _http_setting(name):
+    """Read an HTTP_* setting from the app config, falling back to Config outside an app"""
+    if has_app_context() and name in current_app.config:
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def create_session(pool_connections=None, pool_maxsize=None, timeout=None, max_retries=None, backoff_factor=None):
+    """
+    Build a pooled session with keep-alive connections, a retry policy and a default timeout
+
+    Unspecified settings come from the HTTP_* keys in Config. Only idempotent
+    requests are retried, and only on connection errors or 502/503/504
+    responses. 429s are left to the caller so rate limit handling stays
+    explicit. The session never stores cookies, since it is shared across
+    users.
+
+    Returns:
+        PooledSession: Configured session
+    """
+    retry = Retry(
+        total=max_retries if max_retries is not None else _http_setting('HTTP_MAX_RETRIES'),
+        backoff_factor=backoff_factor if backoff_factor is not None else _http_setting('HTTP_BACKOFF_FACTOR'),
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections or _http_setting('HTTP_POOL_CONNECTIONS'),
+        pool_maxsize=pool_maxsize or _http_setting('HTTP_POOL_MAXSIZE'),
+        max_retries=retry
+    )
+
+    session = PooledSession(timeout=timeout or _http_setting('HTTP_TIMEOUT'))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(provider='default'):
+    """
+    Get the shared session for an upstream provider
+
+    Each provider (e.g. 'fitbit', 'google_fit', 'youtube') keeps its own
+    connection pool so a slow provider can't exhaust connections for the
+    others. Sessions are thread-safe for this usage and live for the whole
+    process.
+
+    Args:
+        provider (str): Provider name
+
+    Returns:
+        PooledSession: Session with pooled keep-alive connections
+    """
+    session = _sessions.get(provider)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(provider)
+            if session is None:
+                session = _sessions[provider] = create_session()
+    return session
@@ -0,0 +1,246 @@
+import codecs
+import json
+import re
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from utils.heart_rate_series import HeartRateSeries, parse_time_strings, pack_bpm_values
+
+# Bytes read from the socket per step when streaming a response body
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Whitespace and commas between array items
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# Fitbit intraday samples in the compact form the API sends them, and a run of them
+_INTRADAY_SAMPLE = re.compile(r'\{"time":"(\d\d:\d\d:\d\d)","value":(\d+)\}')
+_INTRADAY_RUN = re.compile(r'(?:,?\{"time":"\d\d:\d\d:\d\d","value":\d+\})+')
+
+_decoder = json.JSONDecoder()
+
+
+class ArrayStreamParser(ABC):
+    """
+    Incrementally parse a JSON document whose bulk is one large array
+
+    Text is fed in chunks as it is read from the network. The items of the
+    first array stored under ``key`` are decoded one at a time and handed to
+    ``add_items`` in batches, so neither the raw body nor the full object
+    graph is ever held at once. The rest of the document is small; it is kept
+    as text and decoded by ``close`` with the array left empty.
+
+    Subclasses override ``match_items`` to recognize runs of items in the
+    common shape without going through the JSON decoder, ``convert_item`` to
+    reduce a decoded item, and must implement ``add_items`` to consume each batch.
+    """
+
+    def __init__(self, key):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._tail_length = len(key) + 64  # Enough to hold a key split across two chunks
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._outside = []  # Document text around the array
+        self._state = 'before'  # before, array or after
+        self._final = False
+        self.bytes_read = 0
+
+    def match_items(self, buffer, pos):
+        """Fast path: return (items, end) for a run of items starting at pos, else None"""
+        return None
+
+    def convert_item(self, item):
+        """Reduce an item decoded by the JSON decoder"""
+        return item
+
+    @abstractmethod
+    def add_items(self, items):
+        """Consume a batch of items in document order"""
+
+    def feed(self, chunk):
+        """Parse the next chunk of the body (bytes or text)"""
+        if isinstance(chunk, bytes):
+            self.bytes_read += len(chunk)
+            chunk = self._text.decode(chunk)
+        self._buffer += chunk
+
+        if self._state == 'before':
+            match = self._key_pattern.search(self._buffer)
+            if match is None:
+                # Keep only a short tail in the buffer in case the key is split across chunks
+                cut = max(len(self._buffer) - self._tail_length, 0)
+                self._outside.append(self._buffer[:cut])
+                self._buffer = self._buffer[cut:]
+                return
+            self._outside.append(self._buffer[:match.end()])
+            self._buffer = self._buffer[match.end():]
+            self._state = 'array'
+
+        if self._state == 'array':
+            self._parse_items()
+
+        if self._state == 'after':
+            self._outside.append(self._buffer)
+            self._buffer = ''
+
+    def _parse_items(self):
+        buffer = self._buffer
+        size = len(buffer)
+        pos = 0
+        items = []
+        append = items.append
+        while True:
+            start = _SEPARATORS.match(buffer, pos).end()
+            if start >= size:
+                break
+            if buffer[start] == ']':
+                self._outside.append(']')
+                pos = start + 1
+                self._state = 'after'
+                break
+
+            matched = self.match_items(buffer, start)
+            if matched is not None:
+                run, pos = matched
+                items.extend(run)
+                continue
+
+            try:
+                item, end = _decoder.raw_decode(buffer, start)
+            except ValueError:
+                break  # Incomplete item; wait for more text
+            if end >= size and not self._final:
+                break  # A number at the very end of the buffer may continue in the next chunk
+            append(self.convert_item(item))
+            pos = end
+
+        self._buffer = buffer[pos:]
+        if items:
+            self.add_items(items)
+
+    def close(self):
+        """
+        Finish parsing
+
+        Returns:
+            The decoded document, with the streamed array left empty
+
+        Raises:
+            ValueError: If the body ended before the document did
+        """
+        self._final = True
+        self.feed(self._text.decode(b'', final=True))
+        if self._state == 'array':
+            raise ValueError("JSON document ended inside the streamed array")
+        return json.loads(''.join(self._outside) + self._buffer)
+
+    @property
+    def found(self):
+        """Whether the document contained the streamed array"""
+        return self._state != 'before'
+
+    def parse(self, chunks):
+        """Feed every chunk of an iterable and close"""
+        for chunk in chunks:
+            self.feed(chunk)
+        return self.close()
+
+
+class ListStreamParser(ArrayStreamParser):
+    """Collect the streamed array's items into a list (e.g. Google Fit buckets)"""
+
+    def __init__(self, key):
+        super().__init__(key)
+        self.key = key
+        self.items = []
+
+    def add_items(self, items):
+        self.items.extend(items)
+
+    def close(self):
+        document = super().close()
+        if self.found:
+            _find_array_owner(document, self.key)[self.key] = self.items
+        return document
+
+
+class IntradayDatasetParser(ArrayStreamParser):
+    """
+    Decode a Fitbit intraday heart rate body straight into packed arrays
+
+    Samples are converted batch by batch into seconds-since-midnight and bpm
+    arrays, and ``close`` puts a HeartRateSeries where the dataset list
+    would be.
+    """
+
+    def __init__(self):
+        super().__init__('dataset')
+        self._seconds = []
+        self._bpm = []
+
+    def match_items(self, buffer, pos):
+        run = _INTRADAY_RUN.match(buffer, pos)
+        if run is None:
+            return None
+        samples = _INTRADAY_SAMPLE.findall(buffer, pos, run.end())
+        times, values = zip(*samples)
+        return list(zip(times, map(int, values))), run.end()
+
+    def convert_item(self, item):
+        return item['time'], item['value']
+
+    def add_items(self, items):
+        times, values = zip(*items)
+        self._seconds.append(parse_time_strings(list(times)))
+        self._bpm.append(pack_bpm_values(list(values)))
+
+    def close(self):
+        document = super().close()
+        heart_days = document.get('activities-heart') or [{}]
+        if self._seconds:
+            seconds = np.concatenate(self._seconds)
+            bpm = np.concatenate(self._bpm)
+        else:
+            seconds = np.zeros(0, dtype=np.int32)
+            bpm = np.zeros(0, dtype=np.uint16)
+        series = HeartRateSeries(seconds, bpm, dates=[heart_days[0].get('dateTime', '')])
+        document.setdefault('activities-heart-intraday', {})['dataset'] = series
+        return document
+
+
+def _find_array_owner(document, key):
+    """Find the (first) dict in a decoded document that holds ``key``"""
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if key in node:
+                return node
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return document
+
+
+def parse_intraday_response(response, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Decode a Fitbit intraday heart rate response opened with stream=True
+
+    Returns:
+        tuple: (document with a HeartRateSeries as the intraday dataset, body size in bytes)
+    """
+    parser = IntradayDatasetParser()
+    document = parser.parse(response.iter_content(chunk_size=chunk_size))
+    return document, parser.bytes_read
+
+
+def parse_list_response(response, key, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Decode a response opened with stream=True whose bulk is the array under ``key``
+
+    Returns:
+        tuple: (decoded document, body size in bytes)
+    """
+    parser = ListStreamParser(key)
+    document = parser.parse(response.iter_content(chunk_size=chunk_size))
+    return document, parser.bytes_read
@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would exceed the upstream rate limit"""
+
+    def __init__(self, retry_after, message='Upstream rate limit reached'):
+        super().__init__(message)
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+class TokenBucket(object):
+    """
+    Token bucket for one user's upstream request budget
+
+    Without upstream information the bucket refills continuously at
+    ``capacity / window`` tokens per second. Once the upstream reports the
+    remaining budget and the time until its window resets, the bucket follows
+    those numbers exactly and refills to full capacity at the reset time.
+    Not thread-safe; RateLimiter holds the lock.
+    """
+    __slots__ = ('capacity', 'window', 'tokens', 'updated_at', 'reset_at')
+
+    def __init__(self, capacity, window, now=None):
+        self.capacity = capacity
+        self.window = window
+        self.tokens = float(capacity)
+        self.updated_at = now if now is not None else time.time()
+        self.reset_at = None
+
+    def refill(self, now):
+        """Bring the token count up to date"""
+        if self.reset_at is not None:
+            if now >= self.reset_at:
+                self.tokens = float(self.capacity)
+                self.reset_at = None
+        else:
+            elapsed = max(now - self.updated_at, 0)
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / self.window)
+        self.updated_at = now
+
+    def wait_time(self, now, count=1):
+        """Seconds until ``count`` tokens are available"""
+        if self.tokens >= count:
+            return 0
+        if self.reset_at is not None:
+            return max(self.reset_at - now, 0)
+        return (count - self.tokens) * self.window / self.capacity
+
+    def sync(self, remaining, reset_in, now):
+        """Adopt the budget reported by the upstream API"""
+        self.tokens = float(max(min(remaining, self.capacity), 0))
+        self.reset_at = now + max(reset_in, 0)
+        self.updated_at = now
+
+
+class RateLimiter(object):
+    """
+    Per-user token bucket rate limiter
+
+    Each user gets a bucket sized to the upstream quota (e.g. 150 requests per
+    hour for Fitbit). ``acquire`` waits briefly for a token when the bucket
+    is empty and raises RateLimitExceeded when the wait would be too long.
+    Buckets are kept per process and corrected from the upstream's rate limit
+    headers after every response, so several workers stay close to the truth.
+    """
+
+    def __init__(self, capacity, window, low_water=0):
+        self.capacity = capacity
+        self.window = window
+        self.low_water = low_water  # Below this many tokens callers should prefer cached data
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, user_id, now):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.capacity, self.window, now)
+        bucket.refill(now)
+        return bucket
+
+    def remaining(self, user_id):
+        """Tokens currently available to a user"""
+        with self._lock:
+            return int(self._bucket(user_id, time.time()).tokens)
+
+    def is_low(self, user_id):
+        """Whether a user's budget has dropped to the low-water mark"""
+        return self.remaining(user_id) <= self.low_water
+
+    def acquire(self, user_id, max_wait=0):
+        """
+        Take one token for a user, waiting up to ``max_wait`` seconds for it
+
+        Raises:
+            RateLimitExceeded: If no token becomes available in time
+        """
+        deadline = time.time() + max_wait
+        while True:
+            with self._lock:
+                now = time.time()
+                bucket = self._bucket(user_id, now)
+                if bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                wait = bucket.wait_time(now)
+
+            if now + wait > deadline:
+                raise RateLimitExceeded(wait)
+            time.sleep(wait)
+
+    def update_from_headers(self, user_id, remaining, reset_in):
+        """
+        Synchronize a user's bucket with the upstream's own accounting
+
+        Args:
+            user_id (str): User the response belongs to
+            remaining (int): Requests left in the upstream window
+            reset_in (float): Seconds until the upstream window resets
+        """
+        with self._lock:
+            now = time.time()
+            self._bucket(user_id, now).sync(remaining, reset_in, now)
+
+    def stats(self):
+        """Remaining tokens per user"""
+        with self._lock:
+            now = time.time()
+            return {user_id: int(self._bucket(user_id, now).tokens) for user_id in list(self._buckets)}
@@ -0,0 +1,373 @@
+import math
+from collections import deque
+from itertools import islice
+from datetime import datetime
+
+
+class RhythmWindow(object):
+    """
+    Online abnormal rhythm detector for one window of heart rate samples
+
+    Every sample is touched exactly once: RR statistics use Welford running
+    means/variances, tachycardia and bradycardia use run-length counters and
+    ectopic beats are found with a rolling window of the last three RR values.
+    ``events`` turns the accumulated state into the same event dicts that
+    ``detect_abnormal_rhythms`` has always produced, and can be called at any
+    time without disturbing the state.
+
+    By default RR values are derived from consecutive BPM readings. When the
+    sensor reports real beat-to-beat intervals, pass ``derive_rr=False`` (or
+    call ``use_true_rr``) and feed them with ``extend_rr`` instead.
+    """
+    __slots__ = (
+        'derive_rr', 'sample_count', 'prev_bpm', 'high_run', 'low_run', 'tachycardia_bpm',
+        'bradycardia_bpm', 'sudden_changes',
+        'rr_count', 'rr_mean', 'rr_m2', 'prev_rr', 'prev_prev_rr',
+        'diff_count', 'diff_sq_sum', 'diff_over_50',
+        'pc_diff_mean', 'pc_diff_m2', 'pc_sum_mean', 'pc_sum_m2',
+        'ectopic_count'
+    )
+
+    def __init__(self, derive_rr=True):
+        self.derive_rr = derive_rr
+        self.sample_count = 0
+        self.prev_bpm = None
+        self.high_run = 0
+        self.low_run = 0
+        self.tachycardia_bpm = None
+        self.bradycardia_bpm = None
+        self.sudden_changes = []
+        self._reset_rr()
+
+    def _reset_rr(self):
+        """Clear all RR based statistics"""
+        # RR series (running mean/variance)
+        self.rr_count = 0
+        self.rr_mean = 0.0
+        self.rr_m2 = 0.0
+        self.prev_rr = None
+        self.prev_prev_rr = None
+
+        # Successive RR differences (RMSSD and pNN50)
+        self.diff_count = 0
+        self.diff_sq_sum = 0.0
+        self.diff_over_50 = 0
+
+        # Poincaré pairs: running variance of (RRn+1 - RRn) and (RRn+1 + RRn)
+        self.pc_diff_mean = 0.0
+        self.pc_diff_m2 = 0.0
+        self.pc_sum_mean = 0.0
+        self.pc_sum_m2 = 0.0
+
+        self.ectopic_count = 0
+
+    def use_true_rr(self):
+        """Switch to sensor-reported RR intervals, discarding any derived ones"""
+        if self.derive_rr:
+            self.derive_rr = False
+            self._reset_rr()
+
+    def add(self, bpm):
+        """Feed a single heart rate sample"""
+        self.extend((bpm,))
+
+    def extend(self, values):
+        """
+        Feed heart rate samples in order
+
+        Unless true RR intervals are used, RR values are derived from
+        consecutive positive BPM readings, exactly as the original multi-pass
+        implementation did.
+        """
+        prev_bpm = self.prev_bpm
+        high_run = self.high_run
+        low_run = self.low_run
+        add_rr = self._add_rr
+        derive_rr = self.derive_rr
+        count = 0
+
+        for bpm in values:
+            count += 1
+
+            # Tachycardia (5+ consecutive readings above 100 BPM)
+            if bpm > 100:
+                high_run += 1
+                if high_run == 5 and self.tachycardia_bpm is None:
+                    self.tachycardia_bpm = bpm
+            else:
+                high_run = 0
+
+            # Bradycardia (5+ consecutive readings below 50 BPM)
+            if bpm < 50:
+                low_run += 1
+                if low_run == 5 and self.bradycardia_bpm is None:
+                    self.bradycardia_bpm = bpm
+            else:
+                low_run = 0
+
+            if prev_bpm is not None:
+                # Rapid changes in heart rate (potential arrhythmia)
+                change = abs(bpm - prev_bpm)
+                if change > 30:
+                    self.sudden_changes.append(change)
+
+                # Convert BPM to milliseconds between beats
+                if derive_rr and prev_bpm > 0 and bpm > 0:
+                    add_rr(abs(60000 / bpm - 60000 / prev_bpm))
+
+            prev_bpm = bpm
+
+        self.sample_count += count
+        self.prev_bpm = prev_bpm
+        self.high_run = high_run
+        self.low_run = low_run
+
+    def extend_rr(self, intervals):
+        """Feed sensor-reported RR intervals (milliseconds) in order"""
+        add_rr = self._add_rr
+        for rr in intervals:
+            if rr > 0:
+                add_rr(rr)
+
+    def _add_rr(self, rr):
+        """Update the running RR statistics with one interval"""
+        self.rr_count += 1
+        delta = rr - self.rr_mean
+        self.rr_mean += delta / self.rr_count
+        self.rr_m2 += delta * (rr - self.rr_mean)
+
+        prev_rr = self.prev_rr
+        if prev_rr is not None:
+            diff = abs(rr - prev_rr)
+            self.diff_count += 1
+            self.diff_sq_sum += diff * diff
+            if diff > 50:
+                self.diff_over_50 += 1
+
+            # Poincaré plot: x = RRn, y = RRn+1
+            pair_count = self.diff_count
+            delta = (rr - prev_rr) - self.pc_diff_mean
+            self.pc_diff_mean += delta / pair_count
+            self.pc_diff_m2 += delta * ((rr - prev_rr) - self.pc_diff_mean)
+            delta = (rr + prev_rr) - self.pc_sum_mean
+            self.pc_sum_mean += delta / pair_count
+            self.pc_sum_m2 += delta * ((rr + prev_rr) - self.pc_sum_mean)
+
+            # PVC typically shows a short-long pattern:
+            # A premature beat followed by a compensatory pause
+            prev_prev_rr = self.prev_prev_rr
+            if prev_prev_rr is not None and prev_rr < 0.8 * prev_prev_rr and rr > 1.2 * prev_prev_rr:
+                self.ectopic_count += 1
+
+        self.prev_prev_rr = prev_rr
+        self.prev_rr = rr
+
+    def hrv_metrics(self):
+        """
+        Current HRV metrics for the window
+
+        Returns:
+            dict: rmssd, sdnn, pnn50, sd1 and sd2 (unrounded)
+        """
+        rr_count = self.rr_count
+        rmssd = math.sqrt(self.diff_sq_sum / self.diff_count) if self.diff_count else 0
+        sdnn = math.sqrt(max(self.rr_m2, 0.0) / (rr_count - 1)) if rr_count > 1 else 0
+        pnn50 = 100 * self.diff_over_50 / self.diff_count if self.diff_count else 0
+
+        sd1 = sd2 = 0
+        if self.diff_count > 1:
+            sd1 = math.sqrt(max(self.pc_diff_m2, 0.0) / (self.diff_count - 1) / 2)
+            sd2 = math.sqrt(max(self.pc_sum_m2, 0.0) / (self.diff_count - 1) / 2)
+
+        return {'rmssd': rmssd, 'sdnn': sdnn, 'pnn50': pnn50, 'sd1': sd1, 'sd2': sd2}
+
+    def events(self, date='', time=''):
+        """
+        Build abnormal rhythm events from the accumulated state
+
+        Args:
+            date (str): Date to stamp on the events
+            time (str): Time label to stamp on the events
+
+        Returns:
+            list: Abnormal events with timestamps and detailed classification
+        """
+        # Skip if insufficient data for analysis
+        if self.sample_count < 2 or self.rr_count < 3:
+            return []
+
+        metrics = self.hrv_metrics()
+        rmssd, sdnn, pnn50 = metrics['rmssd'], metrics['sdnn'], metrics['pnn50']
+        base_metrics = {'rmssd': round(rmssd, 2), 'sdnn': round(sdnn, 2), 'pnn50': round(pnn50, 2)}
+        events = []
+
+        if self.tachycardia_bpm is not None:
+            val = self.tachycardia_bpm
+            events.append({
+                'date': date,
+                'time': time,
+                'type': 'Tachycardia',
+                'value': f"{val} BPM sustained",
+                'severity': 'Medium' if val < 120 else 'High',
+                'details': 'Sustained elevated heart rate at rest',
+                'hrv_metrics': dict(base_metrics)
+            })
+
+        if self.bradycardia_bpm is not None:
+            val = self.bradycardia_bpm
+            events.append({
+                'date': date,
+                'time': time,
+                'type': 'Bradycardia',
+                'value': f"{val} BPM sustained",
+                'severity': 'Medium' if val > 40 else 'High',
+                'details': 'Sustained low heart rate',
+                'hrv_metrics': dict(base_metrics)
+            })
+
+        for change in self.sudden_changes:
+            events.append({
+                'date': date,
+                'time': time,
+                'type': 'Sudden change',
+                'value': f"Change of {change} BPM",
+                'severity': 'Medium' if change < 40 else 'High',
+                'details': 'Rapid change in heart rate may indicate ectopic beats or arrhythmia',
+                'hrv_metrics': dict(base_metrics)
+            })
+
+        # Low HRV can indicate cardiac stress or autonomic dysfunction
+        if sdnn < 20 and self.rr_count > 10:
+            events.append({
+                'date': date,
+                'time': time,
+                'type': 'Low HRV',
+                'value': f"SDNN: {round(sdnn, 2)} ms",
+                'severity': 'Medium',
+                'details': 'Low heart rate variability may indicate reduced cardiac autonomic function',
+                'hrv_metrics': dict(base_metrics)
+            })
+
+        # Potential AFib based on RR irregularity and Poincaré plot metrics
+        if self.rr_count > 20:
+            sd1, sd2 = metrics['sd1'], metrics['sd2']
+            sd_ratio = sd1 / sd2 if sd2 != 0 else 0
+            cov_rr = (sdnn / self.rr_mean) * 100 if self.rr_mean else 0
+
+            if cov_rr > 15 and sd_ratio > 0.8:
+                events.append({
+                    'date': date,
+                    'time': time,
+                    'type': 'Potential AFib',
+                    'value': f"High irregularity (COV: {round(cov_rr, 2)}%)",
+                    'severity': 'High',
+                    'details': 'Irregular rhythm pattern suggestive of atrial fibrillation',
+                    'hrv_metrics': dict(base_metrics, sd1=round(sd1, 2), sd2=round(sd2, 2))
+                })
+
+        if self.ectopic_count > 3:
+            events.append({
+                'date': date,
+                'time': time,
+                'type': 'Ectopic Beats',
+                'value': f"{self.ectopic_count} detected",
+                'severity': 'Medium' if self.ectopic_count < 10 else 'High',
+                'details': 'Potential premature ventricular or atrial contractions',
+                'hrv_metrics': dict(base_metrics)
+            })
+
+        return events
+
+
+class LiveRhythmMonitor(object):
+    """
+    Incremental abnormal rhythm detection for a live heart rate stream
+
+    Samples are fed as they arrive and accumulated into one RhythmWindow per
+    clock minute (the same grouping used for minute rows). When a minute rolls
+    over its events are finalized, so reading the event list never requires
+    reprocessing the sample buffer. Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, max_events=1000):
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        """Drop all state and finalized events"""
+        self.window = None
+        self.window_minute = None
+        self.window_date = ''
+        self.window_time = ''
+        self.rr_supported = False
+        # Finalized (minute since epoch, event) pairs, oldest first
+        self.finalized = deque(maxlen=self.max_events)
+        # Number of events ever finalized; doubles as a resume cursor for streams
+        self.finalized_total = 0
+
+    def add(self, bpm, timestamp, rr_intervals=None):
+        """
+        Feed one sample
+
+        Args:
+            bpm (int): Heart rate reading
+            timestamp (float): Sample time in seconds since the epoch
+            rr_intervals (list, optional): RR intervals in milliseconds reported
+                by the sensor alongside this reading
+        """
+        minute = int(timestamp // 60)
+        if minute != self.window_minute:
+            self._close_window()
+            self._open_window(minute)
+        if rr_intervals:
+            # Once the sensor reports RR intervals, HRV uses them instead of BPM deltas
+            self.rr_supported = True
+            self.window.use_true_rr()
+            self.window.extend_rr(rr_intervals)
+        self.window.add(bpm)
+
+    def _open_window(self, minute):
+        """Start accumulating a new clock minute"""
+        start = datetime.fromtimestamp(minute * 60)
+        self.window = RhythmWindow(derive_rr=not self.rr_supported)
+        self.window_minute = minute
+        self.window_date = start.strftime('%Y-%m-%d')
+        self.window_time = f"{start.hour % 12 or 12}:{start.minute:02d} {'AM' if start.hour < 12 else 'PM'}"
+
+    def _close_window(self):
+        """Finalize the current minute and keep its events"""
+        if self.window is None:
+            return
+        for event in self.window.events(self.window_date, self.window_time):
+            self.finalized.append((self.window_minute, event))
+            self.finalized_total += 1
+        self.window = None
+
+    def finalized_since(self, cursor):
+        """
+        Finalized events recorded after ``cursor`` (a previous ``finalized_total``)
+
+        Returns:
+            tuple: (new cursor, list of events). Events that already fell out of
+            the history are skipped.
+        """
+        oldest = self.finalized_total - len(self.finalized)
+        skip = max(cursor - oldest, 0)
+        return self.finalized_total, [event for _, event in islice(self.finalized, skip, None)]
+
+    def events(self, since=None):
+        """
+        Current abnormal events, including provisional ones for the open minute
+
+        Args:
+            since (float, optional): Only include minutes starting at or after
+                this time (seconds since the epoch)
+
+        Returns:
+            list: Abnormal events, oldest first
+        """
+        since_minute = int(since // 60) if since is not None else None
+        events = [event for minute, event in self.finalized if since_minute is None or minute >= since_minute]
+        if self.window is not None and (since_minute is None or self.window_minute >= since_minute):
+            events.extend(self.window.events(self.window_date, self.window_time))
+        return events
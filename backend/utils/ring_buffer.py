@@ -0,0 +1,111 @@
+import numpy as np
+
+
+class HeartRateRingBuffer(object):
+    """
+    Preallocated ring buffer for live heart rate samples
+
+    Timestamps are stored as int64 epoch milliseconds and readings as uint16.
+    Every slot is written twice (at ``i`` and ``i + capacity``), so the most
+    recent ``len(self)`` samples always form one contiguous region and time
+    windows can be returned as zero-copy NumPy views. Appends are O(1).
+
+    RR intervals (when the sensor reports them) live in a second ring of
+    their own, since a single notification can carry several of them.
+
+    Views returned by ``window``/``rr_window`` alias the internal storage and
+    are overwritten by later appends, so callers must hold the same lock that
+    guards ``append`` while using them (or copy them). Not thread-safe.
+    """
+
+    def __init__(self, capacity=3600, rr_capacity=None):
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._bpm = np.zeros(2 * capacity, dtype=np.uint16)
+        self._head = 0
+        self.total = 0  # Samples appended since creation; also a resume cursor
+
+        self.rr_capacity = rr_capacity or 4 * capacity
+        self._rr_timestamps = np.zeros(2 * self.rr_capacity, dtype=np.int64)
+        self._rr = np.zeros(2 * self.rr_capacity, dtype=np.uint16)
+        self._rr_head = 0
+        self.rr_total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp_ms, bpm, rr_intervals=()):
+        """
+        Store one sample
+
+        Args:
+            timestamp_ms (int): Sample time in epoch milliseconds
+            bpm (int): Heart rate reading
+            rr_intervals (iterable, optional): RR intervals in milliseconds
+        """
+        slot = self._head
+        self._timestamps[slot] = self._timestamps[slot + self.capacity] = timestamp_ms
+        self._bpm[slot] = self._bpm[slot + self.capacity] = bpm
+        self._head = slot + 1 if slot + 1 < self.capacity else 0
+        self.total += 1
+
+        for rr in rr_intervals:
+            slot = self._rr_head
+            self._rr_timestamps[slot] = self._rr_timestamps[slot + self.rr_capacity] = timestamp_ms
+            self._rr[slot] = self._rr[slot + self.rr_capacity] = rr
+            self._rr_head = slot + 1 if slot + 1 < self.rr_capacity else 0
+            self.rr_total += 1
+
+    def _contiguous(self, head, capacity, length):
+        """Bounds of the most recent ``length`` samples in the mirrored storage"""
+        end = head + capacity
+        return end - length, end
+
+    def samples(self):
+        """All stored samples as (timestamps_ms, bpm) views, oldest first"""
+        start, end = self._contiguous(self._head, self.capacity, len(self))
+        return self._timestamps[start:end], self._bpm[start:end]
+
+    def window(self, since_ms):
+        """
+        Samples with a timestamp at or after ``since_ms``
+
+        Returns:
+            tuple: (timestamps_ms, bpm) zero-copy views, oldest first
+        """
+        timestamps, bpm = self.samples()
+        offset = int(np.searchsorted(timestamps, since_ms, side='left'))
+        return timestamps[offset:], bpm[offset:]
+
+    def since_cursor(self, cursor):
+        """
+        Samples appended after ``cursor`` (a previous value of ``total``)
+
+        Returns:
+            tuple: (first cursor returned, timestamps_ms, bpm). Samples that
+            were already overwritten are skipped.
+        """
+        timestamps, bpm = self.samples()
+        missing = self.total - max(cursor, 0)
+        missing = max(0, min(missing, len(timestamps)))
+        first = self.total - missing
+        return first, timestamps[len(timestamps) - missing:], bpm[len(bpm) - missing:]
+
+    def rr_window(self, since_ms):
+        """
+        RR intervals recorded at or after ``since_ms``
+
+        Returns:
+            tuple: (timestamps_ms, rr_ms) zero-copy views, oldest first
+        """
+        start, end = self._contiguous(self._rr_head, self.rr_capacity, min(self.rr_total, self.rr_capacity))
+        timestamps = self._rr_timestamps[start:end]
+        offset = int(np.searchsorted(timestamps, since_ms, side='left'))
+        return timestamps[offset:], self._rr[start:end][offset:]
+
+    def latest(self):
+        """Most recent (timestamp_ms, bpm) pair, or None when empty"""
+        if not self.total:
+            return None
+        slot = self._head - 1 + self.capacity
+        return int(self._timestamps[slot]), int(self._bpm[slot])
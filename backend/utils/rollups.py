@@ -0,0 +1,218 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Sleep stages summed per day
+SLEEP_STAGES = ('deep', 'light', 'rem', 'wake')
+
+# Daily activity metrics: rollup field, Fitbit time series name and how its values are parsed
+ACTIVITY_FIELDS = (
+    ('steps', 'steps', int),
+    ('calories', 'calories', int),
+    ('distance', 'distance', float),
+    ('floors', 'floors', int),
+    ('sedentaryMinutes', 'minutesSedentary', int),
+    ('lightActiveMinutes', 'minutesLightlyActive', int),
+    ('moderateActiveMinutes', 'minutesFairlyActive', int),
+    ('vigorousActiveMinutes', 'minutesVeryActive', int)
+)
+
+
+def heart_rate_rollup(summary, seconds=None, bpm=None):
+    """
+    Summarize one day of heart rate
+
+    Args:
+        summary (dict): Fitbit 'activities-heart' entry for the day
+        seconds (array-like, optional): Intraday sample times
+        bpm (array-like, optional): Intraday sample values
+
+    Returns:
+        dict: restingHeartRate, samples, min, max, sum (of bpm) and
+        zoneMinutes keyed by zone name; min/max come from the zones when
+        there are no samples
+    """
+    value = (summary or {}).get('value') or {}
+    zones = value.get('heartRateZones', [])
+    rollup = {
+        'restingHeartRate': value.get('restingHeartRate', 0),
+        'samples': 0,
+        'min': None,
+        'max': None,
+        'sum': 0,
+        'zoneMinutes': {zone['name']: zone.get('minutes', 0) for zone in zones}
+    }
+    if bpm is not None and len(bpm):
+        values = np.asarray(bpm)
+        rollup.update(samples=int(len(values)), min=int(values.min()), max=int(values.max()), sum=int(values.sum(dtype=np.int64)))
+    elif zones:
+        # Without samples fall back to the zone bounds, like the daily summary rows
+        out_of_range = next((zone for zone in zones if zone['name'] == 'Out of Range'), {})
+        rollup['min'] = out_of_range.get('min', 0)
+        rollup['max'] = max((zone['max'] for zone in zones if 'max' in zone), default=0)
+    return rollup
+
+
+def heart_rate_row(date, rollup):
+    """Daily heart rate row for charts"""
+    return {
+        'date': date,
+        'restingHeartRate': rollup['restingHeartRate'],
+        'min': rollup['min'] or 0,
+        'max': rollup['max'] or 0,
+        'avg': round(rollup['sum'] / rollup['samples']) if rollup['samples'] else 0,
+        'zoneMinutes': rollup['zoneMinutes'],
+        'is_daily_summary': True
+    }
+
+
+def sleep_rollup(records):
+    """
+    Sum one day's sleep logs
+
+    Args:
+        records (list): Fitbit sleep logs with the same dateOfSleep
+
+    Returns:
+        dict: Record count, total duration (ms), efficiency and score sums,
+        and minutes per stage
+    """
+    rollup = {'records': len(records), 'durationMs': 0, 'efficiency': 0, 'score': 0, 'scoreCount': 0}
+    rollup.update((stage, 0) for stage in SLEEP_STAGES)
+    for record in records:
+        rollup['durationMs'] += record.get('duration', 0)
+        rollup['efficiency'] += record.get('efficiency', 0)
+
+        summary = record.get('levels', {}).get('summary', {})
+        for stage in SLEEP_STAGES:
+            rollup[stage] += summary.get(stage, {}).get('minutes', 0)
+
+        if 'sleep_score' in record and 'total_score' in record['sleep_score']:
+            rollup['score'] += record['sleep_score']['total_score']
+            rollup['scoreCount'] += 1
+    return rollup
+
+
+def sleep_row(date, rollup):
+    """Multi-day sleep row; efficiency and score are averaged over the logs"""
+    total_sleep_minutes = rollup['deep'] + rollup['light'] + rollup['rem']
+    if total_sleep_minutes > 0:
+        deep_percent = round((rollup['deep'] / total_sleep_minutes) * 100)
+        light_percent = round((rollup['light'] / total_sleep_minutes) * 100)
+        rem_percent = round((rollup['rem'] / total_sleep_minutes) * 100)
+    else:
+        deep_percent = light_percent = rem_percent = 0
+
+    return {
+        'date': date,
+        'durationMinutes': round(rollup['durationMs'] / 60000),
+        'efficiency': round(rollup['efficiency'] / rollup['records']) if rollup['records'] else 0,
+        'deepSleepMinutes': rollup['deep'],
+        'lightSleepMinutes': rollup['light'],
+        'remSleepMinutes': rollup['rem'],
+        'awakeDuringNight': rollup['wake'],
+        'deepSleepPercentage': deep_percent,
+        'lightSleepPercentage': light_percent,
+        'remSleepPercentage': rem_percent,
+        'score': round(rollup['score'] / rollup['scoreCount']) if rollup['scoreCount'] else 0
+    }
+
+
+def activity_rollup(values):
+    """
+    Parse one day's activity totals
+
+    Args:
+        values (dict): Raw Fitbit time series values keyed by metric name
+            (e.g. {'steps': '1234', 'minutesSedentary': '600'})
+
+    Returns:
+        dict: Numeric totals keyed by rollup field; metrics that are
+        missing are left out
+    """
+    return {field: parse(values[metric]) for field, metric, parse in ACTIVITY_FIELDS if metric in values}
+
+
+def activity_row(date, rollup):
+    """Multi-day activity row"""
+    moderate = rollup.get('moderateActiveMinutes', 0)
+    vigorous = rollup.get('vigorousActiveMinutes', 0)
+    return {
+        'dateTime': date,
+        'steps': rollup.get('steps', 0),
+        'calories': rollup.get('calories', 0),
+        'distance': rollup.get('distance', 0),
+        'floors': rollup.get('floors', 0),
+        'activeMinutes': moderate + vigorous,
+        'sedentaryMinutes': rollup.get('sedentaryMinutes', 0),
+        'lightActiveMinutes': rollup.get('lightActiveMinutes', 0),
+        'moderateActiveMinutes': moderate,
+        'vigorousActiveMinutes': vigorous
+    }
+
+
+def bucket_start(date, group):
+    """First day of the week (Monday) or month that a day belongs to"""
+    if group == 'day':
+        return date
+    day = datetime.strptime(date, '%Y-%m-%d')
+    if group == 'week':
+        day -= timedelta(days=day.weekday())
+    elif group == 'month':
+        day = day.replace(day=1)
+    else:
+        raise ValueError(f"Unknown rollup group: {group}")
+    return day.strftime('%Y-%m-%d')
+
+
+def combine_rollups(rollups):
+    """
+    Merge several daily rollups of the same kind into one
+
+    Counts and totals are summed, min/max are combined, and the resting
+    heart rate is averaged over the days that report one.
+    """
+    combined = {}
+    resting = []
+    for rollup in rollups:
+        for field, value in rollup.items():
+            if field == 'restingHeartRate':
+                if value:
+                    resting.append(value)
+            elif field == 'zoneMinutes':
+                zones = combined.setdefault('zoneMinutes', OrderedDict())
+                for name, minutes in value.items():
+                    zones[name] = zones.get(name, 0) + minutes
+            elif field in ('min', 'max'):
+                if value is not None:
+                    current = combined.get(field)
+                    pick = min if field == 'min' else max
+                    combined[field] = value if current is None else pick(current, value)
+                else:
+                    combined.setdefault(field, None)
+            else:
+                combined[field] = combined.get(field, 0) + value
+    if 'zoneMinutes' in combined or resting:
+        combined['restingHeartRate'] = round(sum(resting) / len(resting)) if resting else 0
+    return combined
+
+
+def group_rollups(rollups, group='day'):
+    """
+    Group daily rollups into day, week or month buckets
+
+    Args:
+        rollups (dict): Daily rollups keyed by day (YYYY-MM-DD)
+        group (str): 'day', 'week' or 'month'
+
+    Returns:
+        list: (bucket start day, combined rollup) pairs in date order
+    """
+    if group == 'day':
+        return sorted(rollups.items())
+
+    buckets = OrderedDict()
+    for day in sorted(rollups):
+        buckets.setdefault(bucket_start(day, group), []).append(rollups[day])
+    return [(start, combine_rollups(days)) for start, days in buckets.items()]
@@ -0,0 +1,71 @@
+import threading
+
+
+class _Call(object):
+    """One in-flight call that other callers can wait on"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent calls that share a key into a single execution
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running block until it finishes and receive the same result (or
+    the same exception). Once the call completes the key is forgotten, so the
+    next caller starts a fresh call - caching is left to the caller.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # Calls answered by another caller's upstream request
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` unless a call for ``key`` is already running
+
+        Args:
+            key (hashable): Identity of the call, e.g. (user, URL, params)
+            fn (callable): Function to run
+
+        Returns:
+            The result of the leader's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """Number of keys with a call currently running"""
+        with self._lock:
+            return len(self._calls)
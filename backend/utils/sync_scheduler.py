@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class SyncScheduler(object):
+    """
+    Background sync of provider data for connected users
+
+    Providers register a sync function with ``register``. After OAuth a user
+    is enrolled with their credentials, which queues a backfill job; from
+    then on a timer thread queues a delta job for every enrolled user each
+    ``interval`` seconds. Jobs run on a small thread pool inside an app
+    context, and at most one job per (provider, user) is queued or running.
+
+    A sync function is called as ``sync_fn(user_id, credentials, cursor)``
+    and returns the cursor to resume from next time (``cursor`` is None for
+    the initial backfill).
+
+    Enrollments live in memory, so each gunicorn worker syncs the users that
+    connected through it; the data itself lands in shared stores.
+    """
+
+    def __init__(self, interval=None, max_workers=None):
+        self.interval = interval or Config.SYNC_INTERVAL_SECONDS
+        self.max_workers = max_workers or Config.SYNC_MAX_WORKERS
+        self.app = None
+        self._sync_fns = {}
+        self._users = {}  # (provider, user_id) -> state dict
+        self._pending = set()
+        self._running = set()  # Keys whose sync function is executing right now
+        self._lock = threading.Lock()
+        self._job_finished = threading.Condition(self._lock)
+        self._executor = None
+        self._timer = None
+        self._stopped = threading.Event()
+
+    def init_app(self, app):
+        """Bind to the Flask app and start the worker pool and the periodic timer"""
+        self.app = app
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sync')
+            self._timer = threading.Thread(target=self._run_timer, name='sync-timer', daemon=True)
+            self._timer.start()
+
+    def register(self, provider, sync_fn):
+        """Register the sync function for a provider"""
+        self._sync_fns[provider] = sync_fn
+
+    def enroll(self, provider, user_id, credentials):
+        """
+        Start syncing a user, or update the credentials of an enrolled user
+
+        The first enrollment queues a backfill job immediately.
+        """
+        key = (provider, user_id)
+        with self._lock:
+            state = self._users.get(key)
+            if state is not None:
+                state['credentials'] = credentials
+                return
+            self._users[key] = {
+                'credentials': credentials,
+                'cursor': None,
+                'last_sync': None,
+                'last_error': None
+            }
+        self.trigger(provider, user_id)
+
+    def unenroll(self, provider, user_id):
+        """
+        Stop syncing a user (e.g. after disconnecting)
+
+        Queued jobs for the user become no-ops. A job that is already running
+        is waited for, so once this returns nothing is still writing the
+        user's data or holding their credentials, and callers can safely
+        delete both.
+        """
+        key = (provider, user_id)
+        with self._lock:
+            self._users.pop(key, None)
+            while key in self._running:
+                self._job_finished.wait()
+
+    def trigger(self, provider, user_id):
+        """
+        Queue a sync job for a user unless one is already queued or running
+
+        Returns:
+            bool: Whether a job was queued
+        """
+        key = (provider, user_id)
+        with self._lock:
+            if key in self._pending or key not in self._users or self._executor is None:
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._run_job, key)
+        return True
+
+    def _run_job(self, key):
+        provider, user_id = key
+        try:
+            with self._lock:
+                state = self._users.get(key)
+                if state is None:
+                    return
+                credentials, cursor = state['credentials'], state['cursor']
+                self._running.add(key)
+
+            started = time.time()
+            try:
+                with self.app.app_context():
+                    new_cursor = self._sync_fns[provider](user_id, credentials, cursor)
+            except Exception as e:
+                logger.error(f"{provider} sync failed for {user_id}: {str(e)}")
+                with self._lock:
+                    if key in self._users:
+                        self._users[key]['last_error'] = str(e)
+                return
+
+            logger.info(f"{provider} {'delta' if cursor else 'backfill'} sync for {user_id} took {time.time() - started:.1f}s")
+            with self._lock:
+                if key in self._users:
+                    self._users[key].update(cursor=new_cursor, last_sync=time.time(), last_error=None)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._running.discard(key)
+                self._job_finished.notify_all()
+
+    def _run_timer(self):
+        """Queue a delta sync for every enrolled user each interval"""
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                keys = list(self._users)
+            for provider, user_id in keys:
+                self.trigger(provider, user_id)
+
+    def status(self, provider, user_id):
+        """Sync state for a user, or None if they aren't enrolled"""
+        with self._lock:
+            state = self._users.get((provider, user_id))
+            if state is None:
+                return None
+            return {
+                'cursor': state['cursor'],
+                'last_sync': state['last_sync'],
+                'last_error': state['last_error'],
+                'running': (provider, user_id) in self._pending
+            }
+
+    def stop(self):
+        """Stop the timer and wait for running jobs"""
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def get_scheduler():
+    """Get the process-wide sync scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SyncScheduler()
+    return _scheduler
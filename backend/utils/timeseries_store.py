@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from config import Config
+
+# A day is final once this many days have started after it; until then late syncs can still change it
+FINAL_AFTER_DAYS = 2  # i.e. today and yesterday are refetched
+
+# Samples are packed as one int32 seconds-since-midnight column followed by one uint16 bpm column
+SAMPLE_SECONDS_DTYPE = np.dtype('<i4')
+SAMPLE_BPM_DTYPE = np.dtype('<u2')
+SAMPLE_BYTES = SAMPLE_SECONDS_DTYPE.itemsize + SAMPLE_BPM_DTYPE.itemsize
+
+_store = None
+_store_lock = threading.Lock()
+
+DayRecord = namedtuple('DayRecord', ['summary', 'seconds', 'bpm', 'synced_at'])
+
+
+def date_range(start, end):
+    """
+    List every day from start to end inclusive
+
+    Args:
+        start (str): First day (YYYY-MM-DD)
+        end (str): Last day (YYYY-MM-DD)
+
+    Returns:
+        list: Day strings in chronological order
+    """
+    first = datetime.strptime(start, '%Y-%m-%d')
+    count = (datetime.strptime(end, '%Y-%m-%d') - first).days + 1
+    return [(first + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(max(count, 0))]
+
+
+def final_after(day):
+    """Epoch time (local midnight) after which data synced for a day no longer changes"""
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=FINAL_AFTER_DAYS)).timestamp()
+
+
+def pack_samples(seconds, bpm):
+    """Pack intraday samples into a compressed BLOB"""
+    seconds = np.asarray(seconds, dtype=SAMPLE_SECONDS_DTYPE)
+    bpm = np.asarray(bpm).astype(SAMPLE_BPM_DTYPE)
+    return zlib.compress(seconds.tobytes() + bpm.tobytes(), 1)
+
+
+def unpack_samples(blob):
+    """Inverse of pack_samples; returns (seconds, bpm) arrays"""
+    raw = zlib.decompress(blob)
+    count = len(raw) // SAMPLE_BYTES
+    split = count * SAMPLE_SECONDS_DTYPE.itemsize
+    seconds = np.frombuffer(raw, dtype=SAMPLE_SECONDS_DTYPE, count=count)
+    bpm = np.frombuffer(raw, dtype=SAMPLE_BPM_DTYPE, count=count, offset=split)
+    return seconds, bpm
+
+
+class TimeSeriesStore(object):
+    """
+    Persistent per-user, per-day store for synced wearable data
+
+    Each row holds one user's data of one kind (e.g. 'heart-rate:1sec',
+    'sleep') for one calendar day: a compressed JSON summary and, for
+    intraday series, a compressed BLOB of packed sample columns. Past days
+    never change upstream, so once stored they are served from disk and only
+    missing or still-mutable days (see FINAL_AFTER_DAYS) have to be fetched.
+
+    The database is a single SQLite file in WAL mode shared by every worker
+    process. Connections are per thread and opened on first use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        """One connection per thread; the schema is created by the first connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS day_records ('
+                        'user_id TEXT NOT NULL, kind TEXT NOT NULL, day TEXT NOT NULL, '
+                        'summary BLOB, samples BLOB, synced_at REAL NOT NULL, '
+                        'PRIMARY KEY (user_id, kind, day)) WITHOUT ROWID'
+                    )
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def get_days(self, user_id, kind, days):
+        """
+        Load stored days
+
+        Args:
+            user_id (str): Owner of the data
+            kind (str): Data kind, e.g. 'heart-rate:1min'
+            days (list): Days to load (YYYY-MM-DD)
+
+        Returns:
+            dict: DayRecord per stored day; days that were never stored are absent
+        """
+        if not days:
+            return {}
+        rows = self._connect().execute(
+            'SELECT day, summary, samples, synced_at FROM day_records '
+            'WHERE user_id = ? AND kind = ? AND day BETWEEN ? AND ?',
+            (user_id, kind, min(days), max(days))
+        ).fetchall()
+
+        wanted = set(days)
+        records = {}
+        for day, summary, samples, synced_at in rows:
+            if day not in wanted:
+                continue
+            seconds = bpm = None
+            if samples is not None:
+                seconds, bpm = unpack_samples(samples)
+            records[day] = DayRecord(
+                json.loads(zlib.decompress(summary)) if summary is not None else None,
+                seconds, bpm, synced_at
+            )
+        return records
+
+    def put_day(self, user_id, kind, day, summary=None, seconds=None, bpm=None):
+        """
+        Store (or replace) one day
+
+        Args:
+            summary (dict or list, optional): JSON-serializable day summary
+            seconds (array-like, optional): Intraday sample times, seconds since midnight
+            bpm (array-like, optional): Intraday sample values
+        """
+        self.put_days(user_id, kind, {day: (summary, seconds, bpm)})
+
+    def put_days(self, user_id, kind, days, synced_at=None):
+        """
+        Store several days in one transaction
+
+        Args:
+            days (dict): (summary, seconds, bpm) tuples keyed by day
+            synced_at (float, optional): Sync time to record; 0 marks the
+                days as incomplete so missing_days returns them again
+        """
+        now = time.time() if synced_at is None else synced_at
+        rows = []
+        for day, (summary, seconds, bpm) in days.items():
+            rows.append((
+                user_id, kind, day,
+                zlib.compress(json.dumps(summary, separators=(',', ':')).encode('utf-8'), 1) if summary is not None else None,
+                pack_samples(seconds, bpm) if seconds is not None else None,
+                now
+            ))
+        if not rows:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany('INSERT OR REPLACE INTO day_records VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def missing_days(self, user_id, kind, days, stored=None):
+        """
+        Days that have to be fetched from upstream
+
+        A stored day only counts as complete if it was synced after the day
+        became final, so a day first stored while it was still today gets
+        refetched once more after it settles.
+
+        Args:
+            stored (dict, optional): Result of get_days, if already loaded
+
+        Returns:
+            list: Days that are not stored yet or may still change
+        """
+        if stored is None:
+            stored = self.get_days(user_id, kind, days)
+        return [day for day in days if day not in stored or stored[day].synced_at < final_after(day)]
+
+    def delete_user(self, user_id):
+        """Remove everything stored for a user (e.g. on disconnect)"""
+        self._connect().execute('DELETE FROM day_records WHERE user_id = ?', (user_id,))
+
+    def stats(self):
+        """Stored day counts and bytes per kind"""
+        rows = self._connect().execute(
+            'SELECT kind, COUNT(*), COALESCE(SUM(LENGTH(summary)), 0) + COALESCE(SUM(LENGTH(samples)), 0) '
+            'FROM day_records GROUP BY kind'
+        ).fetchall()
+        return {kind: {'days': count, 'bytes': size} for kind, count, size in rows}
+
+
+def get_store():
+    """Get the process-wide time-series store, at TIMESERIES_DB_PATH from the config"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if has_app_context() and 'TIMESERIES_DB_PATH' in current_app.config:
+                    path = current_app.config['TIMESERIES_DB_PATH']
+                else:
+                    path = Config.TIMESERIES_DB_PATH
+                _store = TimeSeriesStore(path)
+    return _store
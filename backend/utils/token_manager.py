@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+class TokenRefreshError(Exception):
+    """Raised when a provider rejects a refresh, so the user has to sign in again"""
+
+
+def token_user(token):
+    """
+    Stable identity for the user owning an OAuth token
+
+    The provider's user id when the token carries one (Fitbit), else a hash
+    of the refresh token, which outlives the access tokens it mints.
+    """
+    if token.get('user_id'):
+        return str(token['user_id'])
+    identity = token.get('refresh_token') or token.get('access_token') or ''
+    return hashlib.md5(identity.encode()).hexdigest()
+
+
+class TokenManager(object):
+    """
+    Current OAuth tokens for every provider and user, refreshed ahead of expiry
+
+    Providers register a refresh function with ``register``. Request
+    handlers pass the token from their session to ``current``, which starts
+    tracking it and returns the freshest token known for that user in O(1).
+    A timer thread refreshes tracked tokens that expire within
+    ``refresh_margin`` seconds on a small thread pool inside an app context,
+    so requests normally find a refreshed token waiting instead of paying
+    for the round trip themselves. Only a token that has already expired is
+    refreshed on the request path, and concurrent refreshes for the same
+    user (from requests or the timer) share one upstream call.
+
+    A refresh function is called as ``refresh_fn(token)`` and returns the
+    new token dict with an absolute ``expires_at``; it raises
+    TokenRefreshError when the provider rejects the refresh token. Tokens
+    without ``expires_at`` are never refreshed.
+
+    Providers whose refresh tokens are single use (Fitbit) register with
+    ``background=False``. A background refresh would spend the refresh
+    token held by the user's session while the new one lived only in this
+    process, so after a restart, or in another worker, the session could no
+    longer refresh. Their tokens are refreshed on the request path only,
+    where the handler writes the new token back to the session.
+
+    Like sync enrollments, tokens live in memory, so each gunicorn worker
+    refreshes the tokens of the users it has served.
+    """
+
+    def __init__(self, interval=None, refresh_margin=None, max_workers=None):
+        self.interval = interval or Config.TOKEN_REFRESH_INTERVAL_SECONDS
+        self.refresh_margin = refresh_margin if refresh_margin is not None else Config.TOKEN_REFRESH_MARGIN_SECONDS
+        self.max_workers = max_workers or Config.TOKEN_REFRESH_MAX_WORKERS
+        self.app = None
+        self._refresh_fns = {}
+        self._background = set()  # Providers refreshed ahead of expiry by the timer
+        self._tokens = {}  # (provider, user) -> token
+        self._aliases = {}  # Key of a rotated refresh token -> key of its replacement
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._executor = None
+        self._timer = None
+        self._stopped = threading.Event()
+
+    def init_app(self, app):
+        """Bind to the Flask app and start the refresh pool and the periodic timer"""
+        self.app = app
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='token-refresh')
+            self._timer = threading.Thread(target=self._run_timer, name='token-refresh-timer', daemon=True)
+            self._timer.start()
+
+    def register(self, provider, refresh_fn, background=True):
+        """
+        Register the refresh function for a provider
+
+        Args:
+            provider (str): Provider name
+            refresh_fn (callable): Called with a token; returns the new token
+            background (bool): Refresh ahead of expiry on the timer; False
+                refreshes only on the request path, once the token has expired
+        """
+        self._refresh_fns[provider] = refresh_fn
+        if background:
+            self._background.add(provider)
+        else:
+            self._background.discard(provider)
+
+    def _key(self, provider, user_id):
+        key = (provider, user_id)
+        return self._aliases.get(key, key)
+
+    def track(self, provider, token):
+        """
+        Start tracking a token, or replace the tracked one (e.g. after a new sign-in)
+
+        Returns:
+            str: The user the token is tracked under
+        """
+        user_id = token_user(token)
+        with self._lock:
+            self._aliases.pop((provider, user_id), None)
+            self._tokens[(provider, user_id)] = token
+        return user_id
+
+    def forget(self, provider, token):
+        """Stop tracking a user's token (e.g. after disconnecting)"""
+        with self._lock:
+            key = self._key(provider, token_user(token))
+            self._tokens.pop(key, None)
+            for alias in [alias for alias, target in self._aliases.items() if target == key]:
+                del self._aliases[alias]
+
+    def get(self, provider, user_id):
+        """The tracked token for a user, or None; never refreshes"""
+        with self._lock:
+            return self._tokens.get(self._key(provider, user_id))
+
+    def expires_soon(self, token, margin=0):
+        """Whether a token expires within ``margin`` seconds"""
+        expires_at = token.get('expires_at')
+        return expires_at is not None and expires_at - margin <= time.time()
+
+    def current(self, provider, token):
+        """
+        The freshest token for the user owning ``token``
+
+        Starts tracking the token unless the tracked one expires later. A
+        token refreshed in the background is therefore returned instead of
+        the caller's, and an expired token is refreshed before returning.
+
+        Raises:
+            TokenRefreshError: If the provider rejected the refresh
+        """
+        user_id = token_user(token)
+        with self._lock:
+            key = self._key(provider, user_id)
+            tracked = self._tokens.get(key)
+            if tracked is None or (token.get('expires_at') or 0) >= (tracked.get('expires_at') or 0):
+                tracked = self._tokens[key] = token
+
+        if not self.expires_soon(tracked):
+            return tracked
+        return self.refresh(provider, key[1])
+
+    def refresh(self, provider, user_id):
+        """
+        Refresh a tracked token now, sharing any refresh already running for the user
+
+        Returns:
+            dict: The new token
+
+        Raises:
+            TokenRefreshError: If the token isn't tracked or the provider rejected the refresh
+        """
+        with self._lock:
+            key = self._key(provider, user_id)
+        return self._flights.do(key, self._refresh, key)
+
+    def _refresh(self, key):
+        provider, user_id = key
+        with self._lock:
+            token = self._tokens.get(key)
+        if token is None:
+            raise TokenRefreshError(f"No {provider} token tracked for {user_id}")
+
+        # A waiter may have queued behind a refresh that already finished
+        if not self.expires_soon(token, self.refresh_margin):
+            return token
+
+        started = time.time()
+        new_token = self._refresh_fns[provider](token)
+        logger.info(f"Refreshed {provider} token for {user_id} in {time.time() - started:.2f}s")
+
+        new_key = (provider, token_user(new_token))
+        with self._lock:
+            if key not in self._tokens:
+                return new_token  # Forgotten while refreshing
+            if new_key != key:
+                # The provider rotated the refresh token; keep old sessions pointed at the new one
+                del self._tokens[key]
+                self._aliases[key] = new_key
+                for alias, target in list(self._aliases.items()):
+                    if target == key:
+                        self._aliases[alias] = new_key
+            self._tokens[new_key] = new_token
+        return new_token
+
+    def _run_refresh(self, key):
+        try:
+            with self.app.app_context():
+                self.refresh(*key)
+        except TokenRefreshError as e:
+            logger.warning(f"Dropping {key[0]} token for {key[1]}: {str(e)}")
+            with self._lock:
+                self._tokens.pop(key, None)
+        except Exception as e:
+            logger.error(f"Background {key[0]} token refresh failed for {key[1]}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def refresh_expiring(self):
+        """
+        Queue a background refresh for every tracked token expiring within refresh_margin
+
+        Only providers registered with background=True are refreshed.
+
+        Returns:
+            int: Number of refreshes queued
+        """
+        with self._lock:
+            if self._executor is None:
+                return 0
+            keys = [key for key, token in self._tokens.items()
+                    if key not in self._pending and key[0] in self._background
+                    and self.expires_soon(token, self.refresh_margin)]
+            self._pending.update(keys)
+        for key in keys:
+            self._executor.submit(self._run_refresh, key)
+        return len(keys)
+
+    def _run_timer(self):
+        """Refresh expiring tokens each interval"""
+        while not self._stopped.wait(self.interval):
+            self.refresh_expiring()
+
+    def stop(self):
+        """Stop the timer and wait for running refreshes"""
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def get_token_manager():
+    """Get the process-wide token manager"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = TokenManager()
+    return _manager